@@ -0,0 +1,67 @@
+# benchmarks/bench_columnar.py
+"""
+Мікро-бенчмарк вибору топ-N: поточний шлях pandas (groupby/idxmax/sort на кожен рендер)
+проти ColumnarSnapshot (збирається раз на версію, далі бінарний пошук + зріз).
+Окремо - великі чорні списки з glob-шаблонами: перевірка символів на кожен рендер
+проти маски профілю, закешованої на всесвіт символів.
+
+    python -m benchmarks.bench_columnar
+"""
+import pandas as pd
+
+from benchmarks.common import make_funding_frame, bench, report
+from src.services.columnar import ColumnarSnapshot
+from src.services.symbol_filter import get_filter, filter_masks
+
+TOP_N = 10
+N_ROWS = 10_000
+
+
+def pandas_top_n(df: pd.DataFrame, threshold: float, blacklist: list) -> pd.DataFrame:
+    """Еталон: вибір топ-N так, як його робив format_funding_update до колонкового знімка."""
+    df = df[~df['symbol'].isin(blacklist)].copy()
+    df['abs_rate'] = df['rate'].abs()
+    best_offers = df.loc[df.groupby('symbol')['abs_rate'].idxmax()]
+    filtered_df = best_offers[best_offers['abs_rate'] >= threshold].copy()
+    filtered_df.sort_values('abs_rate', ascending=False, inplace=True)
+    return filtered_df.head(TOP_N)
+
+
+def main() -> None:
+    df = make_funding_frame(N_ROWS)
+    blacklist = ['C00001', 'C00002']
+    print(f"Рядків (символ, біржа): {len(df)}")
+
+    for threshold in (0.05, 0.3):
+        expected = pandas_top_n(df, threshold, blacklist)
+        columnar = ColumnarSnapshot(df)
+        actual = columnar.to_frame(columnar.top_n(threshold, TOP_N, blacklist))
+        assert list(expected['symbol']) == list(actual['symbol']), "Результати не збігаються"
+
+        report(f"pandas groupby/idxmax (поріг {threshold})", bench(lambda: pandas_top_n(df, threshold, blacklist)))
+        report(f"columnar top_n (поріг {threshold})", bench(lambda: columnar.top_n(threshold, TOP_N, blacklist), repeat=200))
+
+    report("побудова ColumnarSnapshot (раз на версію)", bench(lambda: ColumnarSnapshot(df)))
+
+    # Чорний список на кілька сотень записів: точні тикери плюс шаблони
+    big_blacklist = [f"C{i:05d}" for i in range(0, 1000, 4)] + ['C000*', '*7', 'C01?5', '1000*']
+    symbol_filter = get_filter(big_blacklist)
+    columnar = ColumnarSnapshot(df)
+
+    def uncached_top_n():
+        # Без кешу: компіляція вже є, але маска над символами будується на кожен рендер
+        candidates = columnar.best_rows[:columnar.count_above(0.05)]
+        allowed = symbol_filter.mask(columnar.symbols)
+        return candidates[allowed[columnar.symbol_codes[candidates]]][:TOP_N]
+
+    assert list(uncached_top_n()) == list(columnar.top_n(0.05, TOP_N, big_blacklist)), "Результати не збігаються"
+    report(f"чорний список {len(big_blacklist)} записів: маска на кожен рендер", bench(uncached_top_n))
+    report(f"чорний список {len(big_blacklist)} записів: маска з кешу",
+           bench(lambda: columnar.top_n(0.05, TOP_N, big_blacklist), repeat=200))
+    # Нова версія знімка з тим самим набором символів бере маску профілю з кешу
+    for _ in range(5):
+        ColumnarSnapshot(df).top_n(0.05, TOP_N, big_blacklist)
+    print(f"кеш масок після 5 нових версій знімка: {filter_masks.stats}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# benchmarks/bench_funding_timer.py
+"""
+Таймер виплат фандінгу: скільки коштує слухач кешу на кожне сканування і розсилка
+однієї виплати для багатьох чатів (рендер раз на групу однакових налаштувань, а не на чат).
+
+    python -m benchmarks.bench_funding_timer [--rows 10000] [--chats 5000] [--groups 50]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.common import make_funding_frame, bench, report, BENCH_EXCHANGES
+from src.services.columnar import ColumnarSnapshot
+from src.services.funding_service import ScanResult
+from src.services.funding_timer import FundingTimer, PrefundingSubscribers, render_prefunding_alerts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=10_000)
+    parser.add_argument('--chats', type=int, default=5000)
+    parser.add_argument('--groups', type=int, default=50, help="різних наборів налаштувань серед чатів")
+    args = parser.parse_args()
+
+    # Виплати на межах 1/4/8-годинних інтервалів, як у бірж зі списку
+    now = time.time()
+    df = make_funding_frame(args.rows)
+    intervals = np.array([1, 4, 8])[np.arange(len(df)) % 3] * 3600
+    df['next_funding_time'] = (now // intervals + 1) * intervals * 1000
+    result = ScanResult({name: frame.to_dict('records') for name, frame in df.groupby('exchange')}, [], [], 0.0)
+
+    timer = FundingTimer()
+    report("слухач: моменти виплат зі сканування", bench(lambda: timer.update(result)), len(df))
+    moments = sorted({int(ts // 1000) for ts in df['next_funding_time']})
+
+    rng = np.random.default_rng(7)
+    profiles = [
+        (float(rng.choice([0.01, 0.05, 0.1, 0.3])), list(rng.choice(BENCH_EXCHANGES, 4, replace=False)))
+        for _ in range(args.groups)
+    ]
+    settings = {
+        chat_id: {'threshold': profiles[chat_id % args.groups][0], 'exchanges': profiles[chat_id % args.groups][1],
+                  'prefunding_alerts': True}
+        for chat_id in range(args.chats)
+    }
+    subscribers = PrefundingSubscribers(settings)
+    report("індекс підписників", bench(lambda: PrefundingSubscribers(settings)))
+    columnar = ColumnarSnapshot(df)
+    seconds = bench(lambda: render_prefunding_alerts(df, moments[0], subscribers, columnar))
+    report(f"виплата: рендер на {len(subscribers.groups)} груп", seconds, len(df))
+    # Без групування рендер повторювався б для кожного чату
+    report(f"виплата: оцінка рендеру на кожен з {args.chats} чатів",
+           seconds / len(subscribers.groups) * args.chats)
+    texts = render_prefunding_alerts(df, moments[0], subscribers, columnar)
+    print(f"\n{len(moments)} моментів виплат у купі, {args.chats} чатів -> {len(texts)} різних повідомлень")
+
+
+if __name__ == '__main__':
+    main()
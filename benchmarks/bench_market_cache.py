@@ -0,0 +1,78 @@
+# benchmarks/bench_market_cache.py
+"""
+Кеш ринків на диску: скільки коштує старт з файлів проти розбору load_markets().
+Ринки синтетичні, але розміром як у великих бірж (спот + свопи + ф'ючерси з полем info);
+для справжніх відповідей можна передати --fixtures з benchmarks.replay record.
+
+    python -m benchmarks.bench_market_cache [--markets 3000] [--fixtures benchmarks/fixtures]
+"""
+import argparse
+import json
+import os
+import tempfile
+
+from benchmarks.common import bench, report
+from src.config import AVAILABLE_EXCHANGES
+from src.services.market_cache import MarketCache, MarketInfo
+
+
+def synthesize_markets(n_markets: int) -> dict:
+    """Третина ринків - USDT-свопи, решта - спот і датовані ф'ючерси, як у load_markets() ccxt."""
+    markets = {}
+    for i in range(n_markets):
+        kind = ('swap', 'spot', 'future')[i % 3]
+        symbol = f"C{i:05d}/USDT" + (':USDT' if kind != 'spot' else '') + ('-250627' if kind == 'future' else '')
+        markets[symbol] = {
+            'id': symbol.replace('/', '').replace(':', '_'), 'symbol': symbol, 'base': f"C{i:05d}", 'quote': 'USDT',
+            'settle': 'USDT' if kind != 'spot' else None, 'type': kind, 'spot': kind == 'spot',
+            'swap': kind == 'swap', 'future': kind == 'future', 'contract': kind != 'spot', 'linear': True,
+            'contractSize': 1.0 if kind != 'spot' else None, 'active': True,
+            'precision': {'amount': 0.001, 'price': 0.0001}, 'limits': {'amount': {'min': 0.001, 'max': 1e6}},
+            'info': {'symbol': symbol, 'status': 'Trading', 'fundingInterval': '480', 'priceScale': '4',
+                     'leverageFilter': {'minLeverage': '1', 'maxLeverage': '50', 'leverageStep': '0.01'}},
+        }
+    return markets
+
+
+def load_fixture_markets(fixtures_dir: str) -> dict:
+    markets = {}
+    for exchange_id in AVAILABLE_EXCHANGES.values():
+        path = os.path.join(fixtures_dir, exchange_id, 'load_markets.json')
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                markets[exchange_id] = json.load(f)
+    return markets
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--markets', type=int, default=3000, help="ринків на біржу для синтетичних даних")
+    parser.add_argument('--fixtures', default=None, help="каталог фікстур benchmarks.replay")
+    args = parser.parse_args()
+
+    if args.fixtures:
+        markets_by_exchange = load_fixture_markets(args.fixtures)
+    else:
+        markets = synthesize_markets(args.markets)
+        markets_by_exchange = {exchange_id: markets for exchange_id in AVAILABLE_EXCHANGES.values()}
+    total_markets = sum(len(markets) for markets in markets_by_exchange.values())
+    directory = tempfile.mkdtemp()
+
+    # Те, що раніше читалось з мережі при кожному старті: повна відповідь load_markets
+    raw_bytes = sum(len(json.dumps(markets, default=str)) for markets in markets_by_exchange.values())
+    cache = MarketCache(directory, ttl=3600)
+    report("розбір load_markets() усіх бірж (ревалідація)",
+           bench(lambda: [MarketInfo.from_markets(exchange_id, markets)
+                          for exchange_id, markets in markets_by_exchange.items()]), total_markets)
+    for exchange_id, markets in markets_by_exchange.items():
+        cache.put(exchange_id, markets)
+    cached_bytes = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+    report("старт: читання кешу ринків з диска", bench(lambda: MarketCache(directory, ttl=3600)))
+
+    symbols = sum(len(cache.get(exchange_id).symbols) for exchange_id in markets_by_exchange)
+    print(f"\n{len(markets_by_exchange)} бірж, {total_markets} ринків, {symbols} USDT-свопів; "
+          f"load_markets {raw_bytes / 1024:,.0f} KiB JSON -> кеш {cached_bytes / 1024:,.0f} KiB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+# benchmarks/bench_pipeline.py
+"""
+Бенчмарк конвеєра fetch -> format на відтворених відповідях бірж (без мережі).
+Для кожного етапу друкує медіанний час, кількість нових алокацій і пік пам'яті
+(tracemalloc), щоб регресії було видно до деплою.
+
+    python -m benchmarks.replay synth --out benchmarks/fixtures   # або record
+    python -m benchmarks.bench_pipeline [--fixtures DIR] [--latency 0.05] [--failure-rate 0.1]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+import benchmarks.common  # noqa: F401 - шляхи проекту
+from benchmarks.replay import install_fake_ccxt, synthesize_fixtures
+
+REPEAT = 5
+
+
+def measure(name: str, func, repeat: int = REPEAT) -> None:
+    """Медіанний час, алокації (нові блоки) та пік пам'яті одного виклику func()."""
+    timings, blocks, peaks = [], [], []
+    for _ in range(repeat):
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+        after = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        stats = after.compare_to(before, 'filename')
+        blocks.append(sum(stat.count_diff for stat in stats if stat.count_diff > 0))
+        peaks.append(peak)
+    print(f"{name:<40} {np.median(timings) * 1000:10.2f} ms  {int(np.median(blocks)):>9,} блоків"
+          f"  пік {np.median(peaks) / 1024 / 1024:8.2f} MiB")
+
+
+class FakeMessage:
+    def __init__(self, chat_id: int, message_id: int, text: str = ""):
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.text = text
+
+    async def reply_text(self, text: str, **kwargs):
+        return FakeMessage(self.chat_id, self.message_id + 1, text)
+
+    async def edit_text(self, text: str, **kwargs):
+        self.text = text
+        return self
+
+
+class FakeCallbackQuery:
+    def __init__(self, message: FakeMessage, data: str):
+        self.message = message
+        self.data = data
+
+    async def answer(self, *args, **kwargs):
+        return True
+
+
+class FakeChat:
+    def __init__(self, chat_id: int):
+        self.id = chat_id
+
+
+class FakeUpdate:
+    """Мінімальний Update для прогону обробників без Telegram."""
+
+    def __init__(self, chat_id: int, text: str | None = None, callback_data: str | None = None):
+        self.effective_chat = FakeChat(chat_id)
+        self.message = FakeMessage(chat_id, 1, text or "")
+        self.callback_query = FakeCallbackQuery(self.message, callback_data) if callback_data else None
+
+
+class FakeBot:
+    """Bot API, що одразу відповідає на редагування та надсилання."""
+
+    async def edit_message_text(self, chat_id: int, message_id: int, text: str, **kwargs):
+        return FakeMessage(chat_id, message_id, text)
+
+    async def send_message(self, chat_id: int, text: str, **kwargs):
+        return FakeMessage(chat_id, 1, text)
+
+
+class FakeContext:
+    bot_data = {}
+    user_data = {}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--fixtures', default=None, help="каталог фікстур (за замовчуванням - синтетичні)")
+    parser.add_argument('--latency', type=float, default=0.0, help="затримка кожного запиту до біржі, с")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="частка запитів, що падають")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench-pipeline-")
+    fixtures = args.fixtures or os.path.join(workdir, 'fixtures')
+    if args.fixtures is None:
+        synthesize_fixtures(fixtures)
+    # Налаштування користувачів і історія пишуться у тимчасовий каталог
+    os.chdir(workdir)
+
+    from src.config import DEFAULT_SETTINGS
+    from src.services import funding_service, formatters
+    from src.services.send_queue import SendQueue
+    from src.handlers import callbacks, messages
+    from src.user_manager import open_settings
+
+    open_settings()
+
+    # Логи сканування не мають потрапляти в заміри
+    logging.disable(logging.WARNING)
+    # Власна черга без лімітів Telegram: міряємо обробник, а не паузи черги
+    send_queue = SendQueue(global_rate=10 ** 6, chat_rate=10 ** 6, chat_burst=10 ** 6)
+    callbacks.send_queue = messages.send_queue = send_queue
+
+    exchanges = DEFAULT_SETTINGS['exchanges']
+    with install_fake_ccxt(fixtures, args.latency, args.failure_rate):
+        print(f"біржі: {exchanges}, затримка {args.latency} с, збої {args.failure_rate:.0%}")
+        loop = asyncio.new_event_loop()
+        measure("fetch_all_funding_data (паралельно)",
+                lambda: loop.run_until_complete(funding_service.fetch_all_funding_data(exchanges)))
+
+        snapshot = loop.run_until_complete(funding_service.get_funding_snapshot(exchanges))
+        measure("format_funding_update (без кешу)",
+                lambda: formatters.format_funding_update(snapshot.df, 0.01, snapshot.age, snapshot.missed, snapshot.columnar))
+        ticker = snapshot.df['symbol'].iloc[0] if not snapshot.df.empty else "BTC"
+        ticker_df = funding_service.filter_ticker(snapshot, ticker)
+        measure("format_ticker_info (без кешу)",
+                lambda: formatters.format_ticker_info(ticker_df, ticker, snapshot.age, snapshot.missed, snapshot.columnar))
+
+        async def start_queue():
+            send_queue.start(FakeBot())
+        loop.run_until_complete(start_queue())
+
+        def handler(func, make_update, cold: bool):
+            def run():
+                if cold:
+                    funding_service.funding_cache.invalidate()
+                loop.run_until_complete(func(make_update(), FakeContext()))
+            return run
+
+        chat_ids = iter(range(10 ** 6))
+        refresh = lambda: FakeUpdate(next(chat_ids), callback_data="refresh")
+        ticker_update = lambda: FakeUpdate(next(chat_ids), text=ticker)
+        measure("refresh_callback (холодний кеш)", handler(callbacks.refresh_callback, refresh, True))
+        measure("refresh_callback (теплий кеш)", handler(callbacks.refresh_callback, refresh, False))
+        measure("ticker_message_handler (холодний кеш)", handler(messages.ticker_message_handler, ticker_update, True))
+        measure("ticker_message_handler (теплий кеш)", handler(messages.ticker_message_handler, ticker_update, False))
+
+        loop.run_until_complete(send_queue.stop())
+        loop.run_until_complete(funding_service.exchange_pool.close())
+        loop.close()
+
+
+if __name__ == '__main__':
+    main()
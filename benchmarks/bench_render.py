@@ -0,0 +1,84 @@
+# benchmarks/bench_render.py
+"""
+Бенчмарк рендерингу звітів: попередні реалізації на iterrows() проти векторизованих.
+Перед вимірюванням перевіряє, що HTML збігається байт-у-байт.
+
+    python -m benchmarks.bench_render
+"""
+import html
+
+import pandas as pd
+
+from benchmarks.common import make_funding_frame, bench, report
+from src.services import formatters
+from src.services.columnar import ColumnarSnapshot
+
+import run_bot
+
+N_ROWS = 10_000
+
+
+# --- Попередні реалізації (еталон для порівняння) ---
+def legacy_src_funding_update(df: pd.DataFrame, threshold: float) -> str:
+    filtered_df = df[abs(df['rate']) >= threshold].sort_values(by='rate', ascending=False, kind='stable')
+    header = f"<b>💎 Фандінг вище {threshold}%</b>\n\n"
+    lines = []
+    for _, row in filtered_df.iterrows():
+        emoji = "🟢" if row['rate'] > 0 else "🔴"
+        symbol = html.escape(row['symbol'])
+        rate = row['rate']
+        time_str = row['next_funding_time'].strftime('%H:%M UTC') if pd.notna(row['next_funding_time']) else "N/A"
+        exchange_name = html.escape(row['exchange'])
+        link = formatters.get_trade_link(row['exchange'], row['symbol'])
+        exchange_part = f'<a href="{link}">{exchange_name}</a>' if link else exchange_name
+        lines.append(f"{emoji} <code>{symbol:<8}</code>— <b>{rate: >-7.4f}%</b> — {time_str} — {exchange_part}")
+    return header + "\n".join(lines)
+
+
+def legacy_run_bot_ticker_info(df: pd.DataFrame, ticker: str) -> str:
+    header = f"💰 <b>Фандінг для <code>{html.escape(ticker.upper())}</code></b>"
+    df = df.copy()
+    df['abs_rate'] = df['rate'].abs()
+    df.sort_values(by='abs_rate', ascending=False, inplace=True, kind='stable')
+    lines = []
+    for _, row in df.iterrows():
+        emoji = "🟢" if row['rate'] < 0 else "🔴"
+        link = run_bot.get_trade_link(row['exchange'], row['symbol'])
+        direction_str = f"<a href='{link}'>{'LONG' if row['rate'] < 0 else 'SHORT'}</a>"
+        rate_part = f"<b>{row['rate']:.4f}%</b>"
+        lines.append(f"{emoji}  {direction_str}  |  {rate_part}  |  {row['exchange']}")
+    return f"{header}\n\n" + "\n".join(lines) + "\n\n"
+
+
+def main() -> None:
+    df = make_funding_frame(N_ROWS)
+    src_df = df.assign(exchange=df['exchange'].str.title().replace({'Bybit': 'ByBit', 'Kucoin': 'KuCoin'}))
+    src_df['next_funding_time'] = pd.NaT
+    threshold = 0.02
+    rendered_rows = int((src_df['rate'].abs() >= threshold).sum())
+    columnar = ColumnarSnapshot(src_df)
+    before = src_df.copy()
+
+    expected = legacy_src_funding_update(src_df, threshold)
+    actual = formatters.format_funding_update(src_df, threshold, columnar=columnar)
+    assert expected == actual, "HTML format_funding_update не збігається"
+    assert src_df.equals(before), "Знімок змінено під час рендерингу"
+
+    print(f"format_funding_update (src), рядків у звіті: {rendered_rows}")
+    report("  iterrows (до)", bench(lambda: legacy_src_funding_update(src_df, threshold), repeat=3), rendered_rows)
+    report("  векторизовано (після)", bench(lambda: formatters.format_funding_update(src_df, threshold, columnar=columnar)), rendered_rows)
+
+    # Звіт по тикеру: зріз знімка з усіх бірж, розмножений до помітного розміру
+    ticker_df = df[df['symbol'].isin(df['symbol'].unique()[:200])]
+    ticker_columnar = ColumnarSnapshot(df)
+    expected = legacy_run_bot_ticker_info(ticker_df, "C00000")
+    actual = run_bot.format_ticker_info(ticker_df, "C00000", columnar=ticker_columnar)
+    assert expected == actual, "HTML format_ticker_info не збігається"
+
+    print(f"format_ticker_info (run_bot), рядків: {len(ticker_df)}")
+    report("  iterrows (до)", bench(lambda: legacy_run_bot_ticker_info(ticker_df, "C00000"), repeat=5), len(ticker_df))
+    report("  векторизовано (після)", bench(lambda: run_bot.format_ticker_info(ticker_df, "C00000", columnar=ticker_columnar)), len(ticker_df))
+
+
+if __name__ == "__main__":
+    main()
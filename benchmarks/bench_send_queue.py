@@ -0,0 +1,107 @@
+# benchmarks/bench_send_queue.py
+"""
+Навантажувальний стенд черги вихідних повідомлень на локальному фейковому Bot API.
+FakeBot поводиться як Telegram: відповідає із затримкою мережі, а при перевищенні
+глобального (30/с) чи per-chat (1/с) ліміту повертає RetryAfter (429).
+Вимірюються пропускна здатність, p50/p99 затримки доставки та кількість 429.
+
+    python -m benchmarks.bench_send_queue
+"""
+import asyncio
+import collections
+import time
+
+import numpy as np
+from telegram.error import RetryAfter
+
+import benchmarks.common  # noqa: F401 - шляхи проекту
+from src.services.send_queue import SendQueue, PRIORITY_INTERACTIVE, PRIORITY_BROADCAST
+
+N_CHATS = 300
+MESSAGES_PER_CHAT = 2
+EDITS_PER_MESSAGE = 5
+INTERACTIVE_CHATS = 20
+
+
+class FakeBot:
+    """Фейковий Bot API з лімітами Telegram у ковзному вікні в 1 секунду."""
+
+    def __init__(self, global_limit: int = 30, chat_limit: int = 1, latency: float = 0.05, burst: int = 3):
+        self.global_limit = global_limit
+        self.chat_limit = chat_limit
+        self.burst = burst
+        self.latency = latency
+        self._global = collections.deque()
+        self._chats = collections.defaultdict(collections.deque)
+        self.calls = 0
+        self.rejected = 0
+        self._message_ids = iter(range(1, 10 ** 9))
+
+    def _check_limits(self, chat_id: int) -> None:
+        now = time.monotonic()
+        for window in (self._global, self._chats[chat_id]):
+            while window and now - window[0] > 1:
+                window.popleft()
+        # Telegram дозволяє короткий сплеск у чат, але не стійкий потік понад ліміт
+        if len(self._global) >= self.global_limit or len(self._chats[chat_id]) >= self.chat_limit * self.burst:
+            self.rejected += 1
+            raise RetryAfter(1)
+        self._global.append(now)
+        self._chats[chat_id].append(now)
+
+    async def send_message(self, chat_id: int, text: str, **kwargs):
+        self.calls += 1
+        self._check_limits(chat_id)
+        await asyncio.sleep(self.latency)
+        return next(self._message_ids)
+
+    async def edit_message_text(self, chat_id: int, message_id: int, text: str, **kwargs):
+        self.calls += 1
+        self._check_limits(chat_id)
+        await asyncio.sleep(self.latency)
+        return text
+
+
+async def run_broadcast(queue: SendQueue, bot: FakeBot) -> None:
+    """Розсилка звітів усім чатам + інтерактивні відповіді та серії редагувань посеред неї."""
+    latencies = {PRIORITY_INTERACTIVE: [], PRIORITY_BROADCAST: []}
+
+    async def timed(future, priority):
+        started = time.monotonic()
+        await future
+        latencies[priority].append(time.monotonic() - started)
+
+    started = time.monotonic()
+    tasks = [
+        timed(queue.send_message(chat_id, f"report {n}", priority=PRIORITY_BROADCAST), PRIORITY_BROADCAST)
+        for n in range(MESSAGES_PER_CHAT) for chat_id in range(N_CHATS)
+    ]
+    # Кілька натискань "Оновити" поспіль: у черзі мають залишитись лише останні тексти
+    tasks += [
+        timed(queue.edit_message_text(-chat_id, 1, f"refresh {n}"), PRIORITY_INTERACTIVE)
+        for n in range(EDITS_PER_MESSAGE) for chat_id in range(1, INTERACTIVE_CHATS + 1)
+    ]
+    await asyncio.gather(*tasks)
+    elapsed = time.monotonic() - started
+
+    delivered = N_CHATS * MESSAGES_PER_CHAT + INTERACTIVE_CHATS * EDITS_PER_MESSAGE
+    print(f"запитів від бота: {delivered}, викликів API: {bot.calls}, 429: {bot.rejected}")
+    print(f"злито редагувань: {queue.stats['coalesced']}, RetryAfter у черзі: {queue.stats['retry_after']}")
+    print(f"час: {elapsed:.2f} с, пропускна здатність: {queue.stats['sent'] / elapsed:.1f} запитів API/с")
+    for priority, name in ((PRIORITY_INTERACTIVE, "інтерактивні"), (PRIORITY_BROADCAST, "розсилка")):
+        values = np.array(latencies[priority]) * 1000
+        print(f"{name:<14} p50 {np.percentile(values, 50):8.1f} ms   p99 {np.percentile(values, 99):8.1f} ms")
+
+
+async def main() -> None:
+    bot = FakeBot()
+    queue = SendQueue(global_rate=30, chat_rate=1, chat_burst=3)
+    queue.start(bot)
+    try:
+        await run_broadcast(queue, bot)
+    finally:
+        await queue.stop()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
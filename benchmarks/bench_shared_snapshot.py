@@ -0,0 +1,137 @@
+# benchmarks/bench_shared_snapshot.py
+"""
+Спільний знімок воркера проти черги результатів:
+ - черга: воркер на кожне завдання кладе DataFrame знімка в multiprocessing.Queue (pickle + копія);
+ - спільна пам'ять: воркер публікує знімок один раз, процеси бота читають його з mmap.
+Окремо - стрес-перевірка seqlock: записувач публікує без пауз, кілька процесів-читачів
+перевіряють, що жодне читання не змішало дві публікації.
+
+    python -m benchmarks.bench_shared_snapshot [--rows 10000] [--jobs 200] [--readers 4] [--seconds 3]
+"""
+import argparse
+import multiprocessing as mp
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.common import make_funding_frame, bench, report
+from src.services.shared_snapshot import SharedSnapshotWriter, SharedSnapshotReader
+
+
+def split_entries(df, fetched_at: float) -> list:
+    """Знімок як записи кешу воркера: (біржа, DataFrame, fetched_at, missed, stale)."""
+    return [(name, frame.reset_index(drop=True), fetched_at, False, False) for name, frame in df.groupby('exchange')]
+
+
+def queue_worker(task_queue, result_queue, df) -> None:
+    while True:
+        job_id = task_queue.get()
+        if job_id is None:
+            break
+        result_queue.put((job_id, (df, time.time(), [], [])))
+
+
+def bench_queue(df, jobs: int) -> float:
+    """Середній час завдання через task_queue/result_queue з DataFrame (і віком, missed, stale) у відповіді."""
+    task_queue, result_queue = mp.Queue(), mp.Queue()
+    worker = mp.Process(target=queue_worker, args=(task_queue, result_queue, df))
+    worker.start()
+    task_queue.put(-1)
+    result_queue.get()
+    started = time.perf_counter()
+    for job_id in range(jobs):
+        task_queue.put(job_id)
+        result_queue.get()
+    elapsed = time.perf_counter() - started
+    task_queue.put(None)
+    worker.join()
+    return elapsed / jobs
+
+
+def stress_writer(path: str, rows: int, seconds: float, ready) -> None:
+    writer = SharedSnapshotWriter(path, rows)
+    ready.set()
+    base = make_funding_frame(rows)
+    frames = split_entries(base, time.time())
+    version = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        version += 1
+        # Кожна публікація має всі ставки, рівні своїй версії: змішане читання одразу видно
+        for _, frame, _, _, _ in frames:
+            frame['rate'] = float(version)
+        writer.publish([(name, frame, float(version), False, False) for name, frame, _, _, _ in frames], version)
+    writer.close()
+
+
+def stress_reader(path: str, seconds: float, results) -> None:
+    reader = SharedSnapshotReader(path)
+    reads, torn, names = 0, 0, []
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        result = reader.read(names, {})
+        if result is None:
+            continue
+        state, rows = result
+        names = list(state.exchanges)
+        reads += 1
+        versions = {row['rate'] for exchange_rows in rows.values() for row in exchange_rows}
+        if len(versions) > 1 or (versions and versions != {float(state.version)}):
+            torn += 1
+    results.put((reads, torn, reader.stats['retries']))
+    reader.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=10_000)
+    parser.add_argument('--jobs', type=int, default=200)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=3.0)
+    args = parser.parse_args()
+
+    df = make_funding_frame(args.rows)
+    df['price'] = np.where(np.arange(len(df)) % 7, 100.0, np.nan)
+    entries = split_entries(df, time.time())
+    names = [name for name, _, _, _, _ in entries]
+    path = os.path.join(tempfile.mkdtemp(), 'funding_snapshot.bin')
+
+    print(f"Знімок: {len(df)} рядків, {len(names)} бірж")
+    report("черга: завдання з DataFrame у відповіді", bench_queue(df, args.jobs), len(df))
+
+    writer = SharedSnapshotWriter(path, args.rows)
+    reader = SharedSnapshotReader(path)
+    report("спільна пам'ять: публікація", bench(lambda: writer.publish(entries, 1)), len(df))
+    report("спільна пам'ять: читання без нової публікації",
+           bench(lambda: reader.read(names, {name: fetched for name, _, fetched, _, _ in entries}), repeat=1000))
+    report("спільна пам'ять: читання нової публікації",
+           bench(lambda: reader.read(names, {})), len(df))
+    # Те, що отримує кеш знімків бота: DataFrame кожної біржі, як і з черги
+    report("спільна пам'ять: нова публікація -> DataFrame бірж",
+           bench(lambda: [rows.to_frame() for rows in reader.read(names, {})[1].values()]), len(df))
+    reader.close()
+    writer.close()
+
+    # Стрес seqlock: записувач без пауз, читачі в окремих процесах
+    stress_path = os.path.join(os.path.dirname(path), 'stress.bin')
+    ready, results = mp.Event(), mp.Queue()
+    writer_process = mp.Process(target=stress_writer, args=(stress_path, args.rows, args.seconds, ready))
+    writer_process.start()
+    ready.wait()
+    readers = [mp.Process(target=stress_reader, args=(stress_path, args.seconds, results)) for _ in range(args.readers)]
+    for process in readers:
+        process.start()
+    totals = [results.get() for _ in readers]
+    for process in readers + [writer_process]:
+        process.join()
+    reads, torn, retries = (sum(column) for column in zip(*totals))
+    print(f"стрес за {args.seconds:.0f} с: {args.readers} читачів, {reads} читань, повторів {retries}, "
+          f"змішаних публікацій {torn}")
+    if torn:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+# benchmarks/bench_startup.py
+"""
+Час холодного старту: кожна точка входу імпортується в новому процесі з
+`python -X importtime`, звідки беруться сумарний час імпортів, найважчі пакети
+(сума власного часу їхніх модулів) та пік RSS. pandas і ccxt мають відкладатися
+до фонового прогріву - якщо вони з'явились серед імпортів старту, бенчмарк
+завершується з кодом 1 (так само, як при перевищенні --budget-ms).
+
+    python -m benchmarks.bench_startup [--runs 5] [--top 10] [--budget-ms 1500]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+ENTRY_POINTS = {
+    'run_bot': "import run_bot",
+    'src (обробники і сервіси)': (
+        "import src.handlers.commands, src.handlers.callbacks, src.handlers.messages, "
+        "src.services.report_scheduler, src.services.alert_engine"
+    ),
+    # Для порівняння: що саме відкладено до прогріву
+    'відкладене (pandas + ccxt)': "import pandas, ccxt.async_support",
+}
+# Пакети, яких не має бути серед імпортів на старті бота
+DEFERRED = ('pandas', 'ccxt')
+RSS_PROBE = "; import resource; print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)"
+
+
+def run_importtime(code: str) -> tuple:
+    """Один холодний імпорт: (сумарний час імпортів у с, пік RSS у MiB, {пакет: мкс}, всі модулі)."""
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code + RSS_PROBE],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    total_us, packages, modules = 0, {}, []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|', 2)
+        name = name.strip()
+        package = name.split('.')[0]
+        total_us += int(self_us)
+        packages[package] = packages.get(package, 0) + int(self_us)
+        modules.append(name)
+    rss_mib = int(proc.stdout.strip().splitlines()[-1]) / 1024
+    return total_us / 1e6, rss_mib, packages, modules
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10, help="скільки найважчих пакетів показати")
+    parser.add_argument('--budget-ms', type=float, default=None, help="максимум часу імпортів точки входу бота")
+    args = parser.parse_args()
+
+    failed = False
+    for label, code in ENTRY_POINTS.items():
+        runs = [run_importtime(code) for _ in range(args.runs)]
+        seconds = float(np.median([run[0] for run in runs]))
+        rss = float(np.median([run[1] for run in runs]))
+        _, _, packages, modules = runs[-1]
+        print(f"\n{label}: імпорти {seconds * 1000:.0f} ms, пік RSS {rss:.1f} MiB, модулів {len(modules)}")
+        for package, self_us in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+            print(f"   {self_us / 1000:9.1f} ms  {package}")
+
+        if label in ('run_bot', 'src (обробники і сервіси)'):
+            eager = sorted(package for package in packages if package in DEFERRED)
+            if eager:
+                print(f"   ! на старті імпортуються {eager} - мають відкладатися до прогріву")
+                failed = True
+            if args.budget_ms is not None and seconds * 1000 > args.budget_ms:
+                print(f"   ! перевищено бюджет {args.budget_ms:.0f} ms")
+                failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+# benchmarks/bench_stream.py
+"""
+Свіжість даних у потоковому режимі: StreamIngestor на фейкових стрімах
+публікує стан у FundingSnapshotCache; вимірюється, наскільки дані знімка
+відстають від останнього надісланого оновлення, і як біржа з обірваним
+стрімом переходить на REST і повертається.
+
+    python -m benchmarks.bench_stream
+"""
+import asyncio
+import time
+
+import numpy as np
+
+import benchmarks.common  # noqa: F401 - шляхи проекту
+from benchmarks.common import BENCH_EXCHANGES
+from benchmarks.fake_stream import FakeStreamExchange, StreamFeeder
+from src.services.snapshot_cache import FundingSnapshotCache
+from src.services.stream_ingest import StreamIngestor
+
+N_SYMBOLS = 400
+DURATION = 5
+PUBLISH_INTERVAL = 0.2
+EXCHANGE_MAP = {name: name.lower() for name in BENCH_EXCHANGES}
+
+
+async def main() -> None:
+    symbols = [f"C{i:04d}" for i in range(N_SYMBOLS)]
+    clients = {name: FakeStreamExchange(symbols) for name in BENCH_EXCHANGES}
+    by_id = {EXCHANGE_MAP[name]: client for name, client in clients.items()}
+    rest_calls = []
+
+    async def fake_rest(name, exchange_map):
+        rest_calls.append(name)
+        await asyncio.sleep(0.05)
+        return [{'symbol': symbol, 'rate': 0.0, 'exchange': name, 'price': 1.0} for symbol in symbols]
+
+    ingestor = StreamIngestor(EXCHANGE_MAP, client_factory=by_id.get, rest_fetch=fake_rest, poll_interval=1)
+    cache = FundingSnapshotCache(ingestor.fetch, ttl=PUBLISH_INTERVAL)
+    feeder = StreamFeeder(clients)
+
+    ingestor.start(BENCH_EXCHANGES)
+    feeder_task = asyncio.create_task(feeder.run(DURATION))
+    # Перше оновлення кожного стріму, щоб не було холодного REST-сканування
+    while len(ingestor.updated_at) < len(BENCH_EXCHANGES):
+        await asyncio.sleep(0.01)
+
+    lags, rows = [], 0
+    started = time.monotonic()
+    disconnected = False
+    while not feeder_task.done():
+        snapshot = await cache.get_snapshot(BENCH_EXCHANGES)
+        rows = len(snapshot.df)
+        # Відставання знімка від останнього оновлення стріму
+        lags.append(snapshot.age)
+        if not disconnected and time.monotonic() - started > DURATION / 3:
+            feeder.disconnect('OKX')
+            disconnected = True
+        await asyncio.sleep(0.05)
+    await asyncio.sleep(2.5)
+
+    lags = np.array(lags) * 1000
+    print(f"оновлень стріму: {feeder.sent}, застосовано: {ingestor.stats['stream_updates']}, рядків у знімку: {rows}")
+    print(f"публікацій у кеш (сканувань): {cache.stats['scans']}, версія кеша: {cache.version}")
+    print(f"вік знімка: p50 {np.percentile(lags, 50):.0f} ms, p99 {np.percentile(lags, 99):.0f} ms")
+    print(f"обривів: {ingestor.stats['reconnects']}, REST-опитувань: {ingestor.stats['rest_polls']} ({sorted(set(rest_calls))})")
+    print(f"режими після обриву: {ingestor.mode}")
+    await ingestor.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,158 @@
+# benchmarks/bench_webhook.py
+"""
+Навантажувальний стенд вебхука: WebhookServer з Application (без мережі до Telegram)
+приймає POST-и з записаними Update у форматі JSON, а кілька keep-alive клієнтів в окремому
+процесі шлють їх якомога швидше. Друкує прийняті та оброблені оновлення за секунду
+і затримку відповіді.
+
+    python -m benchmarks.bench_webhook [--updates updates.jsonl] [--count 20000] [--connections 32]
+    python -m benchmarks.bench_webhook --url http://127.0.0.1/telegram   # вже запущені процеси за проксі
+
+updates.jsonl - по одному Update на рядок (напр. поле result з getUpdates);
+без нього генеруються повідомлення з тикерами та натискання "Оновити".
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import sys
+import tempfile
+import time
+
+import aiohttp
+import numpy as np
+from telegram import Update, User
+from telegram.ext import Application, ExtBot, TypeHandler
+
+import benchmarks.common  # noqa: F401 - шляхи проекту
+from src.services.webhook_server import WebhookServer, SECRET_HEADER
+
+SECRET = "bench-secret"
+PORT = 18080
+PATH = "telegram"
+
+
+class OfflineBot(ExtBot):
+    """ExtBot, що ініціалізується без запиту getMe до Telegram."""
+
+    async def get_me(self, *args, **kwargs) -> User:
+        self._bot_user = User(1, "Bench", True, username="bench_bot")
+        return self._bot_user
+
+
+def synthesize_updates(count: int, n_chats: int = 500) -> list:
+    """Суміш текстових запитів тикерів і натискань "Оновити" від n_chats чатів."""
+    tickers = ['BTC', 'ETH', 'SOL', 'DOGE', 'XRP']
+    updates = []
+    for update_id in range(count):
+        chat_id = 10_000 + update_id % n_chats
+        user = {'id': chat_id, 'is_bot': False, 'first_name': 'Bench'}
+        message = {'message_id': update_id, 'date': int(time.time()), 'chat': {'id': chat_id, 'type': 'private'},
+                   'from': user, 'text': tickers[update_id % len(tickers)]}
+        if update_id % 3 == 0:
+            updates.append({'update_id': update_id, 'callback_query': {
+                'id': str(update_id), 'from': user, 'chat_instance': str(chat_id), 'data': 'refresh',
+                'message': message}})
+        else:
+            updates.append({'update_id': update_id, 'message': message})
+    return updates
+
+
+def load_updates(path: str) -> list:
+    with open(path, 'r') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+async def post_all(url: str, bodies: list, connections: int, secret: str) -> tuple:
+    """Шле тіла через connections keep-alive з'єднань; повертає (секунди, затримки, {статус: кількість})."""
+    latencies, statuses = [], {}
+    queue = iter(bodies)
+    headers = {SECRET_HEADER: secret, 'Content-Type': 'application/json'}
+    connector = aiohttp.TCPConnector(limit=connections)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        async def client():
+            for body in queue:
+                started = time.perf_counter()
+                async with session.post(url, data=body, headers=headers) as response:
+                    await response.read()
+                latencies.append(time.perf_counter() - started)
+                statuses[response.status] = statuses.get(response.status, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(connections)))
+        elapsed = time.perf_counter() - started
+    return elapsed, np.array(latencies), statuses
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--updates', default=None, help="JSON lines з записаними Update")
+    parser.add_argument('--count', type=int, default=20000)
+    parser.add_argument('--connections', type=int, default=32)
+    parser.add_argument('--concurrent-updates', type=int, default=64, help="Application.concurrent_updates")
+    parser.add_argument('--handler-delay', type=float, default=0.0, help="імітація роботи обробника, с")
+    parser.add_argument('--url', default=None, help="зовнішній вебхук (проксі перед процесами бота)")
+    parser.add_argument('--secret', default=SECRET)
+    args = parser.parse_args()
+
+    updates = load_updates(args.updates) if args.updates else synthesize_updates(args.count)
+    bodies = [json.dumps(update).encode() for update in itertools.islice(itertools.cycle(updates), args.count)]
+
+    # Клієнт: лише навантаження на вже запущений вебхук
+    if args.url:
+        elapsed, latencies, statuses = await post_all(args.url, bodies, args.connections, args.secret)
+        print(f"{len(bodies)} оновлень за {elapsed:.2f} с: {len(bodies) / elapsed:,.0f}/с, статуси {statuses}")
+        print(f"затримка відповіді: p50 {np.percentile(latencies, 50) * 1000:.1f} ms, "
+              f"p99 {np.percentile(latencies, 99) * 1000:.1f} ms")
+        return
+
+    processed = 0
+    done = asyncio.Event()
+
+    async def count_update(update: Update, context) -> None:
+        nonlocal processed
+        if args.handler_delay:
+            await asyncio.sleep(args.handler_delay)
+        processed += 1
+        if processed >= len(bodies):
+            done.set()
+
+    application = (
+        Application.builder()
+        .bot(OfflineBot("123456:BENCH"))
+        .updater(None)
+        .concurrent_updates(args.concurrent_updates)
+        .build()
+    )
+    application.add_handler(TypeHandler(Update, count_update))
+    server = WebhookServer(application, '127.0.0.1', PORT, PATH, SECRET)
+    async with application:
+        await application.start()
+        await server.start()
+        url = f"http://127.0.0.1:{PORT}/{PATH}"
+
+        # Перевірка secret token: чужі запити не доходять до обробників
+        _, _, rejected = await post_all(url, bodies[:3], 1, "wrong-secret")
+        print(f"чужий secret: статуси {rejected}, оброблено обробниками: {processed}")
+
+        # Навантаження з окремого процесу, щоб клієнт не ділив цикл подій і GIL із сервером
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as f:
+            f.write("\n".join(json.dumps(update) for update in updates))
+        started = time.perf_counter()
+        client = await asyncio.create_subprocess_exec(
+            sys.executable, '-m', 'benchmarks.bench_webhook', '--url', url, '--updates', f.name,
+            '--count', str(args.count), '--connections', str(args.connections)
+        )
+        await client.wait()
+        await asyncio.wait_for(done.wait(), 60)
+        processed_elapsed = time.perf_counter() - started
+        os.unlink(f.name)
+        print(f"оброблено {processed} за {processed_elapsed:.2f} с: {processed / processed_elapsed:,.0f} оновлень/с "
+              f"(разом із запуском клієнта)")
+        await server.stop()
+        await application.stop()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
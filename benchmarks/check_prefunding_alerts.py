@@ -0,0 +1,123 @@
+# benchmarks/check_prefunding_alerts.py
+"""
+Перевірка сповіщень перед виплатою від кнопки до надсилання: чат вмикає сповіщення
+в меню налаштувань (toggle_prefunding), сканування приносить кілька моментів виплат,
+і кожен тік таймера та повторні сканування не дублюють повідомлень. Моменти стають
+найближчими ще до підписки (тік без підписників їх не губить), а далі біржі підписників
+сканує сам тік.
+Чат, що ввімкнув сповіщення, має отримати рівно одне повідомлення на кожну найближчу
+виплату; чати без підписки (або з вимкненою) - жодного. Падає з AssertionError.
+
+    python -m benchmarks.check_prefunding_alerts
+"""
+import asyncio
+import collections
+import logging
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+
+import benchmarks.common  # noqa: F401 - шляхи проекту
+
+OPTED_IN = 101
+NOT_SUBSCRIBED = 102
+TOGGLED_OFF = 103
+
+
+class FakeQuery:
+    """Натискання кнопки: лише те, що викликають обробники меню налаштувань."""
+
+    def __init__(self, chat_id: int):
+        self.update = SimpleNamespace(callback_query=self, effective_chat=SimpleNamespace(id=chat_id))
+
+    async def answer(self, *args, **kwargs):
+        pass
+
+    async def edit_message_reply_markup(self, reply_markup=None):
+        pass
+
+
+class FakeSendQueue:
+    """Черга надсилання, що лише запам'ятовує (chat_id, текст)."""
+
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id: int, text: str, **kwargs):
+        self.sent.append((chat_id, text))
+
+
+async def run() -> None:
+    from src.user_manager import open_settings, close_settings, get_user_settings
+    from src.handlers.callbacks import toggle_prefunding_callback
+    from src.services import funding_service, funding_timer
+    from src.services.funding_service import ScanResult
+    from src.services.settings_view import settings_view
+
+    open_settings()
+    now = time.time()
+    # Дві виплати в межах PREFUNDING_ALERT_LEAD і одна далеко за ним
+    due = [int(now) + 120, int(now) + 300]
+    later = int(now) + 3 * 3600
+
+    scans = []
+
+    async def fake_fetch(names):
+        scans.append(sorted(names))
+        rows = {
+            name: [
+                {'symbol': f"S{i}", 'rate': 1.0 + i, 'exchange': name, 'price': 1.0,
+                 'next_funding_time': moment * 1000}
+                for i, moment in enumerate(due + [later])
+            ]
+            for name in names
+        }
+        return ScanResult(rows, [], [], 0.0)
+
+    funding_service.funding_cache.set_source(fake_fetch, ttl=60)
+    queue = FakeSendQueue()
+    funding_timer.send_queue = queue
+    application = SimpleNamespace(job_queue=SimpleNamespace(run_repeating=lambda *args, **kwargs: None))
+    funding_timer.schedule_prefunding_alerts(application)
+
+    try:
+        get_user_settings(NOT_SUBSCRIBED)
+        exchanges = get_user_settings(OPTED_IN)['exchanges']
+        # Моменти виплат уже в межах PREFUNDING_ALERT_LEAD, а підписників ще немає;
+        # тут же повне читання налаштувань - натискання нижче доходять до підписників інкрементально
+        await funding_service.get_funding_snapshot(exchanges)
+        await funding_timer.prefunding_tick(None)
+        assert not queue.sent, "сповіщення без підписників"
+        scans_before = len(scans)
+        for chat_id, presses in ((OPTED_IN, 1), (TOGGLED_OFF, 2)):
+            for _ in range(presses):
+                query = FakeQuery(chat_id)
+                await toggle_prefunding_callback(query.update, None)
+
+        for _ in range(3):
+            # Кожне сканування (його робить сам тік) знову приносить ті самі моменти виплат
+            funding_service.funding_cache.invalidate()
+            await funding_timer.prefunding_tick(None)
+    finally:
+        close_settings()
+
+    per_chat = collections.Counter(chat_id for chat_id, _ in queue.sent)
+    print(f"надіслано: {dict(per_chat)}, повних читань налаштувань: {settings_view.stats['full_loads']}")
+    assert per_chat[OPTED_IN] == len(due), f"чат з підпискою отримав {per_chat[OPTED_IN]} сповіщень, а не {len(due)}"
+    assert per_chat[NOT_SUBSCRIBED] == 0 and per_chat[TOGGLED_OFF] == 0, "сповіщення чату без підписки"
+    assert len({text for _, text in queue.sent}) == len(due), "одна виплата - одне повідомлення"
+    assert len(scans) - scans_before == 3, "тік має сканувати біржі підписників"
+    assert settings_view.stats['full_loads'] == 1, "зміни налаштувань мають застосовуватись інкрементально"
+    print("OK: одне сповіщення на виплату для кожного чату з підпискою")
+
+
+def main() -> None:
+    # Налаштування користувачів пишуться у тимчасовий каталог
+    os.chdir(tempfile.mkdtemp(prefix="check-prefunding-"))
+    logging.disable(logging.WARNING)
+    asyncio.run(run())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+# benchmarks/common.py
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# Додаємо корінь проекту до шляхів пошуку, щоб бенчмарки запускались як скрипти
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+BENCH_EXCHANGES = ['BINANCE', 'BYBIT', 'OKX', 'BITGET', 'KUCOIN', 'MEXC', 'GATE', 'HUOBI', 'BINGX']
+
+
+def make_funding_frame(n_rows: int = 10_000, seed: int = 42) -> pd.DataFrame:
+    """Синтетичний знімок: n_rows пар (символ, біржа) з реалістичним розподілом ставок."""
+    rng = np.random.default_rng(seed)
+    n_symbols = n_rows // len(BENCH_EXCHANGES) + 1
+    symbols = [f"C{i:05d}" for i in range(n_symbols)]
+    pairs = [(s, e) for s in symbols for e in BENCH_EXCHANGES][:n_rows]
+    rates = rng.standard_t(3, size=len(pairs)) * 0.05
+    return pd.DataFrame({
+        'symbol': [p[0] for p in pairs],
+        'rate': rates,
+        'exchange': [p[1] for p in pairs],
+    })
+
+
+def bench(func, repeat: int = 20) -> float:
+    """Повертає медіанний час одного виклику func() в секундах."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return float(np.median(timings))
+
+
+def report(name: str, seconds: float, rows: int | None = None) -> None:
+    line = f"{name:<45} {seconds * 1000:10.3f} ms"
+    if rows:
+        line += f"   {rows / seconds:14,.0f} rows/s"
+    print(line)
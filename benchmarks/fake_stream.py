@@ -0,0 +1,73 @@
+# benchmarks/fake_stream.py
+"""
+Локальний фейковий стрім фандінгу для StreamIngestor.
+FakeStreamExchange має інтерфейс клієнта ccxt.pro (has, load_markets,
+watch_funding_rates, close), а StreamFeeder штовхає в нього оновлення
+ставок із заданою частотою і вміє імітувати обрив з'єднання.
+"""
+import asyncio
+import time
+
+import numpy as np
+
+
+class FakeStreamExchange:
+    """Клієнт у стилі ccxt.pro, дані якого надходять від StreamFeeder."""
+
+    has = {'watchFundingRates': True}
+
+    def __init__(self, symbols: list):
+        self.symbols = symbols
+        self._updates = asyncio.Queue()
+        self.connected = True
+
+    async def load_markets(self) -> dict:
+        return {
+            f"{symbol}/USDT:USDT": {'symbol': f"{symbol}/USDT:USDT", 'swap': True, 'quote': 'USDT'}
+            for symbol in self.symbols
+        }
+
+    async def watch_funding_rates(self, symbols: list) -> dict:
+        update = await self._updates.get()
+        if isinstance(update, Exception):
+            raise update
+        return update
+
+    def push(self, update) -> None:
+        self._updates.put_nowait(update)
+
+    async def close(self) -> None:
+        self.connected = False
+
+
+class StreamFeeder:
+    """Генерує оновлення ставок для кількох фейкових бірж; оновлення несе час відправки."""
+
+    def __init__(self, clients: dict, rate_per_second: float = 50, batch: int = 20, seed: int = 42):
+        self.clients = clients
+        self.interval = 1 / rate_per_second
+        self.batch = batch
+        self.rng = np.random.default_rng(seed)
+        self.sent = 0
+        self.last_sent = {}
+
+    def _update(self, client: FakeStreamExchange) -> dict:
+        symbols = self.rng.choice(client.symbols, size=min(self.batch, len(client.symbols)), replace=False)
+        rates = self.rng.standard_t(3, size=len(symbols)) * 0.0005
+        now = time.monotonic()
+        return {
+            f"{symbol}/USDT:USDT": {'fundingRate': float(rate), 'markPrice': 1.0, 'timestamp': now}
+            for symbol, rate in zip(symbols, rates)
+        }
+
+    async def run(self, duration: float) -> None:
+        deadline = time.monotonic() + duration
+        while time.monotonic() < deadline:
+            for name, client in self.clients.items():
+                client.push(self._update(client))
+                self.last_sent[name] = time.monotonic()
+                self.sent += 1
+            await asyncio.sleep(self.interval)
+
+    def disconnect(self, name: str) -> None:
+        self.clients[name].push(ConnectionError("fake stream closed"))
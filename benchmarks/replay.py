@@ -0,0 +1,179 @@
+# benchmarks/replay.py
+"""
+Запис і відтворення відповідей бірж без мережі.
+
+Recorder знімає реальні відповіді load_markets / fetch_funding_rates / fetch_tickers
+у JSON-фікстури (по каталогу на біржу). FakeExchange / AsyncFakeExchange відтворюють
+їх із заданою затримкою та ймовірністю збою, а install_fake_ccxt() підміняє класи
+бірж у ccxt і ccxt.async_support, тож funding_service працює як з живими біржами.
+
+    python -m benchmarks.replay record --out benchmarks/fixtures
+    python -m benchmarks.replay synth --out benchmarks/fixtures --symbols 500
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import time
+
+import ccxt
+import ccxt.async_support as ccxt_async
+
+import benchmarks.common  # noqa: F401 - шляхи проекту
+from src.config import AVAILABLE_EXCHANGES
+
+METHODS = ('load_markets', 'fetch_funding_rates', 'fetch_tickers')
+# Позначка у фікстурі: біржа не підтримує метод (відтворюється як ccxt.NotSupported)
+NOT_SUPPORTED = {'__not_supported__': True}
+
+
+# --- Запис ---
+def record_exchange(exchange_id: str, out_dir: str) -> None:
+    """Знімає відповіді однієї біржі у out_dir/<exchange_id>/<метод>.json."""
+    exchange = getattr(ccxt, exchange_id)({'timeout': 20000})
+    directory = os.path.join(out_dir, exchange_id)
+    os.makedirs(directory, exist_ok=True)
+    markets = exchange.load_markets()
+    responses = {'load_markets': markets}
+    try:
+        responses['fetch_funding_rates'] = exchange.fetch_funding_rates()
+    except ccxt.NotSupported:
+        responses['fetch_funding_rates'] = NOT_SUPPORTED
+    swap_symbols = [m['symbol'] for m in markets.values() if m.get('swap') and m.get('quote', '').upper() == 'USDT']
+    responses['fetch_tickers'] = exchange.fetch_tickers(swap_symbols)
+    for method, data in responses.items():
+        with open(os.path.join(directory, f"{method}.json"), 'w') as f:
+            json.dump(data, f, default=str)
+    print(f"{exchange_id}: записано {len(markets)} ринків")
+
+
+def synthesize_fixtures(out_dir: str, n_symbols: int = 500, seed: int = 42) -> None:
+    """Синтетичні фікстури у форматі ccxt для всіх бірж з AVAILABLE_EXCHANGES (коли запис недоступний)."""
+    rng = random.Random(seed)
+    for index, exchange_id in enumerate(AVAILABLE_EXCHANGES.values()):
+        directory = os.path.join(out_dir, exchange_id)
+        os.makedirs(directory, exist_ok=True)
+        symbols = [f"C{i:04d}/USDT:USDT" for i in range(n_symbols)]
+        markets = {s: {'symbol': s, 'swap': True, 'quote': 'USDT', 'base': s.split('/')[0]} for s in symbols}
+        rates = {
+            s: {'symbol': s, 'fundingRate': rng.gauss(0, 0.0005), 'markPrice': rng.uniform(0.1, 100),
+                'fundingTimestamp': int(time.time() // 28800 + 1) * 28800000}
+            for s in symbols
+        }
+        tickers = {s: {'symbol': s, 'last': r['markPrice'], 'info': {'fundingRate': r['fundingRate']}}
+                   for s, r in rates.items()}
+        # Кожна третя біржа - без fetch_funding_rates, щоб відтворювався і шлях через тикери
+        responses = {
+            'load_markets': markets,
+            'fetch_funding_rates': NOT_SUPPORTED if index % 3 == 2 else rates,
+            'fetch_tickers': tickers,
+        }
+        for method, data in responses.items():
+            with open(os.path.join(directory, f"{method}.json"), 'w') as f:
+                json.dump(data, f)
+
+
+# --- Відтворення ---
+class FakeExchange:
+    """Синхронна біржа ccxt, що відтворює фікстури із затримкою та ін'єкцією збоїв."""
+
+    def __init__(self, exchange_id: str, fixtures_dir: str, latency: float = 0.0,
+                 failure_rate: float = 0.0, seed: int | None = None, config: dict | None = None):
+        self.id = exchange_id
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.timeout = (config or {}).get('timeout', 20000)
+        self.markets = None
+        self.calls = {method: 0 for method in METHODS}
+        self._rng = random.Random(seed)
+        self._responses = {}
+        for method in METHODS:
+            with open(os.path.join(fixtures_dir, exchange_id, f"{method}.json"), 'r') as f:
+                self._responses[method] = json.load(f)
+
+    def _respond(self, method: str):
+        self.calls[method] += 1
+        if self._rng.random() < self.failure_rate:
+            raise ccxt.RequestTimeout(f"{self.id} {method}: ін'єкція збою")
+        data = self._responses[method]
+        if data == NOT_SUPPORTED:
+            raise ccxt.NotSupported(f"{self.id} {method}")
+        return data
+
+    def load_markets(self, reload: bool = False) -> dict:
+        time.sleep(self.latency)
+        self.markets = self._respond('load_markets')
+        return self.markets
+
+    def fetch_funding_rates(self, symbols=None) -> dict:
+        time.sleep(self.latency)
+        return self._respond('fetch_funding_rates')
+
+    def fetch_tickers(self, symbols=None) -> dict:
+        time.sleep(self.latency)
+        tickers = self._respond('fetch_tickers')
+        return {s: t for s, t in tickers.items() if symbols is None or s in symbols}
+
+
+class AsyncFakeExchange(FakeExchange):
+    """Асинхронний варіант для ExchangePool (ccxt.async_support)."""
+
+    async def load_markets(self, reload: bool = False) -> dict:
+        await asyncio.sleep(self.latency)
+        self.markets = self._respond('load_markets')
+        return self.markets
+
+    async def fetch_funding_rates(self, symbols=None) -> dict:
+        await asyncio.sleep(self.latency)
+        return self._respond('fetch_funding_rates')
+
+    async def fetch_tickers(self, symbols=None) -> dict:
+        await asyncio.sleep(self.latency)
+        tickers = self._respond('fetch_tickers')
+        return {s: t for s, t in tickers.items() if symbols is None or s in symbols}
+
+    async def close(self) -> None:
+        pass
+
+
+@contextlib.contextmanager
+def install_fake_ccxt(fixtures_dir: str, latency: float = 0.0, failure_rate: float = 0.0, seed: int = 42):
+    """Тимчасово підміняє класи бірж з AVAILABLE_EXCHANGES у ccxt та ccxt.async_support на фейкові."""
+    originals = []
+    for module, fake_class in ((ccxt, FakeExchange), (ccxt_async, AsyncFakeExchange)):
+        for exchange_id in AVAILABLE_EXCHANGES.values():
+            # Старі ID (напр. huobi) можуть бути відсутні в новіших версіях ccxt
+            originals.append((module, exchange_id, getattr(module, exchange_id, None)))
+            setattr(module, exchange_id, lambda config=None, _id=exchange_id, _cls=fake_class: _cls(
+                _id, fixtures_dir, latency, failure_rate, seed, config))
+    try:
+        yield
+    finally:
+        for module, exchange_id, original in originals:
+            if original is None:
+                delattr(module, exchange_id)
+            else:
+                setattr(module, exchange_id, original)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['record', 'synth'])
+    parser.add_argument('--out', default=os.path.join(os.path.dirname(__file__), 'fixtures'))
+    parser.add_argument('--exchanges', default=','.join(AVAILABLE_EXCHANGES.values()))
+    parser.add_argument('--symbols', type=int, default=500)
+    args = parser.parse_args()
+    if args.command == 'record':
+        for exchange_id in args.exchanges.split(','):
+            try:
+                record_exchange(exchange_id, args.out)
+            except Exception as e:
+                print(f"{exchange_id}: не вдалося записати ({e})")
+    else:
+        synthesize_fixtures(args.out, args.symbols)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,21 +1,33 @@
 # run_bot.py (Версія 2.20)
+from __future__ import annotations
 
 import os
 import logging
 import html
 import asyncio
-import pandas as pd
+import functools
+import numpy as np
 from dotenv import load_dotenv
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import Application, CommandHandler, CallbackQueryHandler, MessageHandler, ContextTypes, filters, ConversationHandler
 from telegram.constants import ParseMode
 from telegram.error import BadRequest
-import ccxt
+from src.services.snapshot_cache import FundingSnapshotCache
+from src.services.columnar import ColumnarSnapshot
+from src.services import renderer
+from src.services.render_cache import RenderCache, SentTextTracker, make_render_key
+from src.services.funding_service import fetch_all_funding_data, exchange_pool, warm_up
+from src.lazy_imports import LazyModule
+from src.services.webhook_server import WebhookServer, run_webhook
+from src.services.symbol_index import normalize_symbol
+from src.services.history_store import FundingHistoryStore
 
 # --- НАЛАШТУВАННЯ ---
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 logging.getLogger("httpx").setLevel(logging.WARNING)
+# pandas потрібен лише для звітів: імпортується при першому використанні або у фоновому прогріві
+pd = LazyModule('pandas')
 BOT_VERSION = "v2.20"
 
 # --- КОНФІГУРАЦІЯ ---
@@ -28,40 +40,30 @@ EXCHANGE_URL_TEMPLATES = {
     'GATE': 'https://www.gate.io/futures_trade/USDT/{symbol_base}_USDT', 'HUOBI': 'https://futures.huobi.com/en-us/linear_swap/exchange/swap_trade/?contract_code={symbol}-USDT',
     'BINGX': 'https://swap.bingx.com/en-us/{symbol}-USDT'
 }
-DEFAULT_SETTINGS = {"threshold": 0.3, "exchanges": ['BINANCE', 'BYBIT', 'OKX', 'BITGET', 'KUCOIN', 'MEXC', 'GATE'], "blacklist": []}
+DEFAULT_SETTINGS = {"threshold": 0.3, "exchanges": ['BINANCE', 'BYBIT', 'OKX', 'BITGET', 'KUCOIN', 'MEXC', 'GATE'], "blacklist": [], "whitelist": []}
+# Списки символів у налаштуваннях: точні тикери або glob-шаблони (1000*, *DOWN); білий список, якщо не порожній, обмежує звіти лише ним
+FILTER_LISTS = {'blacklist': ("🚫", "Чорний список", "чорного списку"), 'whitelist': ("✅", "Білий список", "білого списку")}
 TOP_N = 10
+FUNDING_CACHE_TTL = 60  # секунд, поки дані біржі вважаються свіжими
+SCAN_DEADLINE = 4  # секунд на все сканування; біржі, що не встигли, пропускаються
+RENDER_CACHE_SIZE = 512  # відрендерених звітів у LRU-кеші
+HISTORY_DIR = "data/history"  # сегменти історії ставок
+HISTORY_SAMPLE_INTERVAL = 300  # секунд між записами однієї біржі в історію
+UPDATE_MODE = "polling"  # 'polling' або 'webhook' (WEBHOOK_URL і WEBHOOK_SECRET з .env; налаштування в пам'яті - лише один процес)
+WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH = "127.0.0.1", 8080, "telegram"
 (SET_THRESHOLD_STATE, ADD_TO_BLACKLIST_STATE, REMOVE_FROM_BLACKLIST_STATE) = range(3)
 HELP_URL = "https://www.google.com/search?q=aistudio+google+com"
 
 # --- СЕРВІСНІ ФУНКЦІЇ ---
-def get_all_funding_data_sequential(enabled_exchanges: list) -> pd.DataFrame:
-    all_rates = []
-    # ... (код цієї функції не змінюється)
-    for name in enabled_exchanges:
-        exchange_id = AVAILABLE_EXCHANGES.get(name)
-        if not exchange_id: continue
-        exchange = getattr(ccxt, exchange_id)({'timeout': 20000})
-        try:
-            funding_rates_data = exchange.fetch_funding_rates()
-            for symbol, data in funding_rates_data.items():
-                if 'USDT' in symbol and data.get('fundingRate') is not None:
-                    all_rates.append({'symbol': symbol.split('/')[0], 'rate': data['fundingRate'] * 100, 'exchange': name})
-        except ccxt.NotSupported:
-            try:
-                markets = exchange.load_markets()
-                swap_symbols = [m['symbol'] for m in markets.values() if m.get('swap') and m.get('quote', '').upper() == 'USDT']
-                if not swap_symbols: continue
-                tickers = exchange.fetch_tickers(swap_symbols)
-                for symbol, ticker in tickers.items():
-                    rate_info = None
-                    if 'fundingRate' in ticker: rate_info = ticker['fundingRate']
-                    elif isinstance(ticker.get('info'), dict) and 'fundingRate' in ticker['info']: rate_info = ticker['info']['fundingRate']
-                    if rate_info is not None:
-                        all_rates.append({'symbol': symbol.split('/')[0], 'rate': float(rate_info) * 100, 'exchange': name})
-            except Exception as e: logger.error(f"Альт. метод для {name}: {e}")
-        except Exception as e: logger.error(f"Загальна помилка для {name}: {e}")
-    if not all_rates: return pd.DataFrame()
-    return pd.DataFrame(all_rates).drop_duplicates(subset=['symbol', 'exchange'], keep='first')
+# Паралельне сканування з глобальним дедлайном; біржі беремо з конфігурації цього файлу
+fetch_funding_data = functools.partial(fetch_all_funding_data, deadline=SCAN_DEADLINE, exchange_map=AVAILABLE_EXCHANGES)
+# Спільний кеш: один скан біржі обслуговує всі чати, поки запис не застаріє
+funding_cache = FundingSnapshotCache(fetch_funding_data, ttl=FUNDING_CACHE_TTL)
+# Чати з однаковими налаштуваннями отримують той самий текст без повторного рендерингу
+render_cache = RenderCache(RENDER_CACHE_SIZE)
+sent_texts = SentTextTracker()
+# Історія ставок: кожне сканування кешу дописується в сегменти на диску (створюється в post_init, не при імпорті)
+history_store = None
 
 # --- РОБОТА З НАЛАШТУВАННЯМИ ---
 _user_settings_cache = {}
@@ -76,14 +78,17 @@ def get_main_menu_keyboard(): return InlineKeyboardMarkup([[InlineKeyboardButton
 def get_settings_menu_keyboard(settings: dict):
     return InlineKeyboardMarkup([
         [InlineKeyboardButton("🌐 Біржі", callback_data="settings_exchanges"), InlineKeyboardButton(f"📊 Фандінг: > {settings['threshold']}%", callback_data="settings_threshold")],
-        [InlineKeyboardButton("🚫 Чорний список", callback_data="blacklist_menu"), InlineKeyboardButton("📊 Фандінг + Спред", callback_data="show_funding_spread")],
+        [InlineKeyboardButton("🚫 Чорний список", callback_data="blacklist_menu"), InlineKeyboardButton("✅ Білий список", callback_data="whitelist_menu")],
+        [InlineKeyboardButton("📊 Фандінг + Спред", callback_data="show_funding_spread")],
         [InlineKeyboardButton("ℹ️ Довідка", url=HELP_URL), InlineKeyboardButton("↩️ Назад", callback_data="close_settings")]
     ])
-def get_blacklist_menu_keyboard(blacklist: list):
-    text = "🚫 Ваш чорний список:\n"
-    if blacklist: text += "<code>" + ", ".join(blacklist) + "</code>"
+def get_filter_list_menu_keyboard(list_name: str, entries: list):
+    icon, title, _ = FILTER_LISTS[list_name]
+    text = f"{icon} Ваш {title.lower()}:\n"
+    if entries: text += "<code>" + html.escape(", ".join(entries)) + "</code>"
     else: text += "<i>Порожній</i>"
-    keyboard = [[InlineKeyboardButton("➕ Додати", callback_data="add_to_blacklist"), InlineKeyboardButton("➖ Видалити", callback_data="remove_from_blacklist")], [InlineKeyboardButton("↩️ Назад до налаштувань", callback_data="settings_menu")]]
+    text += "\n\n<i>Можна вказувати шаблони: 1000* - усі монети, що починаються з 1000, *DOWN - що закінчуються на DOWN.</i>"
+    keyboard = [[InlineKeyboardButton("➕ Додати", callback_data=f"add_to_{list_name}"), InlineKeyboardButton("➖ Видалити", callback_data=f"remove_from_{list_name}")], [InlineKeyboardButton("↩️ Назад до налаштувань", callback_data="settings_menu")]]
     return text, InlineKeyboardMarkup(keyboard)
 def get_back_to_settings_keyboard(): return InlineKeyboardMarkup([[InlineKeyboardButton("↩️ Назад", callback_data="settings_menu")]])
 def get_ticker_menu_keyboard(ticker: str): return InlineKeyboardMarkup([[InlineKeyboardButton("🔄 Оновити", callback_data=f"refresh_ticker_{ticker}"), InlineKeyboardButton("↩️ Назад", callback_data="refresh")]])
@@ -103,45 +108,83 @@ def get_trade_link(exchange: str, symbol: str) -> str:
     if not template: return ""
     return template.format(symbol=f"{symbol}USDT", symbol_base=symbol, symbol_hyphen=f"{symbol}-USDT")
 
-def format_funding_update(df: pd.DataFrame, threshold: float, blacklist: list) -> str:
+def format_age(age) -> str:
+    if age is None: return ""
+    return f" · дані {int(age)} с тому" if age < 60 else f" · дані {int(age // 60)} хв тому"
+def format_missed(missed, stale=None) -> str:
+    text = f"\n<i>⏳ Не встигли: {', '.join(missed)}</i>" if missed else ""
+    # Запобіжник відкрито: біржа не опитувалась, показані її останні дані
+    return text + (f"\n<i>⚠️ Застарілі дані: {', '.join(stale)}</i>" if stale else "")
+
+def _format_funding_body(df: pd.DataFrame, threshold: float, blacklist: list, columnar=None, whitelist=None) -> str:
     if df.empty: return "Не знайдено даних по фандінгу."
-    df = df[~df['symbol'].isin(blacklist)]
-    df['abs_rate'] = df['rate'].abs()
-    best_offers = df.loc[df.groupby('symbol')['abs_rate'].idxmax()]
-    filtered_df = best_offers[best_offers['abs_rate'] >= threshold].copy()
-    filtered_df.sort_values('abs_rate', ascending=False, inplace=True)
-    filtered_df = filtered_df.head(TOP_N)
-    if filtered_df.empty: return f"🟢 Немає монет з фандингом вище <b>{threshold}%</b> або нижче <b>-{threshold}%</b>."
-    header = f"<b>💎 Топ-{len(filtered_df)} сигналів (поріг > {threshold}%)</b>"
-    
-    lines = []
-    for _, row in filtered_df.iterrows():
-        emoji = "🟢" if row['rate'] < 0 else "🔴"
-        # ВИПРАВЛЕНО: Форматування як у звіті по тикеру
-        symbol_part = f"<code>{row['symbol']:<9}</code>"
-        rate_part = f"<b>{row['rate']:>8.4f}%</b>"
-        link = get_trade_link(row['exchange'], row['symbol'])
-        exchange_str = f'<a href="{link}">{row["exchange"]}</a>'
-        lines.append(f"{emoji}  {symbol_part}  |  {rate_part}  |  {exchange_str}")
-    
-    footer = f"\n\n<i>{BOT_VERSION}</i>"
-    return f"{header}\n\n" + "\n".join(lines) + footer
+    # Колонковий знімок будується раз на версію; топ-N - бінарний пошук по порогу плюс зріз
+    if columnar is None: columnar = ColumnarSnapshot(df)
+    # Чорний/білий списки - закешована маска профілю над символами знімка
+    rows = columnar.top_n(threshold, TOP_N, blacklist, whitelist)
+    if len(rows) == 0: return f"🟢 Немає монет з фандингом вище <b>{threshold}%</b> або нижче <b>-{threshold}%</b>."
+    header = f"<b>💎 Топ-{len(rows)} сигналів (поріг > {threshold}%)</b>"
+    # Колонки рядків будуються векторно; посилання беруться з попередньо обчисленого масиву знімка
+    rates = columnar.rate[rows]
+    return f"{header}\n\n" + renderer.join_lines(
+        np.where(rates < 0, "🟢", "🔴").astype(object), "  <code>", renderer.ljust(columnar.symbol_names(rows), 9),
+        "</code>  |  <b>", renderer.format_numbers(rates, "%8.4f"), '%</b>  |  <a href="',
+        columnar.trade_links(get_trade_link)[rows], '">', renderer.as_text(columnar.exchange_names(rows)), "</a>")
+
+def format_funding_update(df: pd.DataFrame, threshold: float, blacklist: list, age=None, missed=None, columnar=None, cache_key=None, stale=None, whitelist=None) -> str:
+    # Тіло звіту кешується за (версія знімка, налаштування); вік даних дописується щоразу заново
+    body = render_cache.get_or_render(cache_key, lambda: _format_funding_body(df, threshold, blacklist, columnar, whitelist))
+    return body + f"\n\n<i>{BOT_VERSION}{format_age(age)}</i>" + format_missed(missed, stale)
+
+def _format_spread_body(spreads, threshold: float, blacklist: list, whitelist=None) -> str:
+    # Пари біржа short / біржа long вже обчислені матрицями знімка; тут лише зріз і рендер
+    pairs = spreads.top_n(threshold, TOP_N, blacklist, whitelist)
+    if len(pairs) == 0: return f"🟢 Немає монет з різницею фандінгу між біржами вище <b>{threshold}%</b>."
+    header = f"<b>📊 Топ-{len(pairs)} спредів фандінгу (різниця > {threshold}%)</b>"
+    symbols, shorts, longs = spreads.symbol_names(pairs), spreads.short_exchanges(pairs), spreads.long_exchanges(pairs)
+    price_diff = spreads.price_diff[pairs]
+    price_text = np.where(np.isfinite(price_diff), renderer.concat(renderer.format_numbers(price_diff, "%+.3f"), "%"), "n/a")
+    return f"{header}\n<i>LONG - де платять менше, SHORT - де платять більше; ціна - відхилення SHORT від LONG</i>\n\n" + renderer.join_lines(
+        "🔁  <code>", renderer.ljust(symbols, 9), "</code>  |  Δ <b>", renderer.format_numbers(spreads.diff[pairs], "%.4f"),
+        "%</b>\n      🟢 LONG <a href='", renderer.build_trade_links(longs, symbols, get_trade_link), "'>", renderer.as_text(longs),
+        "</a> ", renderer.format_numbers(spreads.long_rates(pairs), "%.4f"),
+        "%  /  🔴 SHORT <a href='", renderer.build_trade_links(shorts, symbols, get_trade_link), "'>", renderer.as_text(shorts),
+        "</a> ", renderer.format_numbers(spreads.short_rates(pairs), "%.4f"), "%  |  ціна ", price_text.astype(object))
+
+def format_spread_update(snapshot, threshold: float, blacklist: list, cache_key=None, whitelist=None) -> str:
+    body = "Не знайдено даних по фандінгу." if snapshot.df.empty else render_cache.get_or_render(cache_key, lambda: _format_spread_body(snapshot.spreads, threshold, blacklist, whitelist))
+    return body + f"\n\n<i>{BOT_VERSION}{format_age(snapshot.age)}</i>" + format_missed(snapshot.missed, snapshot.stale)
+
+def _format_averages(symbols, exchanges, averages) -> np.ndarray | str:
+    # Середні з історії поруч з поточною ставкою; без історії колонки немає
+    if not averages: return ""
+    def cell(key):
+        values = averages.get(key)
+        if values is None: return ""
+        return "  |  <i>avg 24h / 7d: " + " / ".join("n/a" if np.isnan(v) else f"{v:.4f}%" for v in values) + "</i>"
+    return np.array([cell(key) for key in zip(symbols, exchanges)], dtype=object)
 
-def format_ticker_info(df: pd.DataFrame, ticker: str) -> str:
-    # Ця функція залишається без змін (з v2.16)
+def _format_ticker_body(df: pd.DataFrame, ticker: str, columnar=None, averages=None) -> str:
+    # Не змінює df (він може бути зрізом спільного знімка); columnar - колонковий вигляд цього знімка
     if df.empty: return f"Не знайдено даних для <b>{html.escape(ticker)}</b>."
     header = f"💰 <b>Фандінг для <code>{html.escape(ticker.upper())}</code></b>"
-    df['abs_rate'] = df['rate'].abs()
-    df.sort_values(by='abs_rate', ascending=False, inplace=True)
-    lines = []
-    for _, row in df.iterrows():
-        emoji = "🟢" if row['rate'] < 0 else "🔴"
-        link = get_trade_link(row['exchange'], row['symbol'])
-        direction_str = f"<a href='{link}'>{'LONG' if row['rate'] < 0 else 'SHORT'}</a>"
-        rate_part = f"<b>{row['rate']:.4f}%</b>"
-        exchange_name = row['exchange']
-        lines.append(f"{emoji}  {direction_str}  |  {rate_part}  |  {exchange_name}")
-    return f"{header}\n\n" + "\n".join(lines) + "\n\n"
+    rates = df['rate'].to_numpy()
+    order = np.argsort(-np.abs(rates), kind='stable')
+    rates = rates[order]
+    links = renderer.links_for(df, get_trade_link, columnar)[order]
+    exchanges = df['exchange'].to_numpy()[order]
+    return f"{header}\n\n" + renderer.join_lines(
+        np.where(rates < 0, "🟢", "🔴").astype(object), "  <a href='", links, "'>",
+        np.where(rates < 0, "LONG", "SHORT").astype(object), "</a>  |  <b>", renderer.format_numbers(rates, "%.4f"),
+        "%</b>  |  ", renderer.as_text(exchanges),
+        _format_averages(df['symbol'].to_numpy()[order], exchanges, averages)) + "\n\n"
+
+def format_ticker_info(df: pd.DataFrame, ticker: str, age=None, missed=None, columnar=None, cache_key=None, averages=None, stale=None) -> str:
+    body = render_cache.get_or_render(cache_key, lambda: _format_ticker_body(df, ticker, columnar, averages))
+    return body + (f"<i>{format_age(age).lstrip(' ·')}</i>" if age is not None else "") + format_missed(missed, stale)
+
+def ticker_averages(df_ticker: pd.DataFrame) -> dict:
+    return history_store.average_rates(df_ticker['symbol'].unique()) if history_store is not None and not df_ticker.empty else {}
 
 # --- ОБРОБНИКИ ТЕЛЕГРАМ ---
 # ... (всі обробники залишаються без змін)
@@ -163,14 +206,30 @@ async def show_funding_report(update: Update, context: ContextTypes.DEFAULT_TYPE
     except: pass
     processing_message = await context.bot.send_message(chat_id, "Починаю пошук фандінгу...")
     try:
-        df = get_all_funding_data_sequential(settings['exchanges'])
-        message_text = format_funding_update(df, settings['threshold'], settings.get('blacklist', []))
+        snapshot = await funding_cache.get_snapshot(settings['exchanges'])
+        message_text = format_funding_update(snapshot.df, settings['threshold'], settings.get('blacklist', []), snapshot.age, snapshot.missed, snapshot.columnar, make_render_key('funding', snapshot, settings), snapshot.stale, settings.get('whitelist', []))
         await processing_message.edit_text(text=message_text, parse_mode=ParseMode.HTML, reply_markup=get_main_menu_keyboard(), disable_web_page_preview=True)
     except Exception as e:
         logger.error(f"Помилка в show_funding_report: {e}", exc_info=True)
         await processing_message.edit_text("😔 Виникла помилка.")
 async def show_funding_spread(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    query = update.callback_query; await query.answer("Ця функція знаходиться в розробці.", show_alert=True)
+    query = update.callback_query; await query.answer()
+    chat_id = query.message.chat.id
+    settings = get_user_settings(chat_id)
+    if 'start_message_id' in context.user_data:
+        try: await context.bot.delete_message(chat_id=chat_id, message_id=context.user_data.pop('start_message_id'))
+        except: pass
+    try: await query.message.delete()
+    except: pass
+    processing_message = await context.bot.send_message(chat_id, "Шукаю спреди фандінгу...")
+    try:
+        # Той самий кешований знімок, що й у звіті фандінгу: жодних додаткових запитів до бірж
+        snapshot = await funding_cache.get_snapshot(settings['exchanges'])
+        message_text = format_spread_update(snapshot, settings['threshold'], settings.get('blacklist', []), make_render_key('spread', snapshot, settings), settings.get('whitelist', []))
+        await processing_message.edit_text(text=message_text, parse_mode=ParseMode.HTML, reply_markup=get_main_menu_keyboard(), disable_web_page_preview=True)
+    except Exception as e:
+        logger.error(f"Помилка в show_funding_spread: {e}", exc_info=True)
+        await processing_message.edit_text("😔 Виникла помилка.")
 async def refresh_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await show_funding_report(update, context)
 async def settings_menu_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -215,21 +274,29 @@ async def ticker_message_handler(update: Update, context: ContextTypes.DEFAULT_T
     if not update.message or not update.message.text: return
     try: float(update.message.text.strip().replace(',', '.')); return
     except ValueError: pass
-    ticker = update.message.text.strip().upper()
+    # Псевдоніми (btc-usdt, BTC/USDT:USDT, 1000PEPE) зводяться до базового символу
+    ticker = normalize_symbol(update.message.text) or update.message.text.strip().upper()
     settings = get_user_settings(update.effective_chat.id)
     message = await update.message.reply_text(f"Шукаю <b>{html.escape(ticker)}</b>...", parse_mode=ParseMode.HTML)
-    df = get_all_funding_data_sequential(settings['exchanges'])
-    df_ticker = df[df['symbol'] == ticker]
-    message_text = format_ticker_info(df_ticker, ticker)
+    snapshot = await funding_cache.get_snapshot(settings['exchanges'])
+    df_ticker = snapshot.ticker_frame(ticker)
+    message_text = format_ticker_info(df_ticker, ticker, snapshot.age, snapshot.missed, snapshot.columnar, make_render_key('ticker', snapshot, settings, ticker), ticker_averages(df_ticker), snapshot.stale)
     await message.edit_text(message_text, parse_mode=ParseMode.HTML, reply_markup=get_ticker_menu_keyboard(ticker), disable_web_page_preview=True)
 async def refresh_ticker_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query; ticker = query.data.split('_')[-1]
     await query.answer(f"Оновлюю {ticker}...")
     settings = get_user_settings(query.message.chat.id)
-    df = get_all_funding_data_sequential(settings['exchanges'])
-    df_ticker = df[df['symbol'] == ticker]
-    message_text = format_ticker_info(df_ticker, ticker)
-    try: await query.edit_message_text(text=message_text, parse_mode=ParseMode.HTML, reply_markup=get_ticker_menu_keyboard(ticker), disable_web_page_preview=True)
+    snapshot = await funding_cache.get_snapshot(settings['exchanges'])
+    df_ticker = snapshot.ticker_frame(ticker)
+    cache_key, averages = make_render_key('ticker', snapshot, settings, ticker), ticker_averages(df_ticker)
+    # Дані не змінились - не робимо зайвий запит (і не ловимо "message is not modified"); вік не порівнюється
+    content = format_ticker_info(df_ticker, ticker, None, snapshot.missed, snapshot.columnar, cache_key, averages, snapshot.stale)
+    chat_id, message_id = query.message.chat.id, query.message.message_id
+    if sent_texts.is_unchanged(chat_id, message_id, content, query.message.text): return
+    message_text = format_ticker_info(df_ticker, ticker, snapshot.age, snapshot.missed, snapshot.columnar, cache_key, averages, snapshot.stale)
+    try:
+        edited = await query.edit_message_text(text=message_text, parse_mode=ParseMode.HTML, reply_markup=get_ticker_menu_keyboard(ticker), disable_web_page_preview=True)
+        sent_texts.remember(chat_id, message_id, content, getattr(edited, 'text', None))
     except Exception as e: logger.error(f"ПОМИЛКА в refresh_ticker_callback: {e}", exc_info=True)
 async def exchange_menu_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query; await query.answer()
@@ -243,25 +310,29 @@ async def toggle_exchange_callback(update: Update, context: ContextTypes.DEFAULT
     update_user_setting(query.message.chat.id, 'exchanges', settings['exchanges'])
     await query.edit_message_reply_markup(reply_markup=get_exchange_selection_keyboard(settings['exchanges']))
     await query.answer(f"Біржа {exchange_name} оновлена")
-async def blacklist_menu_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def filter_list_menu_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query; await query.answer()
+    list_name = query.data.removesuffix("_menu")
     settings = get_user_settings(query.message.chat.id)
-    text, keyboard = get_blacklist_menu_keyboard(settings.get('blacklist', []))
+    text, keyboard = get_filter_list_menu_keyboard(list_name, settings.get(list_name, []))
     await query.edit_message_text(text, parse_mode=ParseMode.HTML, reply_markup=keyboard)
-async def add_to_blacklist_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def add_to_filter_list_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query; await query.answer()
-    sent_message = await query.message.reply_text("Надішліть назви монет для додавання в чорний список.")
+    context.user_data['filter_list'] = query.data.removeprefix("add_to_")
+    sent_message = await query.message.reply_text(f"Надішліть назви монет або шаблони (напр. 1000*, *DOWN) для додавання до {FILTER_LISTS[context.user_data['filter_list']][2]}.")
     context.user_data['prompt_message_id'] = sent_message.message_id
     context.user_data['settings_message_id'] = query.message.message_id
     return ADD_TO_BLACKLIST_STATE
-async def add_to_blacklist_conversation(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def add_to_filter_list_conversation(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not update.message or not update.message.text: return ConversationHandler.END
     chat_id = update.effective_chat.id; settings = get_user_settings(chat_id)
-    blacklist = settings.get('blacklist', [])
+    list_name = context.user_data.pop('filter_list', 'blacklist')
+    # Копія: DEFAULT_SETTINGS.copy() поверхнева, і список не повинен бути спільним для всіх чатів
+    entries = list(settings.get(list_name, []))
     new_tickers = {t.strip().upper() for t in update.message.text.replace(",", " ").split()}
-    added_count = len(new_tickers - set(blacklist))
-    blacklist.extend(list(new_tickers - set(blacklist)))
-    update_user_setting(chat_id, 'blacklist', blacklist)
+    added_count = len(new_tickers - set(entries))
+    entries.extend(list(new_tickers - set(entries)))
+    update_user_setting(chat_id, list_name, entries)
     prompt_message_id = context.user_data.pop('prompt_message_id', None)
     if prompt_message_id:
         try: await context.bot.delete_message(chat_id, prompt_message_id)
@@ -271,25 +342,27 @@ async def add_to_blacklist_conversation(update: Update, context: ContextTypes.DE
         try: await context.bot.delete_message(chat_id, settings_message_id)
         except: pass
     await update.message.delete()
-    success_msg = await context.bot.send_message(chat_id, f"✅ Додано {added_count} монет у чорний список.")
+    success_msg = await context.bot.send_message(chat_id, f"✅ Додано {added_count} записів до {FILTER_LISTS[list_name][2]}.")
     await asyncio.sleep(3); await success_msg.delete()
-    text, keyboard = get_blacklist_menu_keyboard(blacklist)
+    text, keyboard = get_filter_list_menu_keyboard(list_name, entries)
     await context.bot.send_message(chat_id, text, parse_mode=ParseMode.HTML, reply_markup=keyboard)
     return ConversationHandler.END
-async def remove_from_blacklist_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def remove_from_filter_list_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query; await query.answer()
-    sent_message = await query.message.reply_text("Надішліть назви монет для видалення з чорного списку.")
+    context.user_data['filter_list'] = query.data.removeprefix("remove_from_")
+    sent_message = await query.message.reply_text(f"Надішліть назви монет або шаблони для видалення з {FILTER_LISTS[context.user_data['filter_list']][2]}.")
     context.user_data['prompt_message_id'] = sent_message.message_id
     context.user_data['settings_message_id'] = query.message.message_id
     return REMOVE_FROM_BLACKLIST_STATE
-async def remove_from_blacklist_conversation(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def remove_from_filter_list_conversation(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not update.message or not update.message.text: return ConversationHandler.END
     chat_id = update.effective_chat.id; settings = get_user_settings(chat_id)
-    blacklist = settings.get('blacklist', [])
+    list_name = context.user_data.pop('filter_list', 'blacklist')
+    entries = settings.get(list_name, [])
     tickers_to_remove = {t.strip().upper() for t in update.message.text.replace(",", " ").split()}
-    removed_count = len(set(blacklist) & tickers_to_remove)
-    blacklist = [t for t in blacklist if t not in tickers_to_remove]
-    update_user_setting(chat_id, 'blacklist', blacklist)
+    removed_count = len(set(entries) & tickers_to_remove)
+    entries = [t for t in entries if t not in tickers_to_remove]
+    update_user_setting(chat_id, list_name, entries)
     prompt_message_id = context.user_data.pop('prompt_message_id', None)
     if prompt_message_id:
         try: await context.bot.delete_message(chat_id, prompt_message_id)
@@ -299,20 +372,32 @@ async def remove_from_blacklist_conversation(update: Update, context: ContextTyp
         try: await context.bot.delete_message(chat_id, settings_message_id)
         except: pass
     await update.message.delete()
-    success_msg = await context.bot.send_message(chat_id, f"✅ Видалено {removed_count} монет з чорного списку.")
+    success_msg = await context.bot.send_message(chat_id, f"✅ Видалено {removed_count} записів з {FILTER_LISTS[list_name][2]}.")
     await asyncio.sleep(3); await success_msg.delete()
-    text, keyboard = get_blacklist_menu_keyboard(blacklist)
+    text, keyboard = get_filter_list_menu_keyboard(list_name, entries)
     await context.bot.send_message(chat_id, text, parse_mode=ParseMode.HTML, reply_markup=keyboard)
     return ConversationHandler.END
 
 # --- ГОЛОВНА ФУНКЦІЯ ЗАПУСКУ ---
+async def warm_up_job(context: ContextTypes.DEFAULT_TYPE) -> None:
+    await warm_up(DEFAULT_SETTINGS['exchanges'], exchange_map=AVAILABLE_EXCHANGES)
+
+async def open_history(application: Application) -> None:
+    global history_store
+    history_store = await asyncio.to_thread(FundingHistoryStore, HISTORY_DIR, sample_interval=HISTORY_SAMPLE_INTERVAL)
+    funding_cache.add_listener(history_store.append_scan)
+
+async def close_exchange_pool(application: Application) -> None:
+    await exchange_pool.close()
+    if history_store is not None: await asyncio.to_thread(history_store.close)
+
 def main() -> None:
     load_dotenv(); TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
     if not TOKEN: logger.critical("!!! НЕ ЗНАЙДЕНО TOKEN !!!"); return
-    application = Application.builder().token(TOKEN).build()
+    application = Application.builder().token(TOKEN).post_init(open_history).post_shutdown(close_exchange_pool).build()
     
     threshold_conv = ConversationHandler(entry_points=[CallbackQueryHandler(set_threshold_callback, pattern="^settings_threshold$")], states={SET_THRESHOLD_STATE: [MessageHandler(filters.TEXT & ~filters.COMMAND, set_threshold_conversation)]}, fallbacks=[CallbackQueryHandler(settings_menu_callback, pattern="^settings_menu$")], per_message=False)
-    blacklist_conv = ConversationHandler(entry_points=[CallbackQueryHandler(add_to_blacklist_callback, pattern="^add_to_blacklist$"), CallbackQueryHandler(remove_from_blacklist_callback, pattern="^remove_from_blacklist$")], states={ADD_TO_BLACKLIST_STATE: [MessageHandler(filters.TEXT & ~filters.COMMAND, add_to_blacklist_conversation)], REMOVE_FROM_BLACKLIST_STATE: [MessageHandler(filters.TEXT & ~filters.COMMAND, remove_from_blacklist_conversation)]}, fallbacks=[CallbackQueryHandler(blacklist_menu_callback, pattern="^blacklist_menu$")], per_message=False)
+    blacklist_conv = ConversationHandler(entry_points=[CallbackQueryHandler(add_to_filter_list_callback, pattern="^add_to_(black|white)list$"), CallbackQueryHandler(remove_from_filter_list_callback, pattern="^remove_from_(black|white)list$")], states={ADD_TO_BLACKLIST_STATE: [MessageHandler(filters.TEXT & ~filters.COMMAND, add_to_filter_list_conversation)], REMOVE_FROM_BLACKLIST_STATE: [MessageHandler(filters.TEXT & ~filters.COMMAND, remove_from_filter_list_conversation)]}, fallbacks=[CallbackQueryHandler(filter_list_menu_callback, pattern="^(black|white)list_menu$")], per_message=False)
     
     application.add_handler(CommandHandler("start", start_command))
     application.add_handler(CallbackQueryHandler(show_funding_report, pattern="^show_funding_only$"))
@@ -322,14 +407,21 @@ def main() -> None:
     application.add_handler(CallbackQueryHandler(close_settings_callback, pattern="^close_settings$"))
     application.add_handler(CallbackQueryHandler(exchange_menu_callback, pattern="^settings_exchanges$"))
     application.add_handler(CallbackQueryHandler(toggle_exchange_callback, pattern="^toggle_exchange_"))
-    application.add_handler(CallbackQueryHandler(blacklist_menu_callback, pattern="^blacklist_menu$"))
+    application.add_handler(CallbackQueryHandler(filter_list_menu_callback, pattern="^(black|white)list_menu$"))
     application.add_handler(CallbackQueryHandler(refresh_ticker_callback, pattern="^refresh_ticker_"))
     application.add_handler(threshold_conv)
     application.add_handler(blacklist_conv)
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, ticker_message_handler))
+    # Імпорт pandas/ccxt і ринки бірж - у фоні, коли полінг уже запущено
+    application.job_queue.run_once(warm_up_job, when=0, name="warm_up")
     
-    logger.info(f"Бот запускається (версія {BOT_VERSION})...")
-    application.run_polling(drop_pending_updates=True)
+    logger.info(f"Бот запускається (версія {BOT_VERSION}, режим {UPDATE_MODE})...")
+    if UPDATE_MODE == "webhook":
+        secret, url = os.getenv("WEBHOOK_SECRET"), os.getenv("WEBHOOK_URL")
+        if not secret or not url: logger.critical("!!! Для webhook потрібні WEBHOOK_SECRET і WEBHOOK_URL !!!"); return
+        asyncio.run(run_webhook(application, WebhookServer(application, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH, secret), url))
+    else:
+        application.run_polling(drop_pending_updates=True)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,10 +1,11 @@
 # src/bot.py
 import os
+import asyncio
 import logging
 import multiprocessing as mp
 import sys
 from dotenv import load_dotenv
-from telegram.ext import Application, CommandHandler
+from telegram.ext import Application, CallbackQueryHandler, CommandHandler
 
 # Додаємо корінь проекту до шляхів пошуку, щоб імпорти працювали надійно
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -12,42 +13,189 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 # --- ЗМІНА ТУТ ---
 from worker import worker_process 
 # ------------------
-from src.handlers import commands
+from src.handlers import callbacks, commands
+from src.config import (
+    INGESTION_MODE, METRICS_HOST, METRICS_PORT, DEFAULT_SETTINGS, HISTORY_DIR, TELEGRAM_GLOBAL_RATE,
+    UPDATE_MODE, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_URL_ENV, WEBHOOK_SECRET_ENV,
+    BOT_PROCESS_INDEX_ENV, BOT_PROCESS_COUNT_ENV, SETTINGS_SYNC_INTERVAL, SHARED_SNAPSHOT_PATH
+)
+from src.services import funding_service
+from src.services.funding_service import exchange_pool, enable_history, enable_streaming, enable_shared_snapshot
+from src.services.report_scheduler import schedule_reports
+from src.services.alert_engine import schedule_alerts
+from src.services.funding_timer import schedule_prefunding_alerts
+from src.services.job_dispatcher import JobDispatcher
+from src.services.send_queue import send_queue
+from src.services.metrics import registry, MetricsServer
+from src.services.webhook_server import WebhookServer, run_webhook
+from src.user_manager import open_settings, close_settings, get_all_user_settings, sync_settings
 
 logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
 )
 logger = logging.getLogger(__name__)
 
+def _queue_depth(queue: mp.Queue) -> int | None:
+    """Розмір черги multiprocessing (на macOS qsize() не реалізований)."""
+    try:
+        return queue.qsize()
+    except NotImplementedError:
+        return None
+
+def register_worker_metrics(application: Application) -> None:
+    """Глибина черг воркера та кількість завдань, що чекають на результат."""
+    if application.bot_data["dispatcher"] is None:
+        return
+    task_queue = application.bot_data["task_queue"]
+    result_queue = application.bot_data["result_queue"]
+    dispatcher = application.bot_data["dispatcher"]
+    registry.collect('worker_task_queue_depth', "Завдання в task_queue, ще не взяті воркером",
+                     lambda: _queue_depth(task_queue))
+    registry.collect('worker_result_queue_depth', "Результати в result_queue, ще не прочитані диспетчером",
+                     lambda: _queue_depth(result_queue))
+    registry.collect('worker_pending_jobs', "Завдання, що чекають результату воркера", lambda: dispatcher.pending)
+
+async def warm_up_job(context) -> None:
+    """Імпорт pandas/ccxt і ринки бірж користувачів - у фоні, коли бот уже приймає оновлення."""
+    exchanges = list(DEFAULT_SETTINGS['exchanges'])
+    for settings in get_all_user_settings().values():
+        exchanges.extend(settings.get('exchanges', []))
+    await funding_service.warm_up(exchanges)
+
+async def settings_sync_job(context) -> None:
+    """Кілька процесів бота: підтягує налаштування, змінені через інші процеси."""
+    updated = await asyncio.to_thread(sync_settings)
+    if updated:
+        logger.info(f"Синхронізовано налаштування {updated} чатів з інших процесів")
+
+async def start_services(application: Application) -> None:
+    """
+    Відкриває сховище налаштувань і запускає читача черги результатів, чергу вихідних повідомлень
+    і слухача метрик у циклі подій бота.
+    """
+    await asyncio.to_thread(open_settings)
+    if application.bot_data["dispatcher"] is not None:
+        application.bot_data["dispatcher"].start(asyncio.get_running_loop())
+    send_queue.start(application.bot)
+    if INGESTION_MODE == 'stream':
+        enable_streaming()
+    elif INGESTION_MODE == 'shared':
+        enable_shared_snapshot()
+    if METRICS_PORT:
+        # Кожен процес бота має власний порт метрик
+        port = METRICS_PORT + application.bot_data["process_index"]
+        metrics_server = MetricsServer(registry, METRICS_HOST, port)
+        try:
+            await metrics_server.start()
+            application.bot_data["metrics_server"] = metrics_server
+        except OSError as e:
+            logger.error(f"Не вдалося запустити слухача метрик на {METRICS_HOST}:{port}: {e}")
+
+async def shutdown_services(application: Application) -> None:
+    """Зупиняє диспетчер, закриває клієнти бірж і скидає налаштування та історію на диск."""
+    if application.bot_data["dispatcher"] is not None:
+        application.bot_data["dispatcher"].stop()
+    if "metrics_server" in application.bot_data:
+        await application.bot_data["metrics_server"].stop()
+    await send_queue.stop()
+    if funding_service.stream_ingestor is not None:
+        await funding_service.stream_ingestor.close()
+    await exchange_pool.close()
+    await asyncio.to_thread(close_settings)
+    await asyncio.to_thread(application.bot_data["history"].close)
+
 def main() -> None:
     load_dotenv()
     TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
     if not TOKEN:
         raise ValueError("Не знайдено TELEGRAM_BOT_TOKEN")
+    # Кілька процесів бота за reverse proxy: кожен отримує свій індекс 0..count-1
+    process_index = int(os.getenv(BOT_PROCESS_INDEX_ENV, "0"))
+    process_count = int(os.getenv(BOT_PROCESS_COUNT_ENV, "1"))
+    if UPDATE_MODE == 'webhook':
+        webhook_secret = os.getenv(WEBHOOK_SECRET_ENV)
+        webhook_url = os.getenv(WEBHOOK_URL_ENV)
+        if not webhook_secret or (process_index == 0 and not webhook_url):
+            raise ValueError(f"Для режиму webhook потрібні {WEBHOOK_SECRET_ENV} та {WEBHOOK_URL_ENV}")
+    elif process_count > 1:
+        raise ValueError("Кілька процесів бота можливі лише в режимі webhook: токен полить тільки один процес")
 
     task_queue = mp.Queue()
     result_queue = mp.Queue()
 
-    worker = mp.Process(target=worker_process, args=(task_queue, result_queue), daemon=True)
-    worker.start()
-    logger.info("Процес-воркер запущений.")
+    # Спільний знімок: один воркер на хост (у першого процесу) сканує біржі і публікує знімок,
+    # усі процеси бота читають його зі спільної пам'яті без черги результатів
+    shared_snapshot = INGESTION_MODE == 'shared'
+    worker = None
+    if not shared_snapshot or process_index == 0:
+        shared_path = SHARED_SNAPSHOT_PATH if shared_snapshot else None
+        worker = mp.Process(target=worker_process, args=(task_queue, result_queue, shared_path), daemon=True)
+        worker.start()
+        logger.info("Процес-воркер запущений.")
 
-    application = Application.builder().token(TOKEN).build()
+    application = (
+        Application.builder()
+        .token(TOKEN)
+        .post_init(start_services)
+        .post_shutdown(shutdown_services)
+        .build()
+    )
     application.bot_data["task_queue"] = task_queue
     application.bot_data["result_queue"] = result_queue
+    application.bot_data["dispatcher"] = None if shared_snapshot else JobDispatcher(task_queue, result_queue)
+    application.bot_data["process_index"] = process_index
+    # Кожне сканування в процесі бота дописується в історію ставок (у кожного процесу свій каталог)
+    history_dir = HISTORY_DIR if process_count == 1 else os.path.join(HISTORY_DIR, f"p{process_index}")
+    application.bot_data["history"] = enable_history(history_dir)
+    register_worker_metrics(application)
+    if process_count > 1:
+        # Ліміт Bot API спільний для токена, тож ділиться між процесами
+        send_queue.set_global_rate(TELEGRAM_GLOBAL_RATE / process_count)
+        application.job_queue.run_repeating(settings_sync_job, interval=SETTINGS_SYNC_INTERVAL, name="settings_sync")
 
     application.add_handler(CommandHandler("start", commands.start))
+    # Лише для chat_id з ADMIN_CHAT_IDS
+    application.add_handler(CommandHandler("timings", commands.timings))
+    # Кнопки головного повідомлення /start і меню налаштувань
+    application.add_handler(CallbackQueryHandler(callbacks.refresh_callback, pattern="^refresh$"))
+    application.add_handler(CallbackQueryHandler(callbacks.settings_menu_callback, pattern="^settings_menu$"))
+    application.add_handler(CallbackQueryHandler(callbacks.close_settings_callback, pattern="^close_settings$"))
+    application.add_handler(CallbackQueryHandler(callbacks.exchange_menu_callback, pattern="^settings_exchanges$"))
+    application.add_handler(CallbackQueryHandler(callbacks.toggle_exchange_callback, pattern="^toggle_exchange_"))
+    application.add_handler(CallbackQueryHandler(callbacks.interval_menu_callback, pattern="^settings_interval$"))
+    application.add_handler(CallbackQueryHandler(callbacks.set_interval_callback, pattern="^set_interval_"))
+    application.add_handler(CallbackQueryHandler(callbacks.toggle_bot_status_callback, pattern="^toggle_bot_status$"))
+    application.add_handler(CallbackQueryHandler(callbacks.toggle_prefunding_callback, pattern="^toggle_prefunding$"))
+    application.add_handler(CallbackQueryHandler(callbacks.delete_message_callback, pattern="^delete_message$"))
+
+    # JobQueue стартує разом з полінгом, тож прогрів не затримує перші оновлення
+    application.job_queue.run_once(warm_up_job, when=0, name="warm_up")
+    # Розсилки та сповіщення веде лише перший процес, щоб чати не отримували дублікати
+    if process_index == 0:
+        # Планувальник розсилки за налаштуваннями interval/enabled
+        schedule_reports(application)
+        # Push-сповіщення, коли ставка перетинає поріг користувача
+        schedule_alerts(application)
+        # Сповіщення за кілька хвилин до виплати фандінгу (по одному на момент виплати)
+        schedule_prefunding_alerts(application)
     
-    logger.info("Бот запускається...")
+    logger.info(f"Бот запускається (режим {UPDATE_MODE}, процес {process_index + 1}/{process_count})...")
     
     try:
-        application.run_polling(drop_pending_updates=True)
+        if UPDATE_MODE == 'webhook':
+            server = WebhookServer(application, WEBHOOK_LISTEN, WEBHOOK_PORT + process_index, WEBHOOK_PATH,
+                                   webhook_secret)
+            # Вебхук у Telegram реєструє лише перший процес; решта отримують оновлення через той самий проксі
+            asyncio.run(run_webhook(application, server, webhook_url if process_index == 0 else None))
+        else:
+            application.run_polling(drop_pending_updates=True)
     finally:
         logger.info("Зупинка бота...")
-        task_queue.put(None)
-        worker.join(timeout=5)
-        if worker.is_alive():
-            worker.terminate()
+        if worker is not None:
+            task_queue.put(None)
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
         logger.info("Бот та воркер зупинені.")
 
 if __name__ == "__main__":
@@ -36,5 +36,98 @@ DEFAULT_SETTINGS = {
     "enabled": True,  # Бот ON/OFF
     "threshold": 0.3, # Поріг фандінгу в %
     "interval": 60,   # Інтервал оновлення в хвилинах
+    "prefunding_alerts": False, # Сповіщення за кілька хвилин до виплати фандінгу
     "exchanges": ['Binance', 'ByBit', 'OKX', 'MEXC', 'Bitget', 'KuCoin'] # Основний список бірж
-}
\ No newline at end of file
+}
+
+# Скільки секунд дані біржі в кеші вважаються свіжими
+FUNDING_CACHE_TTL = 60
+
+# Глобальний дедлайн одного сканування в секундах: біржі, що не встигли, пропускаються
+SCAN_DEADLINE = 4
+
+# Як часто (в секундах) перезавантажувати ринки довгоживучих клієнтів бірж
+MARKETS_REFRESH_INTERVAL = 3600
+# Метадані ринків на диску (USDT-свопи, розмір контракту, інтервал фандінгу) і як довго вони чинні
+MARKET_CACHE_DIR = 'data/markets'
+MARKET_CACHE_TTL = 6 * 3600
+# Максимум одночасних keep-alive з'єднань з одним хостом біржі
+EXCHANGE_CONNECTIONS_PER_HOST = 4
+
+# Бакети інтервалів розсилки в хвилинах (як у get_interval_selection_keyboard)
+INTERVAL_BUCKETS = (5, 15, 30, 60, 240, 480)
+
+# Сховище налаштувань користувачів: 'sqlite' (WAL, рядок на чат) або 'json' (старий файл)
+SETTINGS_BACKEND = 'sqlite'
+# Як часто (в секундах) фоновий потік записує накопичені зміни налаштувань
+SETTINGS_FLUSH_INTERVAL = 1.0
+
+# Скільки відрендерених звітів тримати в LRU-кеші
+RENDER_CACHE_SIZE = 512
+# Скільки останніх надісланих текстів пам'ятати, щоб не редагувати повідомлення тим самим текстом
+SENT_TEXT_CACHE_SIZE = 10000
+# Скільки масок фільтрів символів (всесвіт символів × чорний/білий списки) тримати в LRU-кеші
+FILTER_MASK_CACHE_SIZE = 1024
+
+# Історія ставок фандінгу (сегменти на диску)
+HISTORY_DIR = 'data/history'
+HISTORY_TAIL_ROWS = 50000        # рядків у пам'яті до запису сегмента
+HISTORY_MAX_SEGMENTS = 32        # після цього старіші сегменти зливаються
+HISTORY_RETENTION_DAYS = 8       # рядки старші за це відкидаються при компакції
+HISTORY_SAMPLE_INTERVAL = 300    # секунд між записами однієї біржі
+
+# Push-сповіщення про перетин порогу: як часто (в секундах) перевіряти біржі увімкнених чатів
+ALERT_SCAN_INTERVAL = 60
+
+# Сповіщення перед виплатою фандінгу: за скільки секунд до виплати, як часто перевіряти
+# таймер і скільки символів (з найбільшим модулем ставки) показувати в одному повідомленні
+PREFUNDING_ALERT_LEAD = 600
+PREFUNDING_CHECK_INTERVAL = 30
+PREFUNDING_ALERT_MAX_ROWS = 20
+
+# Ліміти Bot API для черги вихідних повідомлень
+TELEGRAM_GLOBAL_RATE = 30   # повідомлень за секунду на всього бота
+TELEGRAM_CHAT_RATE = 1      # повідомлень за секунду в один чат
+TELEGRAM_CHAT_BURST = 3     # скільки повідомлень у чат можна надіслати підряд
+SEND_MAX_RETRIES = 5        # спроб після RetryAfter, перш ніж здатися
+
+# Запобіжник і адаптивні таймаути бірж
+BREAKER_FAILURE_THRESHOLD = 3   # помилок поспіль, після яких біржа тимчасово пропускається
+BREAKER_COOLDOWN = 60           # секунд до пробного запиту
+BREAKER_MAX_COOLDOWN = 600      # максимум паузи при повторних невдачах
+EXCHANGE_TIMEOUT_MIN = 2        # межі таймауту запиту, що рахується з p95 біржі
+EXCHANGE_TIMEOUT_MAX = 20
+EXCHANGE_LATENCY_WINDOW = 50    # останніх запитів у вікні перцентилів
+
+# Джерело даних: 'poll' - REST-сканування з кешем, 'stream' - підписки ccxt.pro watch_* з REST-резервом,
+# 'shared' - біржі сканує лише воркер і публікує знімок у спільну пам'ять, процеси бота його читають
+INGESTION_MODE = 'poll'
+STREAM_PUBLISH_INTERVAL = 1     # секунд між публікаціями потокового стану в кеш знімків
+STREAM_MAX_BACKOFF = 60         # максимум паузи між спробами перепідключити стрім
+
+# Спільний знімок воркера (INGESTION_MODE = 'shared'); на Linux варто класти в /dev/shm
+SHARED_SNAPSHOT_PATH = 'data/funding_snapshot.bin'
+SHARED_SNAPSHOT_MAX_ROWS = 65536        # ємність слота в рядках (символ, біржа)
+SHARED_SNAPSHOT_POLL_INTERVAL = 1       # секунд між перевірками нової публікації в процесі бота
+SHARED_SNAPSHOT_MAX_AGE = 180           # старіший знімок вважається покинутим, біржі опитуються напряму
+
+# Метрики Prometheus на локальному HTTP-слухачі (порт 0 - вимкнено)
+METRICS_HOST = '127.0.0.1'
+METRICS_PORT = 9108
+# Змінна оточення зі списком chat_id адміністраторів через кому (команда /timings)
+ADMIN_CHAT_IDS_ENV = 'ADMIN_CHAT_IDS'
+# Скільки рядків pstats показувати у /timings profile
+PROFILE_TOP_FUNCTIONS = 25
+
+# Отримання оновлень: 'polling' або 'webhook' (вбудований HTTP-сервер за reverse proxy)
+UPDATE_MODE = 'polling'
+WEBHOOK_LISTEN = '127.0.0.1'
+WEBHOOK_PORT = 8080             # процес з індексом i слухає WEBHOOK_PORT + i
+WEBHOOK_PATH = 'telegram'
+# Змінні оточення вебхука: публічний URL, secret token, індекс процесу та кількість процесів
+WEBHOOK_URL_ENV = 'WEBHOOK_URL'
+WEBHOOK_SECRET_ENV = 'WEBHOOK_SECRET'
+BOT_PROCESS_INDEX_ENV = 'BOT_PROCESS_INDEX'
+BOT_PROCESS_COUNT_ENV = 'BOT_PROCESS_COUNT'
+# Як часто (в секундах) підтягувати зміни налаштувань, записані іншими процесами бота
+SETTINGS_SYNC_INTERVAL = 5
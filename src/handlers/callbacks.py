@@ -7,6 +7,9 @@ from telegram.constants import ParseMode
 
 from ..user_manager import get_user_settings, update_user_setting
 from ..services import funding_service, formatters
+from ..services.render_cache import make_render_key, sent_texts
+from ..services.send_queue import send_queue
+from ..services.metrics import trace_report, timed
 from ..keyboards import (
     get_main_menu_keyboard,
     get_settings_menu_keyboard,
@@ -26,19 +29,35 @@ async def refresh_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -
     settings = get_user_settings(chat_id)
     
     try:
-        # Запускаємо СИНХРОННУ функцію в окремому потоці
-        df = await context.application.create_task(
-            funding_service.get_all_funding_data_sync,
-            (settings['exchanges'],)
-        )
-        message_text = formatters.format_funding_update(df, settings['threshold'])
-        
-        await query.edit_message_text(
-            text=message_text,
-            parse_mode=ParseMode.HTML,
-            reply_markup=get_main_menu_keyboard(),
-            disable_web_page_preview=True
-        )
+        with trace_report('refresh'):
+            # Читаємо спільний знімок; застарілі біржі скануються паралельно з дедлайном
+            snapshot = await funding_service.get_funding_snapshot(settings['exchanges'])
+            cache_key = make_render_key('funding', snapshot, settings)
+            # Той самий звіт без рядка віку (тіло - з кешу рендеру): з ним порівнюється надісланий
+            content = formatters.format_funding_update(
+                snapshot.df, settings['threshold'], None, snapshot.missed, snapshot.columnar,
+                cache_key=cache_key, stale=snapshot.stale
+            )
+
+            # Дані не змінились - не робимо зайвий запит (і не ловимо "message is not modified")
+            message_id = query.message.message_id
+            if sent_texts.is_unchanged(chat_id, message_id, content, query.message.text):
+                return
+            message_text = formatters.format_funding_update(
+                snapshot.df, settings['threshold'], snapshot.age, snapshot.missed, snapshot.columnar,
+                cache_key=cache_key, stale=snapshot.stale
+            )
+            # Кілька швидких натискань "Оновити" зливаються в черзі в одне редагування
+            with timed(None, 'telegram'):
+                edited = await send_queue.edit_message_text(
+                    chat_id,
+                    message_id,
+                    message_text,
+                    parse_mode=ParseMode.HTML,
+                    reply_markup=get_main_menu_keyboard(),
+                    disable_web_page_preview=True
+                )
+            sent_texts.remember(chat_id, message_id, content, getattr(edited, 'text', None))
     except Exception as e:
         logger.warning(f"Не вдалося оновити повідомлення для {chat_id}: {e}", exc_info=True)
         try:
@@ -123,7 +142,7 @@ async def interval_menu_callback(update: Update, context: ContextTypes.DEFAULT_T
     await query.answer()
     
     await query.edit_message_text(
-        text="⏳ <b>Час оновлення</b>\n\nЦя функція в розробці.",
+        text="⏳ <b>Час оновлення</b>\n\nЯк часто надсилати звіт з фандінгом:",
         parse_mode=ParseMode.HTML,
         reply_markup=get_interval_selection_keyboard()
     )
@@ -157,6 +176,19 @@ async def toggle_bot_status_callback(update: Update, context: ContextTypes.DEFAU
     await query.answer(f"Бот тепер {'УВІМКНЕНИЙ' if new_status else 'ВИМКНЕНИЙ'}")
     await query.edit_message_reply_markup(reply_markup=get_settings_menu_keyboard(settings))
 
+async def toggle_prefunding_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Перемикає сповіщення за кілька хвилин до виплати фандінгу."""
+    query = update.callback_query
+    chat_id = update.effective_chat.id
+    settings = get_user_settings(chat_id)
+
+    new_status = not settings.get('prefunding_alerts', False)
+    update_user_setting(chat_id, 'prefunding_alerts', new_status)
+    settings['prefunding_alerts'] = new_status
+
+    await query.answer(f"Сповіщення перед виплатою {'УВІМКНЕНО' if new_status else 'ВИМКНЕНО'}")
+    await query.edit_message_reply_markup(reply_markup=get_settings_menu_keyboard(settings))
+
 async def delete_message_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Просто видаляє повідомлення, в якому була натиснута кнопка."""
     query = update.callback_query
@@ -1,62 +1,115 @@
 # src/handlers/commands.py
-import logging
-import uuid
 import asyncio
+import cProfile
+import io
+import logging
+import os
+import pstats
 from telegram import Update
 from telegram.ext import ContextTypes
 from telegram.constants import ParseMode
-from queue import Empty
 
-from ..services.formatters import format_funding_update
+from ..config import ADMIN_CHAT_IDS_ENV, PROFILE_TOP_FUNCTIONS
+from ..services import funding_service
+from ..services.formatters import format_funding_update, format_stage_timings
+from ..services.metrics import trace_report, timed, last_traces
+from ..services.render_cache import make_render_key
+from ..services.send_queue import send_queue, PRIORITY_INTERACTIVE
+from ..services.snapshot_cache import FundingSnapshot
 from ..keyboards import get_main_menu_keyboard
 from ..user_manager import get_user_settings
 
 logger = logging.getLogger(__name__)
 
+# Скільки секунд чекаємо на результат від воркера
+WORKER_RESULT_TIMEOUT = 120
+
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     chat_id = update.effective_chat.id
     logger.info(f"Користувач {chat_id} запустив /start.")
 
     settings = get_user_settings(chat_id)
-    task_queue = context.bot_data['task_queue']
-    result_queue = context.bot_data['result_queue']
-    
-    # Створюємо унікальний ID для нашого завдання
-    job_id = str(uuid.uuid4())
-    
-    await update.message.reply_text("Відправляю завдання в чергу...")
-    
-    # Кладемо завдання в чергу для воркера
-    task_queue.put((job_id, settings['exchanges']))
-    
-    processing_message = await update.message.reply_text("Завдання в черзі. Очікую на результат від воркера...")
-    
-    # Асинхронно чекаємо на результат
-    result_df = None
-    start_time = time.time()
-    while time.time() - start_time < 120: # Чекаємо до 2 хвилин
+    dispatcher = context.bot_data['dispatcher']
+    # Відповідь і її редагування йдуть через спільну чергу з інтерактивним пріоритетом
+    processing_message = await send_queue.send_message(
+        chat_id,
+        "⏳ Збираю дані фандінгу..." if dispatcher is None else "Завдання в черзі. Очікую на результат від воркера...",
+        priority=PRIORITY_INTERACTIVE
+    )
+    message_id = processing_message.message_id
+
+    with trace_report('start'):
+        if dispatcher is None:
+            # Режим спільного знімка: воркер уже опублікував дані, черга завдань не потрібна
+            snapshot = await funding_service.get_funding_snapshot(settings['exchanges'])
+            cache_key = make_render_key('funding', snapshot, settings)
+        else:
+            # Чекаємо саме на свій результат: диспетчер розбудить нас, щойно воркер його поверне
+            try:
+                with timed(None, 'worker'):
+                    df, updated_at, missed, stale = await dispatcher.submit(
+                        settings['exchanges'], timeout=WORKER_RESULT_TIMEOUT
+                    )
+            except asyncio.TimeoutError:
+                logger.error(f"Таймаут очікування результату для {chat_id}")
+                await send_queue.edit_message_text(
+                    chat_id, message_id, "😔 Воркер не відповів вчасно. Спробуйте пізніше."
+                )
+                return
+            # Знімок воркера без версії кешу процесу бота, тож тіло рендериться без кешу
+            snapshot = FundingSnapshot(df, None, updated_at, missed, stale)
+            cache_key = None
+
+        # Вік даних, біржі без відповіді і застарілі - як у "Оновити" та планованих звітах
+        message_text = format_funding_update(
+            snapshot.df, settings['threshold'], snapshot.age, snapshot.missed, snapshot.columnar,
+            cache_key=cache_key, stale=snapshot.stale
+        )
+        with timed(None, 'telegram'):
+            await send_queue.edit_message_text(
+                chat_id,
+                message_id,
+                message_text,
+                parse_mode=ParseMode.HTML,
+                reply_markup=get_main_menu_keyboard(),
+                disable_web_page_preview=True
+            )
+
+def _is_admin(chat_id: int) -> bool:
+    admin_ids = os.getenv(ADMIN_CHAT_IDS_ENV, "")
+    return str(chat_id) in {item.strip() for item in admin_ids.split(",") if item.strip()}
+
+async def _profile_report(settings: dict) -> tuple:
+    """
+    Будує звіт за налаштуваннями під cProfile: кеш знімків скидається, рендер - без кешу.
+    Профайлер бачить і інші задачі циклу подій, що виконувались у цей час.
+    """
+    funding_service.funding_cache.invalidate()
+    profiler = cProfile.Profile()
+    with trace_report('profile'):
+        profiler.enable()
         try:
-            # Неблокуючий запит до черги результатів
-            job_result_id, df = result_queue.get_nowait()
-            if job_result_id == job_id:
-                result_df = df
-                logger.info(f"Отримано результат для завдання #{job_id}")
-                break # Виходимо з циклу, якщо знайшли наш результат
-            else:
-                # Повертаємо чужий результат назад в чергу
-                result_queue.put((job_result_id, df))
-        except Empty:
-            # Якщо черга пуста, чекаємо трохи і пробуємо знову
-            await asyncio.sleep(1)
-            
-    if result_df is not None:
-        message_text = format_funding_update(result_df, settings['threshold'])
-        await processing_message.edit_text(
-            text=message_text,
-            parse_mode=ParseMode.HTML,
-            reply_markup=get_main_menu_keyboard(),
-            disable_web_page_preview=True
+            snapshot = await funding_service.get_funding_snapshot(settings['exchanges'])
+            format_funding_update(snapshot.df, settings['threshold'], snapshot.age, snapshot.missed,
+                                  snapshot.columnar, stale=snapshot.stale)
+        finally:
+            profiler.disable()
+    stream = io.StringIO()
+    pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(PROFILE_TOP_FUNCTIONS)
+    return format_stage_timings({'profile': last_traces['profile']}), stream.getvalue()
+
+async def timings(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """/timings - етапи останніх звітів; /timings profile - свіжий звіт під cProfile (лише для адмінів)."""
+    chat_id = update.effective_chat.id
+    if not _is_admin(chat_id):
+        logger.warning(f"Чат {chat_id} без прав адміністратора викликав /timings")
+        return
+
+    if context.args and context.args[0].lower() == 'profile':
+        text, profile = await _profile_report(get_user_settings(chat_id))
+        await update.message.reply_text(text, parse_mode=ParseMode.HTML)
+        await update.message.reply_document(
+            document=io.BytesIO(profile.encode()), filename="profile.txt", caption="cProfile, за cumulative"
         )
-    else:
-        logger.error(f"Таймаут очікування результату для завдання #{job_id}")
-        await processing_message.edit_text("😔 Воркер не відповів вчасно. Спробуйте пізніше.")
\ No newline at end of file
+        return
+    await update.message.reply_text(format_stage_timings(last_traces), parse_mode=ParseMode.HTML)
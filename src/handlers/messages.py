@@ -6,13 +6,18 @@ from telegram.ext import ContextTypes
 from telegram.constants import ParseMode
 
 from ..services import funding_service, formatters
+from ..services.render_cache import make_render_key
+from ..services.send_queue import send_queue, PRIORITY_INTERACTIVE
+from ..services.metrics import trace_report, timed
+from ..services.symbol_index import normalize_symbol
 from ..user_manager import get_user_settings
 
 logger = logging.getLogger(__name__)
 
 async def ticker_message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Обробляє текстове повідомлення як запит на інформацію по тикеру."""
-    ticker = update.message.text.strip().upper()
+    # Один запис тикера для пошуку, кешу рендеру і заголовка: 'btc-usdt', 'BTCUSDT' -> 'BTC'
+    ticker = normalize_symbol(update.message.text) or update.message.text.strip().upper()
     chat_id = update.effective_chat.id
     settings = get_user_settings(chat_id)
     
@@ -21,27 +26,39 @@ async def ticker_message_handler(update: Update, context: ContextTypes.DEFAULT_T
     if len(ticker) < 2:
         return
 
-    processing_message = await update.message.reply_text(
-        f"🔍 Шукаю дані для <b>{html.escape(ticker)}</b>...", 
+    # Через спільну чергу, щоб відповідь ділила ліміти чату з рештою повідомлень
+    processing_message = await send_queue.send_message(
+        chat_id,
+        f"🔍 Шукаю дані для <b>{html.escape(ticker)}</b>...",
+        priority=PRIORITY_INTERACTIVE,
         parse_mode=ParseMode.HTML
     )
     
     try:
-        # Запускаємо СИНХРОННУ функцію в окремому потоці
-        df = await context.application.create_task(
-            funding_service.get_funding_for_ticker_sync,
-            (ticker, settings['exchanges'])
-        )
-        
-        message_text = formatters.format_ticker_info(df, ticker)
-        
-        await processing_message.edit_text(
-            text=message_text,
-            parse_mode=ParseMode.HTML,
-            disable_web_page_preview=True
-        )
+        with trace_report('ticker'):
+            # Читаємо спільний знімок; застарілі біржі скануються паралельно з дедлайном
+            snapshot = await funding_service.get_funding_snapshot(settings['exchanges'])
+            df = funding_service.filter_ticker(snapshot, ticker)
+
+            message_text = formatters.format_ticker_info(
+                df, ticker, snapshot.age, snapshot.missed, snapshot.columnar,
+                cache_key=make_render_key('ticker', snapshot, settings, ticker),
+                averages=funding_service.get_ticker_averages(df), stale=snapshot.stale
+            )
+
+            with timed(None, 'telegram'):
+                await send_queue.edit_message_text(
+                    chat_id,
+                    processing_message.message_id,
+                    message_text,
+                    parse_mode=ParseMode.HTML,
+                    disable_web_page_preview=True
+                )
     except Exception as e:
         logger.error(f"Помилка при пошуку тикера {ticker} для {chat_id}: {e}", exc_info=True)
-        await processing_message.edit_text(
-            f"😔 Виникла помилка при пошуку даних для <b>{html.escape(ticker)}</b>."
+        await send_queue.edit_message_text(
+            chat_id,
+            processing_message.message_id,
+            f"😔 Виникла помилка при пошуку даних для <b>{html.escape(ticker)}</b>.",
+            parse_mode=ParseMode.HTML
         )
\ No newline at end of file
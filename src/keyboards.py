@@ -15,10 +15,12 @@ def get_main_menu_keyboard() -> InlineKeyboardMarkup:
 def get_settings_menu_keyboard(settings: dict) -> InlineKeyboardMarkup:
     """Меню налаштувань."""
     bot_status = "🟢 Бот ON" if settings['enabled'] else "🔴 Бот OFF"
+    prefunding = "⏰ Перед виплатою: ON" if settings.get('prefunding_alerts') else "⏰ Перед виплатою: OFF"
     keyboard = [
         [InlineKeyboardButton("🌐 Біржі", callback_data="settings_exchanges")],
         [InlineKeyboardButton(f"📊 Фандінг: > {settings['threshold']}%", callback_data="settings_threshold")],
         [InlineKeyboardButton(f"⏳ Час оновлення: {settings['interval']} хв", callback_data="settings_interval")],
+        [InlineKeyboardButton(prefunding, callback_data="toggle_prefunding")],
         [InlineKeyboardButton(bot_status, callback_data="toggle_bot_status")],
         [InlineKeyboardButton("❌ Закрити", callback_data="close_settings")]
     ]
@@ -0,0 +1,41 @@
+# src/lazy_imports.py
+import importlib
+import time
+
+
+class LazyModule:
+    """
+    Заміна `import name as alias` для важких залежностей (pandas, ccxt):
+    модуль імпортується при першому зверненні до атрибута, а не під час старту бота.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            # import_module потокобезпечний: фоновий прогрів і обробник не виконають модуль двічі
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __repr__(self) -> str:
+        state = "завантажений" if self._module is not None else "ще не імпортований"
+        return f"<LazyModule {self._name} ({state})>"
+
+
+# Модулі, які прогріваються у фоні після старту полінгу
+WARM_UP_MODULES = ('numpy', 'pandas', 'ccxt', 'ccxt.async_support')
+
+
+def warm_up_imports(modules: tuple = WARM_UP_MODULES) -> dict:
+    """Імпортує важкі модулі заздалегідь (викликається в окремому потоці); повертає {модуль: секунди}."""
+    timings = {}
+    for name in modules:
+        started = time.perf_counter()
+        importlib.import_module(name)
+        timings[name] = time.perf_counter() - started
+    return timings
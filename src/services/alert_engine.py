@@ -0,0 +1,173 @@
+# src/services/alert_engine.py
+import asyncio
+import bisect
+import logging
+
+from telegram.constants import ParseMode
+from telegram.error import Forbidden, BadRequest
+from telegram.ext import Application, ContextTypes
+
+from ..config import ALERT_SCAN_INTERVAL
+from . import funding_service, formatters
+from .send_queue import send_queue, PRIORITY_BROADCAST
+from .settings_view import settings_view
+from .symbol_filter import get_filter
+
+logger = logging.getLogger(__name__)
+
+
+class ThresholdIndex:
+    """
+    Інвертований індекс порогів: біржа -> увімкнені чати, відсортовані за порогом.
+    Чати, чий поріг лежить у проміжку (стара ставка, нова ставка], знаходяться
+    бінарним пошуком, без перебору всіх користувачів. Зміна налаштувань одного чату
+    оновлює лише його записи (update), без перебудови всього індексу.
+    """
+
+    def __init__(self, all_settings: dict | None = None):
+        # {chat_id: (поріг, біржі, фільтр символів)} лише для увімкнених чатів
+        self.chats = {}
+        # Паралельні відсортовані списки на біржу: (поріг, chat_id) і самі пороги для bisect
+        self._entries, self._thresholds = {}, {}
+        for chat_id, settings in (all_settings or {}).items():
+            self.update(chat_id, settings)
+
+    def update(self, chat_id, settings: dict | None) -> None:
+        """Замінює записи чату за новими налаштуваннями (None або вимкнений чат - лише видаляє)."""
+        chat_id = int(chat_id)
+        old = self.chats.pop(chat_id, None)
+        if old is not None:
+            threshold, exchanges, _ = old
+            for name in exchanges:
+                entries = self._entries[name]
+                position = bisect.bisect_left(entries, (threshold, chat_id))
+                del entries[position]
+                del self._thresholds[name][position]
+                if not entries:
+                    del self._entries[name], self._thresholds[name]
+        if settings is None or not settings.get('enabled', True):
+            return
+        threshold = float(settings['threshold'])
+        exchanges = frozenset(settings.get('exchanges', []))
+        self.chats[chat_id] = (threshold, exchanges, get_filter(settings.get('blacklist'), settings.get('whitelist')))
+        for name in exchanges:
+            entries = self._entries.setdefault(name, [])
+            position = bisect.bisect_left(entries, (threshold, chat_id))
+            entries.insert(position, (threshold, chat_id))
+            self._thresholds.setdefault(name, []).insert(position, threshold)
+
+    @property
+    def exchanges(self) -> list:
+        """Біржі, які потрібні хоча б одному увімкненому чату."""
+        return list(self._thresholds)
+
+    def chats_between(self, exchange: str, low: float, high: float) -> list:
+        """Чати, що стежать за біржею і мають поріг у проміжку (low, high]."""
+        thresholds = self._thresholds.get(exchange)
+        if not thresholds:
+            return []
+        start = bisect.bisect_right(thresholds, low)
+        end = bisect.bisect_right(thresholds, high)
+        return [chat_id for _, chat_id in self._entries[exchange][start:end]]
+
+
+class AlertEngine:
+    """
+    Сповіщення про перетин порогу, керовані змінами.
+    Між послідовними скануваннями порівнюються ставки (символ, біржа); для кожного
+    зростання abs ставки індекс порогів дає лише ті чати, чий поріг вона перетнула.
+    Далі для кандидатів перевіряється найкраща ставка символу на їхніх біржах
+    (як у format_funding_update: abs(rate) >= threshold) і чорний/білий списки.
+    """
+
+    def __init__(self):
+        # {біржа: {символ: ставка}} з останнього успішного сканування біржі
+        self._rates = {}
+        self.index = ThresholdIndex()
+        self.stats = {'evaluations': 0, 'changed': 0, 'candidates': 0, 'alerts': 0}
+
+    def _best_rate(self, rates: dict, symbol: str, exchanges: frozenset) -> tuple:
+        """(ставка, біржа) з найбільшим модулем серед бірж чату."""
+        best_rate, best_exchange = 0.0, None
+        for name in exchanges:
+            rate = rates.get(name, {}).get(symbol)
+            if rate is not None and abs(rate) > abs(best_rate):
+                best_rate, best_exchange = rate, name
+        return best_rate, best_exchange
+
+    def evaluate(self, result) -> dict:
+        """Обробляє нове сканування і повертає {chat_id: [(символ, ставка, біржа, поріг), ...]}."""
+        # Лише чати, змінені з минулого разу; повне читання робить alert_tick поза циклом подій
+        settings_view.refresh()
+        index = self.index
+        previous = dict(self._rates)
+        candidates = set()
+        for name, rows in result.rates.items():
+            current = {row['symbol']: row['rate'] for row in rows}
+            self._rates[name] = current
+            old_rates = previous.get(name)
+            # Перше сканування біржі лише запам'ятовується, щоб не засипати чати при старті
+            if old_rates is None:
+                continue
+            for symbol, rate in current.items():
+                old, new = abs(old_rates.get(symbol, 0.0)), abs(rate)
+                if new > old:
+                    self.stats['changed'] += 1
+                    candidates.update((chat_id, symbol) for chat_id in index.chats_between(name, old, new))
+
+        self.stats['evaluations'] += 1
+        self.stats['candidates'] += len(candidates)
+        alerts = {}
+        for chat_id, symbol in candidates:
+            threshold, exchanges, symbol_filter = index.chats[chat_id]
+            if not symbol_filter.allows(symbol):
+                continue
+            old_rate, _ = self._best_rate(previous, symbol, exchanges)
+            new_rate, exchange = self._best_rate(self._rates, symbol, exchanges)
+            if abs(old_rate) < threshold <= abs(new_rate):
+                alerts.setdefault(chat_id, []).append((symbol, new_rate, exchange, threshold))
+        self.stats['alerts'] += sum(len(items) for items in alerts.values())
+        return alerts
+
+
+# Спільний для процесу бота двигун сповіщень
+alert_engine = AlertEngine()
+settings_view.add_index(alert_engine.index)
+
+
+async def _send_alert(chat_id: int, items: list) -> None:
+    try:
+        await send_queue.send_message(
+            chat_id, formatters.format_threshold_alert(items), priority=PRIORITY_BROADCAST,
+            parse_mode=ParseMode.HTML, disable_web_page_preview=True
+        )
+    except (Forbidden, BadRequest) as e:
+        logger.warning(f"Не вдалося надіслати сповіщення {chat_id}: {e}")
+    except Exception as e:
+        logger.error(f"Помилка сповіщення для {chat_id}: {e}", exc_info=True)
+
+
+async def send_alerts(alerts: dict) -> None:
+    """Ставить у чергу надсилання по одному повідомленню на чат з усіма символами, що перетнули поріг."""
+    await asyncio.gather(*(_send_alert(chat_id, items) for chat_id, items in alerts.items()))
+
+
+async def alert_tick(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Тримає свіжими біржі увімкнених чатів; самі сповіщення приходять від слухача кешу."""
+    await settings_view.ensure_loaded()
+    exchanges = alert_engine.index.exchanges
+    if exchanges:
+        await funding_service.get_funding_snapshot(exchanges)
+
+
+def schedule_alerts(application: Application) -> None:
+    """Підключає двигун сповіщень до кешу знімків і реєструє періодичну перевірку."""
+    def on_scan(result, fetched_at):
+        alerts = alert_engine.evaluate(result)
+        if alerts:
+            logger.info(f"Сповіщення про перетин порогу для {len(alerts)} чатів")
+            application.create_task(send_alerts(alerts))
+
+    funding_service.funding_cache.add_listener(on_scan)
+    application.job_queue.run_repeating(alert_tick, interval=ALERT_SCAN_INTERVAL, first=ALERT_SCAN_INTERVAL,
+                                        name="alert_tick")
@@ -0,0 +1,113 @@
+# src/services/columnar.py
+from __future__ import annotations
+import functools
+
+import numpy as np
+
+from ..lazy_imports import LazyModule
+from .renderer import build_trade_links
+from .symbol_filter import get_filter, filter_masks
+
+# pandas імпортується при першому використанні, а не під час старту бота
+pd = LazyModule('pandas')
+
+
+class ColumnarSnapshot:
+    """
+    Компактне колонкове представлення знімка фандінгу.
+    Будується один раз на версію знімка: ставки в масивах NumPy, біржі та символи
+    як категоріальні коди, а найкраща пропозиція по кожному символу заздалегідь
+    відсортована за abs_rate. Топ-N при будь-якому порозі - бінарний пошук плюс зріз.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        if df.empty:
+            df = pd.DataFrame({'symbol': [], 'rate': [], 'exchange': []})
+        symbol_cat = pd.Categorical(df['symbol'])
+        exchange_cat = pd.Categorical(df['exchange'])
+        self.symbols = np.asarray(symbol_cat.categories, dtype=object)
+        self.exchanges = np.asarray(exchange_cat.categories, dtype=object)
+        self.symbol_codes = symbol_cat.codes.astype(np.int32)
+        self.exchange_codes = exchange_cat.codes.astype(np.int16)
+        self.rate = df['rate'].to_numpy(dtype=np.float64)
+        self.abs_rate = np.abs(self.rate)
+        # Mark/last ціна рядка (NaN, якщо біржа її не віддала)
+        if 'price' in df.columns:
+            self.price = pd.to_numeric(df['price'], errors='coerce').to_numpy(dtype=np.float64)
+        else:
+            self.price = np.full(len(self.rate), np.nan)
+
+        # Найкращий рядок кожного символу (перший при рівних abs_rate, як idxmax)
+        order = np.lexsort((np.arange(len(self.rate)), -self.abs_rate, self.symbol_codes))
+        is_first = np.ones(len(order), dtype=bool)
+        is_first[1:] = self.symbol_codes[order][1:] != self.symbol_codes[order][:-1]
+        best_rows = order[is_first]
+        # Сортуємо найкращі пропозиції за спаданням abs_rate (стабільно)
+        self.best_rows = best_rows[np.argsort(-self.abs_rate[best_rows], kind='stable')]
+        self._best_abs_neg = -self.abs_rate[self.best_rows]
+        self._trade_links = {}
+        self._best_allowed = {}
+
+    def __len__(self) -> int:
+        return len(self.rate)
+
+    def count_above(self, threshold: float) -> int:
+        """Кількість символів, чия найкраща ставка за модулем >= threshold."""
+        return int(np.searchsorted(self._best_abs_neg, -threshold, side='right'))
+
+    @functools.cached_property
+    def universe_key(self) -> int:
+        """Ключ набору символів знімка: однаковий для версій знімка з тими самими символами."""
+        return filter_masks.universe_id(tuple(self.symbols.tolist()))
+
+    def filter_mask(self, blacklist=None, whitelist=None) -> np.ndarray | None:
+        """Маска над self.symbols для чорного/білого списків (з glob-шаблонами); None - без фільтра."""
+        symbol_filter = get_filter(blacklist, whitelist)
+        if not symbol_filter:
+            return None
+        return filter_masks.get(self.universe_key, self.symbols, symbol_filter)
+
+    def _allowed_best(self, blacklist, whitelist) -> np.ndarray | None:
+        """Маска фільтра в порядку best_rows: топ-N - зріз за порогом, відфільтрований цією маскою."""
+        symbol_filter = get_filter(blacklist, whitelist)
+        if not symbol_filter:
+            return None
+        allowed = self._best_allowed.get(symbol_filter.key)
+        if allowed is None:
+            mask = filter_masks.get(self.universe_key, self.symbols, symbol_filter)
+            allowed = self._best_allowed[symbol_filter.key] = mask[self.symbol_codes[self.best_rows]]
+        return allowed
+
+    def top_n(self, threshold: float, n: int, blacklist: list | None = None,
+              whitelist: list | None = None) -> np.ndarray:
+        """Позиції рядків топ-N символів з abs_rate >= threshold, що проходять чорний і білий списки."""
+        count = self.count_above(threshold)
+        candidates = self.best_rows[:count]
+        allowed = self._allowed_best(blacklist, whitelist)
+        if allowed is not None:
+            candidates = candidates[allowed[:count]]
+        return candidates[:n]
+
+    def symbol_names(self, rows: np.ndarray) -> np.ndarray:
+        return self.symbols[self.symbol_codes[rows]]
+
+    def exchange_names(self, rows: np.ndarray) -> np.ndarray:
+        return self.exchanges[self.exchange_codes[rows]]
+
+    def trade_links(self, link_func) -> np.ndarray:
+        """Посилання на торгівлю для кожного рядка, обчислені раз на знімок і link_func."""
+        links = self._trade_links.get(link_func)
+        if links is None:
+            all_rows = np.arange(len(self.rate))
+            links = build_trade_links(self.exchange_names(all_rows), self.symbol_names(all_rows), link_func)
+            self._trade_links[link_func] = links
+        return links
+
+    def to_frame(self, rows: np.ndarray) -> pd.DataFrame:
+        """Матеріалізує вибрані рядки у DataFrame (symbol, rate, exchange, abs_rate)."""
+        return pd.DataFrame({
+            'symbol': self.symbol_names(rows),
+            'rate': self.rate[rows],
+            'exchange': self.exchange_names(rows),
+            'abs_rate': self.abs_rate[rows],
+        })
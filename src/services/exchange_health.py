@@ -0,0 +1,139 @@
+# src/services/exchange_health.py
+import collections
+import logging
+import time
+
+import numpy as np
+
+from ..config import (
+    BREAKER_FAILURE_THRESHOLD, BREAKER_COOLDOWN, BREAKER_MAX_COOLDOWN,
+    EXCHANGE_TIMEOUT_MIN, EXCHANGE_TIMEOUT_MAX, EXCHANGE_LATENCY_WINDOW
+)
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class ExchangeHealth:
+    """
+    Здоров'я однієї біржі: ковзне вікно затримок, лічильники помилок і запобіжник.
+    closed - запити йдуть як завжди; open - біржа пропускається до кінця паузи;
+    half_open - пропускається один пробний запит, що або закриває запобіжник, або
+    відкриває його знову з подвоєною паузою.
+    """
+
+    def __init__(self, name: str, window: int = 50, failure_threshold: int = 3, cooldown: float = 60,
+                 max_cooldown: float = 600, min_timeout: float = 2, max_timeout: float = 20):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.latencies = collections.deque(maxlen=window)
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.cooldown = cooldown
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self.stats = {'successes': 0, 'failures': 0, 'timeouts': 0, 'skipped': 0, 'opened': 0}
+
+    def percentile(self, q: float) -> float | None:
+        if not self.latencies:
+            return None
+        return float(np.percentile(np.fromiter(self.latencies, dtype=np.float64), q))
+
+    def timeout(self) -> float:
+        """Таймаут запиту з власного p95 біржі (з запасом), у межах [min_timeout, max_timeout]."""
+        if len(self.latencies) < 5:
+            return self.max_timeout
+        return min(self.max_timeout, max(self.min_timeout, self.percentile(95) * 2))
+
+    def allow(self, now: float | None = None) -> bool:
+        """Чи можна зараз звертатися до біржі."""
+        now = now if now is not None else time.monotonic()
+        if self.state == OPEN and now - self.opened_at >= self.cooldown:
+            self.state = HALF_OPEN
+            self._probe_in_flight = False
+        if self.state == CLOSED:
+            return True
+        if self.state == HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        self.stats['skipped'] += 1
+        return False
+
+    def retry_in(self, now: float | None = None) -> float:
+        """Скільки секунд до наступного пробного запиту (0 - біржа вже доступна)."""
+        now = now if now is not None else time.monotonic()
+        if self.state == OPEN:
+            return max(0.0, self.cooldown - (now - self.opened_at))
+        if self.state == HALF_OPEN and self._probe_in_flight:
+            # Пробний запит уже йде: до його результату - не довше за таймаут
+            return self.timeout()
+        return 0.0
+
+    def record_success(self, latency: float) -> None:
+        self.latencies.append(latency)
+        self.stats['successes'] += 1
+        self.consecutive_failures = 0
+        if self.state != CLOSED:
+            logger.info(f"Запобіжник {self.name}: біржа відповіла, закриваю")
+        self.state = CLOSED
+        self.cooldown = self.base_cooldown
+        self._probe_in_flight = False
+
+    def record_failure(self, timed_out: bool = False, now: float | None = None) -> None:
+        now = now if now is not None else time.monotonic()
+        self.stats['failures'] += 1
+        if timed_out:
+            self.stats['timeouts'] += 1
+        self.consecutive_failures += 1
+        if self.state == HALF_OPEN:
+            # Пробний запит не вдався - довша пауза
+            self._open(now, min(self.max_cooldown, self.cooldown * 2))
+        elif self.state == CLOSED and self.consecutive_failures >= self.failure_threshold:
+            self._open(now, self.base_cooldown)
+
+    def _open(self, now: float, cooldown: float) -> None:
+        self.state = OPEN
+        self.opened_at = now
+        self.cooldown = cooldown
+        self._probe_in_flight = False
+        self.stats['opened'] += 1
+        logger.warning(f"Запобіжник {self.name} відкрито на {cooldown:.0f} с "
+                       f"(помилок поспіль: {self.consecutive_failures})")
+
+    def summary(self) -> dict:
+        return {
+            'state': self.state,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'timeout': self.timeout(),
+            **self.stats,
+        }
+
+
+class HealthRegistry:
+    """Здоров'я всіх бірж процесу, ключ - назва біржі з AVAILABLE_EXCHANGES."""
+
+    def __init__(self):
+        self._items = {}
+
+    def get(self, name: str) -> ExchangeHealth:
+        health = self._items.get(name)
+        if health is None:
+            health = self._items[name] = ExchangeHealth(
+                name, EXCHANGE_LATENCY_WINDOW, BREAKER_FAILURE_THRESHOLD, BREAKER_COOLDOWN,
+                BREAKER_MAX_COOLDOWN, EXCHANGE_TIMEOUT_MIN, EXCHANGE_TIMEOUT_MAX
+            )
+        return health
+
+    def summary(self) -> dict:
+        return {name: health.summary() for name, health in self._items.items()}
+
+
+exchange_health = HealthRegistry()
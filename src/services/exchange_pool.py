@@ -0,0 +1,77 @@
+# src/services/exchange_pool.py
+import logging
+import time
+
+import aiohttp
+
+from ..config import MARKETS_REFRESH_INTERVAL, EXCHANGE_CONNECTIONS_PER_HOST
+
+logger = logging.getLogger(__name__)
+
+
+class ExchangePool:
+    """
+    Реєстр довгоживучих клієнтів ccxt, ключ - ID біржі з AVAILABLE_EXCHANGES.
+    Кожен клієнт має власну HTTP-сесію з keep-alive пулом з'єднань,
+    а ринки перезавантажуються не частіше ніж раз на markets_ttl секунд.
+    """
+
+    def __init__(self, markets_ttl: float = MARKETS_REFRESH_INTERVAL,
+                 connections_per_host: int = EXCHANGE_CONNECTIONS_PER_HOST):
+        self.markets_ttl = markets_ttl
+        self.connections_per_host = connections_per_host
+        self._exchanges = {}
+        self._sessions = {}
+        self._markets_loaded_at = {}
+        self.stats = {'clients_created': 0, 'markets_reloads': 0, 'new_connections': 0}
+
+    async def _on_connection_created(self, session, trace_config_ctx, params) -> None:
+        self.stats['new_connections'] += 1
+
+    def _create_session(self) -> aiohttp.ClientSession:
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_connection_create_end.append(self._on_connection_created)
+        connector = aiohttp.TCPConnector(
+            limit_per_host=self.connections_per_host,
+            keepalive_timeout=60,
+            ttl_dns_cache=300,
+            enable_cleanup_closed=True,
+        )
+        return aiohttp.ClientSession(connector=connector, trace_configs=[trace_config], trust_env=True)
+
+    def get(self, exchange_id: str):
+        """Повертає клієнт біржі, створюючи його при першому зверненні."""
+        exchange = self._exchanges.get(exchange_id)
+        if exchange is None:
+            # ccxt імпортується лише при створенні першого клієнта (зазвичай - у фоновому прогріві)
+            import ccxt.async_support as ccxt_async
+            session = self._create_session()
+            exchange = getattr(ccxt_async, exchange_id)({'timeout': 20000, 'session': session})
+            self._sessions[exchange_id] = session
+            self._exchanges[exchange_id] = exchange
+            self.stats['clients_created'] += 1
+        return exchange
+
+    async def load_markets(self, exchange_id: str) -> dict:
+        """Повертає ринки з кешу клієнта, перезавантажуючи їх після markets_ttl."""
+        exchange = self.get(exchange_id)
+        loaded_at = self._markets_loaded_at.get(exchange_id)
+        if loaded_at is not None and exchange.markets and time.time() - loaded_at < self.markets_ttl:
+            return exchange.markets
+        markets = await exchange.load_markets(reload=True)
+        self._markets_loaded_at[exchange_id] = time.time()
+        self.stats['markets_reloads'] += 1
+        return markets
+
+    async def close(self) -> None:
+        """Закриває всі клієнти та їхні HTTP-сесії."""
+        for exchange_id, exchange in self._exchanges.items():
+            try:
+                await exchange.close()
+                await self._sessions[exchange_id].close()
+            except Exception as e:
+                logger.error(f"Помилка закриття клієнта {exchange_id}: {e}")
+        self._exchanges.clear()
+        self._sessions.clear()
+        self._markets_loaded_at.clear()
+        logger.info(f"Пул бірж закрито. Статистика: {self.stats}")
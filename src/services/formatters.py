@@ -1,7 +1,16 @@
 # src/services/formatters.py
-import pandas as pd
+from __future__ import annotations
+import time
+import numpy as np
 import html
 from ..config import EXCHANGE_URL_TEMPLATES
+from ..lazy_imports import LazyModule
+from . import renderer
+from .render_cache import render_cache
+from .metrics import timed, render_seconds
+
+# pandas імпортується при першому використанні, а не під час старту бота
+pd = LazyModule('pandas')
 
 def get_trade_link(exchange: str, symbol: str) -> str:
     """Генерує посилання на сторінку торгівлі."""
@@ -14,50 +23,168 @@ def get_trade_link(exchange: str, symbol: str) -> str:
     
     return template.format(symbol=symbol_usdt, symbol_hyphen=symbol_hyphen)
 
-def format_funding_update(df: pd.DataFrame, threshold: float) -> str:
-    """Форматує головне повідомлення з фандінгом."""
+def format_snapshot_footer(age: float | None, missed: list | None = None, stale: list | None = None) -> str:
+    """Форматує вік даних знімка, біржі, що не встигли відповісти, та біржі з застарілими даними."""
+    footer = ""
+    if age is not None:
+        age_str = f"{int(age)} с" if age < 60 else f"{int(age // 60)} хв"
+        footer += f"\n\n<i>🕒 Дані оновлено {age_str} тому</i>"
+    if missed:
+        footer += f"\n<i>⏳ Не встигли відповісти: {html.escape(', '.join(missed))}</i>"
+    if stale:
+        footer += f"\n<i>⚠️ Застарілі дані (біржа недоступна): {html.escape(', '.join(stale))}</i>"
+    return footer
+
+def _render_minute(cache_key):
+    """
+    Зворотний відлік у звіті змінюється щохвилини, тож тіло кешується в межах хвилини:
+    (ключ, поточна хвилина) і момент, від якого рахується відлік.
+    """
+    minute = int(time.time() // 60)
+    return (cache_key + (minute,) if cache_key is not None else None), minute * 60
+
+def _format_countdowns(seconds_left: np.ndarray) -> np.ndarray:
+    """Залишок до виплати як ' (⏳ 1 год 05 хв)' / ' (⏳ 7 хв)'; порожньо, якщо часу немає або він минув."""
+    minutes = np.ceil(np.nan_to_num(seconds_left, nan=-1.0) / 60)
+    hours, rest = np.divmod(np.maximum(minutes, 0), 60)
+    countdowns = np.where(
+        hours > 0,
+        renderer.concat(" (⏳ ", renderer.format_numbers(hours, "%d"), " год ",
+                        renderer.format_numbers(rest, "%02d"), " хв)"),
+        renderer.concat(" (⏳ ", renderer.format_numbers(rest, "%d"), " хв)"),
+    )
+    return np.where(minutes > 0, countdowns, "").astype(object)
+
+def _format_funding_times(df: pd.DataFrame, now: float | None = None) -> np.ndarray:
+    """
+    Час наступного фандінгу як 'HH:MM UTC (⏳ 2 год 15 хв)' або 'N/A', без проходу по рядках.
+    next_funding_time - мітка в мс (як у ccxt); відлік рахується від now, якщо його передано.
+    """
+    if 'next_funding_time' not in df.columns:
+        return np.full(len(df), "N/A", dtype=object)
+    millis = pd.to_numeric(df['next_funding_time'], errors='coerce')
+    times = pd.to_datetime(millis, unit='ms', utc=True).dt.strftime('%H:%M UTC').fillna("N/A").to_numpy(dtype=object)
+    if now is None:
+        return times
+    return times + _format_countdowns(millis.to_numpy(dtype=np.float64) / 1000 - now)
+
+def _format_exchange_parts(df: pd.DataFrame, columnar=None) -> np.ndarray:
+    """Назва біржі як посилання на торгівлю (або просто назва, якщо шаблону немає)."""
+    exchange_names = renderer.escape(df['exchange'].to_numpy())
+    links = renderer.links_for(df, get_trade_link, columnar)
+    linked = renderer.concat('<a href="', links, '">', exchange_names, '</a>')
+    return np.where(links != "", linked, exchange_names)
+
+def _format_funding_body(df: pd.DataFrame, threshold: float, columnar=None, now: float | None = None) -> str:
     if df.empty:
         return "Не знайдено даних по фандінгу для обраних бірж."
 
-    filtered_df = df[abs(df['rate']) >= threshold].sort_values(by='rate', ascending=False)
+    filtered_df = df[abs(df['rate']) >= threshold].sort_values(by='rate', ascending=False, kind='stable')
 
     if filtered_df.empty:
         return f"🟢 Немає монет з фандінгом вище <b>{threshold}%</b> або нижче <b>-{threshold}%</b>."
 
     header = f"<b>💎 Фандінг вище {threshold}%</b>\n\n"
-    lines = []
-    
-    for _, row in filtered_df.iterrows():
-        emoji = "🟢" if row['rate'] > 0 else "🔴"
-        symbol = html.escape(row['symbol'])
-        rate = row['rate']
-        time_str = row['next_funding_time'].strftime('%H:%M UTC') if pd.notna(row['next_funding_time']) else "N/A"
-        exchange_name = html.escape(row['exchange'])
-        link = get_trade_link(row['exchange'], row['symbol'])
-        
-        exchange_part = f'<a href="{link}">{exchange_name}</a>' if link else exchange_name
-
-        lines.append(f"{emoji} <code>{symbol:<8}</code>— <b>{rate: >-7.4f}%</b> — {time_str} — {exchange_part}")
+    rates = filtered_df['rate'].to_numpy()
+    return header + renderer.join_lines(
+        np.where(rates > 0, "🟢", "🔴").astype(object), " <code>",
+        renderer.ljust(renderer.escape(filtered_df['symbol'].to_numpy()), 8), "</code>— <b>",
+        renderer.format_numbers(rates, "%7.4f"), "%</b> — ", _format_funding_times(filtered_df, now), " — ",
+        _format_exchange_parts(filtered_df, columnar)
+    )
 
-    return header + "\n".join(lines)
+def format_funding_update(df: pd.DataFrame, threshold: float, age: float | None = None, missed: list | None = None,
+                          columnar=None, cache_key=None, stale: list | None = None) -> str:
+    """
+    Форматує головне повідомлення з фандінгом (не змінює переданий знімок).
+    Тіло звіту береться з render_cache за cache_key; вік даних додається щоразу заново.
+    """
+    cache_key, now = _render_minute(cache_key)
+    with timed(render_seconds, 'render', 'funding'):
+        body = render_cache.get_or_render(cache_key, lambda: _format_funding_body(df, threshold, columnar, now))
+    return body + format_snapshot_footer(age, missed, stale)
 
-def format_ticker_info(df: pd.DataFrame, ticker: str) -> str:
-    """Форматує повідомлення для конкретного тикера."""
+def _format_averages(df: pd.DataFrame, averages: dict | None) -> np.ndarray | str:
+    """Колонка ' · avg 24h / 7d' з історії; порожньо, якщо історії немає."""
+    if not averages:
+        return ""
+    def cell(key):
+        values = averages.get(key)
+        if values is None:
+            return ""
+        parts = ["n/a" if np.isnan(value) else f"{value:.4f}%" for value in values]
+        return f" · <i>avg 24h / 7d: {' / '.join(parts)}</i>"
+    return np.array([cell(key) for key in zip(df['symbol'], df['exchange'])], dtype=object)
+
+def _format_ticker_body(df: pd.DataFrame, ticker: str, columnar=None, averages: dict | None = None,
+                        now: float | None = None) -> str:
     if df.empty:
         return f"Не знайдено даних для <b>{html.escape(ticker)}</b> на обраних біржах."
     
     header = f"<b>🪙 Фандінг для {html.escape(ticker.upper())}</b>\n\n"
-    lines = []
-
-    for _, row in df.iterrows():
-        emoji = "🟢" if row['rate'] > 0 else "🔴"
-        rate = row['rate']
-        time_str = row['next_funding_time'].strftime('%H:%M UTC') if pd.notna(row['next_funding_time']) else "N/A"
-        exchange_name = html.escape(row['exchange'])
-        link = get_trade_link(row['exchange'], row['symbol'])
-        
-        exchange_part = f'<a href="{link}">{exchange_name}</a>' if link else exchange_name
-        
-        lines.append(f"{emoji} <b>{rate: >-7.4f}%</b> — {time_str} — {exchange_part}")
-        
-    return header + "\n".join(lines)
\ No newline at end of file
+    rates = df['rate'].to_numpy()
+    return header + renderer.join_lines(
+        np.where(rates > 0, "🟢", "🔴").astype(object), " <b>", renderer.format_numbers(rates, "%7.4f"),
+        "%</b> — ", _format_funding_times(df, now), " — ", _format_exchange_parts(df, columnar),
+        _format_averages(df, averages)
+    )
+
+def format_ticker_info(df: pd.DataFrame, ticker: str, age: float | None = None, missed: list | None = None,
+                       columnar=None, cache_key=None, averages: dict | None = None,
+                       stale: list | None = None) -> str:
+    """Форматує повідомлення для конкретного тикера (averages - середні з історії)."""
+    cache_key, now = _render_minute(cache_key)
+    with timed(render_seconds, 'render', 'ticker'):
+        body = render_cache.get_or_render(cache_key,
+                                          lambda: _format_ticker_body(df, ticker, columnar, averages, now))
+    return body + format_snapshot_footer(age, missed, stale)
+
+def format_threshold_alert(items: list) -> str:
+    """Сповіщення про символи, чия ставка перетнула поріг: [(символ, ставка, біржа, поріг), ...]."""
+    items = sorted(items, key=lambda item: abs(item[1]), reverse=True)
+    header = f"<b>🔔 Фандінг перетнув поріг {items[0][3]}%</b>\n\n"
+    lines = [
+        f"{'🟢' if rate > 0 else '🔴'} <code>{html.escape(symbol):<8}</code>— <b>{rate:7.4f}%</b> — "
+        + (f'<a href="{get_trade_link(exchange, symbol)}">{html.escape(exchange)}</a>'
+           if get_trade_link(exchange, symbol) else html.escape(exchange))
+        for symbol, rate, exchange, _ in items
+    ]
+    return header + "\n".join(lines)
+
+def format_prefunding_alert(df: pd.DataFrame, funding_ts: float, total: int, columnar=None) -> str:
+    """
+    Сповіщення перед виплатою: рядки знімка (symbol/rate/exchange), чия виплата в funding_ts (секунди).
+    total - скільки символів пройшло фільтр, якщо в df лише найбільші з них.
+    """
+    minutes = max(int(round((funding_ts - time.time()) / 60)), 0)
+    at = time.strftime('%H:%M UTC', time.gmtime(funding_ts))
+    header = f"<b>⏰ Виплата фандінгу о {at} (через {minutes} хв)</b>\n\n"
+    rates = df['rate'].to_numpy()
+    body = renderer.join_lines(
+        np.where(rates > 0, "🟢", "🔴").astype(object), " <code>",
+        renderer.ljust(renderer.escape(df['symbol'].to_numpy()), 8), "</code>— <b>",
+        renderer.format_numbers(rates, "%7.4f"), "%</b> — ", _format_exchange_parts(df, columnar)
+    )
+    more = f"\n<i>…і ще {total - len(df)}</i>" if total > len(df) else ""
+    return header + body + more
+
+def format_stage_timings(traces: dict) -> str:
+    """
+    Розбивка останніх звітів по етапах ({назва: ReportTrace}).
+    Етапи з однаковою назвою підсумовуються; паралельні етапи (біржі) перекриваються в часі.
+    """
+    if not traces:
+        return "Ще не було жодного звіту."
+    blocks = []
+    for name, trace in traces.items():
+        totals = {}
+        for stage, seconds in trace.stages:
+            total, count = totals.get(stage, (0.0, 0))
+            totals[stage] = (total + seconds, count + 1)
+        ago = int(time.time() - trace.started_at)
+        lines = [f"<b>{html.escape(name)}</b> — {trace.total * 1000:.0f} ms ({ago} с тому)"]
+        for stage, (total, count) in sorted(totals.items(), key=lambda item: item[1][0], reverse=True):
+            repeats = f" ×{count}" if count > 1 else ""
+            lines.append(f"<code>{html.escape(stage):<16}{total * 1000:9.1f} ms</code>{repeats}")
+        blocks.append("\n".join(lines))
+    return "<b>⏱ Етапи останніх звітів</b>\n\n" + "\n\n".join(blocks)
@@ -1,87 +1,366 @@
 # src/services/funding_service.py
+from __future__ import annotations
 
-import ccxt
-import pandas as pd
+import asyncio
+import time
 import logging
 
+from ..config import (
+    AVAILABLE_EXCHANGES, FUNDING_CACHE_TTL, SCAN_DEADLINE, HISTORY_DIR, HISTORY_TAIL_ROWS,
+    HISTORY_MAX_SEGMENTS, HISTORY_RETENTION_DAYS, HISTORY_SAMPLE_INTERVAL, STREAM_PUBLISH_INTERVAL,
+    SHARED_SNAPSHOT_PATH, SHARED_SNAPSHOT_POLL_INTERVAL, SHARED_SNAPSHOT_MAX_AGE, MARKET_CACHE_DIR, MARKET_CACHE_TTL
+)
+from ..lazy_imports import LazyModule, warm_up_imports
+from .snapshot_cache import FundingSnapshotCache, FundingSnapshot
+from .exchange_pool import ExchangePool
+from .market_cache import MarketCache
+from .history_store import FundingHistoryStore
+from .exchange_health import exchange_health
+from .metrics import registry, timed, exchange_fetch_seconds, exchange_errors_total
+
 logger = logging.getLogger(__name__)
 
-def get_all_funding_data_sequential(enabled_exchanges: list) -> pd.DataFrame:
+# ccxt при імпорті завантажує класи всіх бірж, тож і він, і pandas імпортуються при першому використанні
+ccxt = LazyModule('ccxt')
+pd = LazyModule('pandas')
+
+# Довгоживучі клієнти бірж: HTTP-сесії та ринки переживають окремі сканування
+exchange_pool = ExchangePool()
+# Списки USDT-свопів з диска: сканування не чекає load_markets, ринки перевіряються у фоні
+market_cache = MarketCache(MARKET_CACHE_DIR, MARKET_CACHE_TTL, exchange_pool.load_markets)
+registry.collect('market_cache_events_total', "Події кешу ринків (hits, cold_loads, revalidations, errors)",
+                 lambda: {(event,): value for event, value in market_cache.stats.items()},
+                 kind='counter', labelnames=('event',))
+
+def _parse_funding_rates(name: str, funding_rates_data: dict) -> list:
+    """Перетворює відповідь fetch_funding_rates() на рядки знімка."""
+    rates_list = []
+    for symbol, data in funding_rates_data.items():
+        if 'USDT' in symbol and data.get('fundingRate') is not None:
+            rates_list.append({
+                'symbol': symbol.split('/')[0],
+                'rate': data['fundingRate'] * 100,
+                'exchange': name,
+                # Ціна для режиму спреду приходить у тій самій відповіді
+                'price': data.get('markPrice') or data.get('indexPrice'),
+                # fundingTimestamp у ccxt - час найближчої виплати (мс)
+                'next_funding_time': _to_millis(data.get('fundingTimestamp') or data.get('nextFundingTimestamp')),
+                'funding_interval': _parse_interval(data.get('interval')),
+            })
+    return rates_list
+
+def _to_millis(value) -> int | None:
+    """Мітка часу в мс з числа або рядка біржі; None, якщо її немає."""
+    try:
+        return int(float(value)) or None
+    except (TypeError, ValueError):
+        return None
+
+def _parse_interval(interval) -> float | None:
+    """Інтервал фандінгу ccxt ('8h', '4h', '30m') у годинах."""
+    if not isinstance(interval, str) or len(interval) < 2:
+        return None
+    units = {'m': 1 / 60, 'h': 1, 'd': 24}
+    try:
+        return float(interval[:-1]) * units[interval[-1]]
+    except (KeyError, ValueError):
+        return None
+
+def _fill_funding_schedule(exchange_id: str, rates_list: list, now: float | None = None) -> None:
+    """
+    Добирає інтервал фандінгу з кешу ринків, а якщо біржа не віддала час виплати -
+    оцінює його як найближчу межу інтервалу від півночі UTC (так рахують усі біржі зі списку).
+    """
+    info = market_cache.get(exchange_id)
+    intervals = info.intervals_by_base if info is not None else {}
+    now_ms = (now or time.time()) * 1000
+    for row in rates_list:
+        if row.get('funding_interval') is None:
+            row['funding_interval'] = intervals.get(row['symbol'])
+        interval = row.get('funding_interval')
+        if row.get('next_funding_time') is None and interval:
+            period = interval * 3600 * 1000
+            row['next_funding_time'] = int((now_ms // period + 1) * period)
+
+def _get_swap_symbols(markets: dict) -> list:
+    """Фільтруємо тільки безстрокові USDT свопи."""
+    return [m['symbol'] for m in markets.values() if m.get('swap') and m.get('quote', '').upper() == 'USDT']
+
+def _parse_tickers(name: str, tickers: dict) -> list:
+    """Дістає ставки фандінгу з відповіді fetch_tickers()."""
+    rates_list = []
+    for symbol, ticker in tickers.items():
+        rate_info = None
+        if 'fundingRate' in ticker:
+            rate_info = ticker['fundingRate']
+        # Деякі біржі ховають дані в полі 'info'
+        elif isinstance(ticker.get('info'), dict) and 'fundingRate' in ticker['info']:
+            rate_info = ticker['info']['fundingRate']
+
+        if rate_info is not None:
+            info = ticker.get('info') if isinstance(ticker.get('info'), dict) else {}
+            rates_list.append({
+                'symbol': symbol.split('/')[0],
+                'rate': float(rate_info) * 100,
+                'exchange': name,
+                'price': _ticker_price(ticker),
+                'next_funding_time': _to_millis(info.get('nextFundingTime')),
+                'funding_interval': None,
+            })
+    return rates_list
+
+def _ticker_price(ticker: dict) -> float | None:
+    """Mark-ціна тикера, а якщо її немає - остання ціна угоди."""
+    return ticker.get('markPrice') or ticker.get('mark') or ticker.get('last')
+
+async def _fill_missing_prices(name: str, exchange, exchange_id: str, rates_list: list) -> None:
     """
-    Послідовно отримує дані з усіх увімкнених бірж,
-    використовуючи альтернативний метод для непідтримуваних.
+    Деякі біржі не віддають mark-ціну у fetch_funding_rates(). Тоді ціни добираються
+    одним пакетним fetch_tickers() на всю біржу в межах того самого сканування,
+    а не окремими запитами по символах.
     """
-    logger.info(f"Запуск послідовного сканування для: {enabled_exchanges}")
-    all_rates_list = []
-    
-    for name in enabled_exchanges:
-        from src.config import AVAILABLE_EXCHANGES # Імпортуємо тут, щоб уникнути циклічних залежностей
-        exchange_id = AVAILABLE_EXCHANGES.get(name)
-        if not exchange_id:
-            logger.warning(f"Пропускаю {name}: не знайдено ID в конфігурації.")
-            continue
+    if not rates_list or any(row.get('price') for row in rates_list):
+        return
+    swap_symbols = await market_cache.swap_symbols(exchange_id)
+    if not swap_symbols:
+        return
+    try:
+        tickers = await exchange.fetch_tickers(swap_symbols)
+    except Exception as e:
+        logger.warning(f"   -> {name}: не вдалося отримати ціни для спреду: {e}")
+        return
+    prices = {}
+    for symbol, ticker in tickers.items():
+        prices.setdefault(symbol.split('/')[0], _ticker_price(ticker))
+    for row in rates_list:
+        row['price'] = prices.get(row['symbol'])
+
+def _drop_duplicate_symbols(rates_list: list) -> list:
+    """Прибирає дублікати символів у межах біржі (залишає перший)."""
+    seen = set()
+    unique_rates = []
+    for row in rates_list:
+        if row['symbol'] not in seen:
+            seen.add(row['symbol'])
+            unique_rates.append(row)
+    return unique_rates
 
+async def fetch_exchange_rates_async(name: str, exchange_map: dict | None = None) -> list | None:
+    """Ставки фандінгу однієї біржі на довгоживучому клієнті пулу; None, якщо біржу не вдалося обробити."""
+    exchange_id = (exchange_map or AVAILABLE_EXCHANGES).get(name)
+    if not exchange_id:
+        logger.warning(f"Пропускаю {name}: не знайдено ID в конфігурації.")
+        return None
+
+    try:
+        exchange = exchange_pool.get(exchange_id)
+        exchange.timeout = int(exchange_health.get(name).timeout() * 1000)
         try:
-            logger.info(f"--- Обробка {name} ---")
-            exchange = getattr(ccxt, exchange_id)({'timeout': 20000}) # Таймаут 20 сек
-            
             # 1. Пробуємо стандартний, швидкий метод
-            funding_rates_data = exchange.fetch_funding_rates()
-            logger.info(f"   -> {name} підтримує fetch_funding_rates(). Обробка...")
-            for symbol, data in funding_rates_data.items():
-                if 'USDT' in symbol and data.get('fundingRate') is not None:
-                    all_rates_list.append({
-                        'symbol': symbol.split('/')[0],
-                        'rate': data['fundingRate'] * 100,
-                        'exchange': name
-                    })
-
+            rates_list = _parse_funding_rates(name, await exchange.fetch_funding_rates())
+            await _fill_missing_prices(name, exchange, exchange_id, rates_list)
         except ccxt.NotSupported:
-            # 2. Якщо стандартний метод не працює, використовуємо альтернативний
+            # 2. Альтернативний метод через тикери
             logger.warning(f"   -> {name} не підтримує fetch_funding_rates(). Використовую альтернативний метод...")
             try:
-                markets = exchange.load_markets()
-                # Фільтруємо тільки безстрокові USDT свопи
-                swap_symbols = [m['symbol'] for m in markets.values() if m.get('swap') and m.get('quote', '').upper() == 'USDT']
-                if not swap_symbols: continue
-
-                tickers = exchange.fetch_tickers(swap_symbols)
-                for symbol, ticker in tickers.items():
-                    rate_info = None
-                    if 'fundingRate' in ticker:
-                        rate_info = ticker['fundingRate']
-                    # Деякі біржі ховають дані в полі 'info'
-                    elif isinstance(ticker.get('info'), dict) and 'fundingRate' in ticker['info']:
-                        rate_info = ticker['info']['fundingRate']
-
-                    if rate_info is not None:
-                        all_rates_list.append({
-                            'symbol': symbol.split('/')[0],
-                            'rate': float(rate_info) * 100,
-                            'exchange': name
-                        })
+                # Список свопів - з кешу ринків на диску, тож тут лише один запит тикерів
+                swap_symbols = await market_cache.swap_symbols(exchange_id)
+                if not swap_symbols: return []
+                rates_list = _parse_tickers(name, await exchange.fetch_tickers(swap_symbols))
             except Exception as e:
                 logger.error(f"   ! Помилка альтернативного методу для {name}: {e}")
+                return None
+        _fill_funding_schedule(exchange_id, rates_list)
+    except Exception as e:
+        logger.error(f"   ! Загальна помилка при обробці {name}: {e}")
+        return None
 
-        except Exception as e:
-            logger.error(f"   ! Загальна помилка при обробці {name}: {e}")
+    return _drop_duplicate_symbols(rates_list)
 
-    if not all_rates_list:
-        return pd.DataFrame()
-        
-    df = pd.DataFrame(all_rates_list)
-    df.drop_duplicates(subset=['symbol', 'exchange'], inplace=True, keep='first')
-    return df
-
-def get_funding_for_ticker_sequential(ticker: str, enabled_exchanges: list) -> pd.DataFrame:
-    """Отримує дані для конкретного тикера, використовуючи основну функцію."""
-    ticker_clean = ticker.upper().replace("USDT", "").replace("/", "")
-    logger.info(f"Шукаю дані по тикеру {ticker_clean} на: {enabled_exchanges}")
-    
-    full_data = get_all_funding_data_sequential(enabled_exchanges)
-    
-    if full_data.empty:
+async def _fetch_tracked(name: str, exchange_map: dict | None = None) -> list | None:
+    """fetch_exchange_rates_async() з адаптивним таймаутом і записом затримки/помилки в здоров'я біржі."""
+    health = exchange_health.get(name)
+    timeout = health.timeout()
+    started = time.monotonic()
+    try:
+        with timed(exchange_fetch_seconds, f"fetch {name}", name):
+            rows = await asyncio.wait_for(fetch_exchange_rates_async(name, exchange_map), timeout)
+    except asyncio.TimeoutError:
+        logger.warning(f"   ! {name} не відповіла за {timeout:.1f} с")
+        health.record_failure(timed_out=True)
+        exchange_errors_total.inc(name, 'timeout')
+        return None
+    if rows is None:
+        health.record_failure()
+        exchange_errors_total.inc(name, 'error')
+    else:
+        health.record_success(time.monotonic() - started)
+    return rows
+
+class ScanResult:
+    """Результат одного паралельного сканування."""
+
+    def __init__(self, rates: dict, missed: list, failed: list, elapsed: float, stale: list | None = None,
+                 retry_in: dict | None = None, confirmed: dict | None = None):
+        # {назва біржі: список рядків} лише для бірж, що відповіли вчасно
+        self.rates = rates
+        # Біржі, що не вклалися в дедлайн сканування
+        self.missed = missed
+        # Біржі, що повернули помилку
+        self.failed = failed
+        self.elapsed = elapsed
+        # Біржі з відкритим запобіжником: не опитувались, у знімку лишаються їхні останні дані
+        self.stale = stale or []
+        # {біржа зі stale: секунд до наступного пробного запиту запобіжника}
+        self.retry_in = retry_in or {}
+        # {біржа без нових рядків: час, на який її дані підтверджено (напр. останнє повідомлення стріму)}
+        self.confirmed = confirmed or {}
+
+    def to_dataframe(self) -> pd.DataFrame:
+        all_rates_list = [row for rows in self.rates.values() for row in rows]
+        return pd.DataFrame(all_rates_list)
+
+async def fetch_all_funding_data(enabled_exchanges: list, deadline: float = SCAN_DEADLINE,
+                                 exchange_map: dict | None = None) -> ScanResult:
+    """
+    Паралельно опитує всі увімкнені біржі з глобальним дедлайном.
+    Біржі, що не встигли, скасовуються і позначаються в ScanResult.missed,
+    тож час сканування дорівнює найповільнішій біржі, а не сумі всіх.
+    """
+    logger.info(f"Запуск паралельного сканування для: {enabled_exchanges}")
+    started = time.monotonic()
+    names = list(dict.fromkeys(enabled_exchanges))
+    # Хвора біржа не тримає все сканування: поки запобіжник відкритий, її пропускаємо
+    stale = [name for name in names if not exchange_health.get(name).allow()]
+    tasks = {
+        name: asyncio.create_task(_fetch_tracked(name, exchange_map))
+        for name in names if name not in stale
+    }
+    if tasks:
+        await asyncio.wait(tasks.values(), timeout=deadline)
+
+    rates, missed, failed = {}, [], []
+    for name, task in tasks.items():
+        if not task.done():
+            task.cancel()
+            missed.append(name)
+        elif task.result() is None:
+            failed.append(name)
+        else:
+            rates[name] = task.result()
+    # Даємо скасованим задачам закрити свої з'єднання
+    cancelled = [tasks[name] for name in missed]
+    if cancelled:
+        await asyncio.gather(*cancelled, return_exceptions=True)
+        logger.warning(f"Не вклалися в дедлайн {deadline} с: {missed}")
+        for name in missed:
+            exchange_health.get(name).record_failure(timed_out=True)
+            exchange_errors_total.inc(name, 'deadline')
+    if stale:
+        logger.warning(f"Запобіжник відкрито, віддаю останні дані: {stale}")
+
+    elapsed = time.monotonic() - started
+    logger.info(f"Сканування завершено за {elapsed:.2f} с")
+    retry_in = {name: exchange_health.get(name).retry_in() for name in stale}
+    return ScanResult(rates, missed, failed, elapsed, stale, retry_in)
+
+# Спільний для процесу кеш: один скан біржі обслуговує всі чати
+funding_cache = FundingSnapshotCache(fetch_all_funding_data, ttl=FUNDING_CACHE_TTL)
+registry.collect('funding_cache_events_total', "Події кешу знімків (hits, misses, scans, coalesced_*)",
+                 lambda: {(event,): value for event, value in funding_cache.stats.items()},
+                 kind='counter', labelnames=('event',))
+registry.collect('funding_cache_version', "Поточна версія кешу знімків", lambda: funding_cache.version)
+
+# Історія ставок; вмикається процесом бота (воркер її не пише, щоб не було двох записувачів)
+history_store = None
+
+def enable_history(directory: str = HISTORY_DIR) -> FundingHistoryStore:
+    """Підключає сховище історії до кешу: кожне сканування дописується на диск."""
+    global history_store
+    history_store = FundingHistoryStore(
+        directory, HISTORY_TAIL_ROWS, HISTORY_MAX_SEGMENTS, HISTORY_RETENTION_DAYS, HISTORY_SAMPLE_INTERVAL
+    )
+    funding_cache.add_listener(history_store.append_scan)
+    return history_store
+
+def get_ticker_averages(df: pd.DataFrame) -> dict | None:
+    """Середні ставки за 24 год / 7 днів для рядків тикера, якщо історія увімкнена."""
+    if history_store is None or df.empty:
+        return None
+    return history_store.average_rates(df['symbol'].unique())
+
+# Потокове джерело; вмикається процесом бота при INGESTION_MODE = 'stream'
+stream_ingestor = None
+
+def enable_streaming(exchanges: list | None = None):
+    """
+    Перемикає кеш знімків на потоковий стан: біржі оновлюються підписками,
+    а кеш забирає зміни раз на STREAM_PUBLISH_INTERVAL без запитів до бірж.
+    Викликається з запущеного циклу подій.
+    """
+    global stream_ingestor
+    from .stream_ingest import StreamIngestor
+    stream_ingestor = StreamIngestor()
+    stream_ingestor.start(exchanges or list(AVAILABLE_EXCHANGES))
+    funding_cache.set_source(stream_ingestor.fetch, STREAM_PUBLISH_INTERVAL)
+    return stream_ingestor
+
+# Читач спільного знімка воркера; вмикається процесом бота при INGESTION_MODE = 'shared'
+shared_source = None
+
+def enable_shared_snapshot(path: str = SHARED_SNAPSHOT_PATH):
+    """
+    Перемикає кеш знімків на спільний знімок, який публікує воркер: процес бота не
+    сканує біржі сам, а раз на SHARED_SNAPSHOT_POLL_INTERVAL перевіряє нову публікацію.
+    """
+    global shared_source
+    from .shared_snapshot import SharedSnapshotSource
+    shared_source = SharedSnapshotSource(path, SHARED_SNAPSHOT_MAX_AGE, FUNDING_CACHE_TTL)
+    funding_cache.set_source(shared_source.fetch, SHARED_SNAPSHOT_POLL_INTERVAL)
+    return shared_source
+
+async def publish_shared_snapshot(writer, enabled_exchanges: list) -> bool:
+    """Воркер: оновлює застарілі біржі в кеші і публікує його стан, якщо з'явилась нова версія."""
+    await funding_cache.get_snapshot(enabled_exchanges)
+    if writer.published_version == funding_cache.version:
+        return False
+    return writer.publish(funding_cache.exchange_entries(), funding_cache.version)
+
+async def warm_up(enabled_exchanges: list, exchange_map: dict | None = None) -> None:
+    """
+    Фоновий прогрів після старту полінгу: pandas і ccxt імпортуються в окремому потоці,
+    далі створюються клієнти бірж і завантажуються їхні ринки, щоб за це не платив перший звіт.
+    """
+    started = time.monotonic()
+    timings = await asyncio.to_thread(warm_up_imports)
+    exchange_map = exchange_map or AVAILABLE_EXCHANGES
+    exchange_ids = [exchange_map[name] for name in dict.fromkeys(enabled_exchanges) if name in exchange_map]
+    results = await asyncio.gather(*(exchange_pool.load_markets(exchange_id) for exchange_id in exchange_ids),
+                                   return_exceptions=True)
+    failed = [exchange_id for exchange_id, result in zip(exchange_ids, results) if isinstance(result, Exception)]
+    # Ринки вже завантажені для клієнтів - заодно оновлюємо застарілі записи кешу ринків
+    expired = set(market_cache.expired(exchange_ids))
+    for exchange_id, markets in zip(exchange_ids, results):
+        if exchange_id in expired and not isinstance(markets, Exception):
+            await asyncio.to_thread(market_cache.put, exchange_id, markets)
+    imports = ", ".join(f"{name} {seconds:.2f} с" for name, seconds in timings.items())
+    logger.info(f"Прогрів завершено за {time.monotonic() - started:.2f} с (імпорти: {imports})")
+    if failed:
+        logger.warning(f"Прогрів: не вдалося завантажити ринки {failed}")
+
+async def get_funding_snapshot(enabled_exchanges: list) -> FundingSnapshot:
+    """Повертає знімок фандінгу з кешу, скануючи лише застарілі біржі."""
+    return await funding_cache.get_snapshot(enabled_exchanges)
+
+def filter_ticker(snapshot: FundingSnapshot, ticker: str) -> pd.DataFrame:
+    """Вибирає зі знімка рядки тикера через індекс символів (з псевдонімами)."""
+    ticker_data = snapshot.ticker_frame(ticker)
+    if ticker_data.empty:
         return pd.DataFrame()
-        
-    ticker_data = full_data[full_data['symbol'] == ticker_clean]
-    return ticker_data.sort_values(by='rate', ascending=False)
\ No newline at end of file
+    return ticker_data.sort_values(by='rate', ascending=False)
+
+async def get_funding_for_ticker(ticker: str, enabled_exchanges: list) -> pd.DataFrame:
+    """Отримує дані для конкретного тикера з кешованого знімка."""
+    logger.info(f"Шукаю дані по тикеру {ticker} на: {enabled_exchanges}")
+    snapshot = await get_funding_snapshot(enabled_exchanges)
+    return filter_ticker(snapshot, ticker)
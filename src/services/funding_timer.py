@@ -0,0 +1,193 @@
+# src/services/funding_timer.py
+import asyncio
+import heapq
+import logging
+import time
+
+import numpy as np
+from telegram.constants import ParseMode
+from telegram.error import Forbidden, BadRequest
+from telegram.ext import Application, ContextTypes
+
+from ..config import PREFUNDING_ALERT_LEAD, PREFUNDING_CHECK_INTERVAL, PREFUNDING_ALERT_MAX_ROWS
+from ..lazy_imports import LazyModule
+from . import funding_service, formatters
+from .metrics import registry
+from .send_queue import send_queue, PRIORITY_BROADCAST
+from .settings_view import settings_view
+from .symbol_filter import get_filter
+
+logger = logging.getLogger(__name__)
+
+# pandas імпортується при першому використанні, а не під час старту бота
+pd = LazyModule('pandas')
+
+
+class FundingTimer:
+    """
+    Таймер виплат фандінгу на мін-купі.
+    У купі лише різні моменти виплат (секунди), а не пари (символ, біржа): біржі платять
+    на спільних межах інтервалу, тож тисячі символів дають кілька моментів на добу.
+    Сканування додають нові моменти за O(log n); pop_due віддає ті, до яких лишилося
+    не більше lead секунд, і кожен - рівно один раз.
+    """
+
+    def __init__(self):
+        self._heap = []
+        # Моменти, що вже в купі або вже спрацювали (щоб наступні сканування їх не повертали)
+        self._scheduled = set()
+        self._fired = set()
+        self.stats = {'updates': 0, 'scheduled': 0, 'fired': 0, 'expired': 0}
+
+    def update(self, result, fetched_at: float | None = None) -> None:
+        """Слухач кешу знімків: додає моменти виплат з нових рядків бірж."""
+        self.stats['updates'] += 1
+        now = time.time()
+        moments = {
+            int(row['next_funding_time'] // 1000)
+            for rows in result.rates.values() for row in rows
+            if row.get('next_funding_time') is not None
+        }
+        for moment in moments:
+            if moment > now and moment not in self._scheduled and moment not in self._fired:
+                heapq.heappush(self._heap, moment)
+                self._scheduled.add(moment)
+                self.stats['scheduled'] += 1
+
+    def pop_due(self, now: float, lead: float) -> list:
+        """Моменти виплат, до яких лишилося не більше lead секунд; ті, що вже минули, відкидаються."""
+        due = []
+        while self._heap and self._heap[0] <= now + lead:
+            moment = heapq.heappop(self._heap)
+            self._scheduled.discard(moment)
+            if moment <= now:
+                self.stats['expired'] += 1
+                continue
+            self._fired.add(moment)
+            due.append(moment)
+        self.stats['fired'] += len(due)
+        self._fired = {moment for moment in self._fired if moment > now}
+        return due
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+
+class PrefundingSubscribers:
+    """
+    Чати, що ввімкнули сповіщення перед виплатою, згруповані за (поріг, біржі, фільтр символів):
+    однакові налаштування - один рендер на групу. Зміна налаштувань чату переносить лише його (update).
+    """
+
+    def __init__(self, all_settings: dict | None = None):
+        # {ключ групи: {chat_id: None}} - впорядкована множина чатів групи
+        self.groups = {}
+        self._keys = {}
+        for chat_id, settings in (all_settings or {}).items():
+            self.update(chat_id, settings)
+
+    def update(self, chat_id, settings: dict | None) -> None:
+        """Переносить чат у групу за новими налаштуваннями (None або вимкнені сповіщення - лише видаляє)."""
+        chat_id = int(chat_id)
+        key = self._keys.pop(chat_id, None)
+        if key is not None:
+            group = self.groups[key]
+            del group[chat_id]
+            if not group:
+                del self.groups[key]
+        if settings is None or not settings.get('enabled', True) or not settings.get('prefunding_alerts'):
+            return
+        key = (
+            float(settings['threshold']),
+            frozenset(settings.get('exchanges', [])),
+            get_filter(settings.get('blacklist'), settings.get('whitelist')),
+        )
+        self.groups.setdefault(key, {})[chat_id] = None
+        self._keys[chat_id] = key
+
+    @property
+    def exchanges(self) -> list:
+        return sorted({name for _, exchanges, _ in self.groups for name in exchanges})
+
+
+funding_timer = FundingTimer()
+# Підписники оновлюються зі спільного вигляду налаштувань разом з індексом порогів
+subscribers = PrefundingSubscribers()
+settings_view.add_index(subscribers)
+
+registry.collect('prefunding_timer_events_total', "Події таймера виплат (updates, scheduled, fired, expired)",
+                 lambda: {(event,): value for event, value in funding_timer.stats.items()},
+                 kind='counter', labelnames=('event',))
+
+
+def render_prefunding_alerts(df, moment: int, subscribers: PrefundingSubscribers, columnar=None) -> dict:
+    """
+    {текст: [chat_id, ...]} для виплати в moment: рядки знімка з цим часом виплати, по групі чатів.
+    columnar - колонковий вигляд того ж знімка, щоб посилання не будувались заново для кожної групи.
+    """
+    if df.empty or 'next_funding_time' not in df.columns:
+        return {}
+    funding_times = df['next_funding_time'].to_numpy(dtype=np.float64)
+    due = df[np.floor(funding_times / 1000) == moment]
+    if due.empty:
+        return {}
+    # Фільтри груп - маски над кодами бірж і модулями ставок, без pandas на кожну групу
+    exchange_codes, exchange_names = pd.factorize(due['exchange'])
+    code_of = {name: code for code, name in enumerate(exchange_names)}
+    abs_rates = np.abs(due['rate'].to_numpy(dtype=np.float64))
+    symbols = due['symbol'].to_numpy()
+    texts = {}
+    for (threshold, exchanges, symbol_filter), chat_ids in subscribers.groups.items():
+        codes = [code_of[name] for name in exchanges if name in code_of]
+        mask = np.isin(exchange_codes, codes) & (abs_rates >= threshold)
+        if symbol_filter and columnar is not None:
+            # Маска профілю кешована на всесвіт символів знімка; рядки due - позиції в ньому
+            allowed = columnar.filter_mask(*symbol_filter.key)
+            mask &= allowed[columnar.symbol_codes[due.index.to_numpy()]]
+        elif symbol_filter:
+            mask &= symbol_filter.mask(symbols)
+        positions = np.flatnonzero(mask)
+        if not len(positions):
+            continue
+        top = positions[np.argsort(-abs_rates[positions], kind='stable')[:PREFUNDING_ALERT_MAX_ROWS]]
+        text = formatters.format_prefunding_alert(due.iloc[top], moment, len(positions), columnar)
+        texts.setdefault(text, []).extend(chat_ids)
+    return texts
+
+
+async def _send_prefunding(chat_id: int, text: str) -> None:
+    try:
+        await send_queue.send_message(
+            chat_id, text, priority=PRIORITY_BROADCAST, parse_mode=ParseMode.HTML, disable_web_page_preview=True
+        )
+    except (Forbidden, BadRequest) as e:
+        logger.warning(f"Не вдалося надіслати сповіщення про виплату {chat_id}: {e}")
+    except Exception as e:
+        logger.error(f"Помилка сповіщення про виплату для {chat_id}: {e}", exc_info=True)
+
+
+async def prefunding_tick(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Тримає свіжими біржі підписників і розсилає по одному повідомленню на чат для кожної найближчої виплати.
+    Без підписників моменти лишаються в таймері: чат, що ввімкнув сповіщення перед виплатою, її не пропустить.
+    """
+    await settings_view.ensure_loaded()
+    if not subscribers.groups:
+        return
+    # Сканування застарілих бірж підписників; слухач кешу додає в таймер нові моменти виплат
+    snapshot = await funding_service.get_funding_snapshot(subscribers.exchanges)
+    due = funding_timer.pop_due(time.time(), PREFUNDING_ALERT_LEAD)
+    for moment in due:
+        texts = render_prefunding_alerts(snapshot.df, moment, subscribers, snapshot.columnar)
+        if texts:
+            logger.info(f"Сповіщення про виплату о {moment}: {sum(len(ids) for ids in texts.values())} чатів")
+        await asyncio.gather(*(
+            _send_prefunding(chat_id, text) for text, chat_ids in texts.items() for chat_id in chat_ids
+        ))
+
+
+def schedule_prefunding_alerts(application: Application) -> None:
+    """Підключає таймер виплат до кешу знімків і реєструє періодичну перевірку."""
+    funding_service.funding_cache.add_listener(funding_timer.update)
+    application.job_queue.run_repeating(prefunding_tick, interval=PREFUNDING_CHECK_INTERVAL,
+                                        first=PREFUNDING_CHECK_INTERVAL, name="prefunding_tick")
@@ -0,0 +1,263 @@
+# src/services/history_store.py
+from __future__ import annotations
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+from ..lazy_imports import LazyModule
+
+logger = logging.getLogger(__name__)
+
+# pandas імпортується при першому використанні, а не під час старту бота
+pd = LazyModule('pandas')
+
+# Рядок сегмента: час, код символу, код біржі, ставка (% за період)
+SEGMENT_DTYPE = np.dtype([('ts', '<f8'), ('symbol', '<i4'), ('exchange', '<i2'), ('rate', '<f4')])
+
+
+class _Segment:
+    """
+    Незмінний сегмент історії: .npy з рядками, відсортованими за (символ, час),
+    і .json з категоріями символів/бірж та часовим діапазоном. Читається через mmap.
+    """
+
+    def __init__(self, base_path: str):
+        self.base_path = base_path
+        with open(base_path + '.json', 'r') as f:
+            meta = json.load(f)
+        self.symbols = meta['symbols']
+        self.exchanges = np.asarray(meta['exchanges'], dtype=object)
+        self.ts_min = meta['ts_min']
+        self.ts_max = meta['ts_max']
+        self._symbol_codes = {symbol: code for code, symbol in enumerate(self.symbols)}
+        self.data = np.load(base_path + '.npy', mmap_mode='r')
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def rows_for(self, symbol: str, since: float) -> tuple:
+        """(ts, назви бірж, ставки) символу з часу since; бінарний пошук по відсортованих кодах."""
+        code = self._symbol_codes.get(symbol)
+        if code is None or self.ts_max < since:
+            return None
+        codes = self.data['symbol']
+        left, right = np.searchsorted(codes, code, 'left'), np.searchsorted(codes, code, 'right')
+        block = self.data[left:right]
+        start = np.searchsorted(block['ts'], since, 'left')
+        block = block[start:]
+        return block['ts'], self.exchanges[block['exchange']], block['rate'].astype(np.float64)
+
+    def read_all(self) -> pd.DataFrame:
+        return pd.DataFrame({
+            'ts': np.asarray(self.data['ts']),
+            'symbol': np.asarray(self.symbols, dtype=object)[self.data['symbol']],
+            'exchange': self.exchanges[self.data['exchange']],
+            'rate': np.asarray(self.data['rate'], dtype=np.float64),
+        })
+
+    def remove(self) -> None:
+        for ext in ('.npy', '.json'):
+            try:
+                os.remove(self.base_path + ext)
+            except FileNotFoundError:
+                pass
+
+
+def _write_segment(directory: str, df: pd.DataFrame) -> str:
+    """Записує рядки (ts, symbol, exchange, rate) як новий сегмент і повертає його базовий шлях."""
+    symbol_codes, symbols = pd.factorize(df['symbol'], sort=True)
+    exchange_codes, exchanges = pd.factorize(df['exchange'], sort=True)
+    data = np.empty(len(df), dtype=SEGMENT_DTYPE)
+    data['ts'] = df['ts'].to_numpy()
+    data['symbol'] = symbol_codes
+    data['exchange'] = exchange_codes
+    data['rate'] = df['rate'].to_numpy()
+    data = data[np.lexsort((data['ts'], data['symbol']))]
+
+    # Ім'я починається з найранішого часу, тож сортування імен = хронологічний порядок
+    base_path = os.path.join(directory, f"seg-{data['ts'].min():017.6f}-{os.getpid()}-{time.time_ns()}")
+    with open(base_path + '.npy.tmp', 'wb') as f:
+        np.save(f, data, allow_pickle=False)
+    os.replace(base_path + '.npy.tmp', base_path + '.npy')
+    meta = {
+        'symbols': list(symbols), 'exchanges': list(exchanges),
+        'ts_min': float(data['ts'].min()), 'ts_max': float(data['ts'].max()), 'rows': len(data),
+    }
+    with open(base_path + '.json.tmp', 'w') as f:
+        json.dump(meta, f)
+    os.replace(base_path + '.json.tmp', base_path + '.json')
+    return base_path
+
+
+class FundingHistoryStore:
+    """
+    Історія ставок фандінгу: append-only колонкові сегменти на диску (mmap для читання),
+    обмежений хвіст у пам'яті та компакція старих сегментів.
+    Кожна біржа записується не частіше, ніж раз на sample_interval секунд.
+
+    append_scan лише дописує хвіст у пам'яті (він - слухач кешу в циклі подій); запис
+    сегментів і компакцію виконує фоновий потік history-writer, тож диск не блокує бота.
+    """
+
+    def __init__(self, directory: str, tail_rows: int = 50000, max_segments: int = 32,
+                 retention_days: float = 8, sample_interval: float = 300):
+        self.directory = directory
+        self.tail_rows = tail_rows
+        self.max_segments = max_segments
+        self.retention = retention_days * 86400
+        self.sample_interval = sample_interval
+        os.makedirs(directory, exist_ok=True)
+        # _lock - короткі зміни списків; _write_lock - один запис сегментів чи компакція за раз
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._tail = []
+        self._tail_size = 0
+        # Хвіст, що саме записується в сегмент: читачі бачать його, поки сегмент не з'явиться
+        self._flushing = []
+        self._last_sample = {}
+        self._segments = self._load_segments()
+        self._wake = threading.Event()
+        self._closed = False
+        self._writer = threading.Thread(target=self._writer_loop, name="history-writer", daemon=True)
+        self._writer.start()
+
+    def _load_segments(self) -> list:
+        segments = []
+        for name in sorted(os.listdir(self.directory)):
+            if name.startswith('seg-') and name.endswith('.json'):
+                base_path = os.path.join(self.directory, name[:-len('.json')])
+                if os.path.exists(base_path + '.npy'):
+                    segments.append(_Segment(base_path))
+        return segments
+
+    # --- Запис ---
+    def append_scan(self, result, fetched_at: float | None = None) -> None:
+        """Слухач кешу знімків: додає ставки бірж, що відповіли, до хвоста історії."""
+        ts = fetched_at or time.time()
+        chunks = []
+        for name, rows in result.rates.items():
+            if not rows or ts - self._last_sample.get(name, 0) < self.sample_interval:
+                continue
+            self._last_sample[name] = ts
+            chunks.append(pd.DataFrame({
+                'ts': ts,
+                'symbol': [row['symbol'] for row in rows],
+                'exchange': name,
+                'rate': [row['rate'] for row in rows],
+            }))
+        if not chunks:
+            return
+        with self._lock:
+            self._tail.extend(chunks)
+            self._tail_size += sum(len(chunk) for chunk in chunks)
+            should_flush = self._tail_size >= self.tail_rows
+        if should_flush:
+            # Сам запис - у потоці history-writer
+            self._wake.set()
+
+    def _writer_loop(self) -> None:
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            if self._closed:
+                return
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Історія: не вдалося записати сегмент: {e}", exc_info=True)
+
+    def flush(self) -> None:
+        """Переносить хвіст з пам'яті в новий сегмент на диску (блокує - викликати поза циклом подій)."""
+        with self._write_lock:
+            with self._lock:
+                if not self._tail:
+                    return
+                # Підміна списку: слухач далі дописує новий хвіст, поки старий пишеться на диск
+                self._flushing, self._tail, self._tail_size = self._tail, [], 0
+            try:
+                df = pd.concat(self._flushing, ignore_index=True)
+                segment = _Segment(_write_segment(self.directory, df))
+            except Exception:
+                with self._lock:
+                    self._tail[:0] = self._flushing
+                    self._tail_size += sum(len(chunk) for chunk in self._flushing)
+                    self._flushing = []
+                raise
+            with self._lock:
+                self._segments.append(segment)
+                self._flushing = []
+                needs_compaction = len(self._segments) > self.max_segments
+            logger.info(f"Історія: записано сегмент з {len(df)} рядків.")
+            if needs_compaction:
+                self._compact()
+
+    def compact(self) -> None:
+        """Зливає старішу половину сегментів в один, відкидаючи рядки старші за retention."""
+        with self._write_lock:
+            self._compact()
+
+    def _compact(self) -> None:
+        with self._lock:
+            old = self._segments[:max(2, len(self._segments) // 2)]
+        if len(old) < 2:
+            return
+        # Сегменти незмінні, тож читаються і зливаються без блокування читачів
+        cutoff = time.time() - self.retention
+        df = pd.concat([segment.read_all() for segment in old], ignore_index=True)
+        df = df[df['ts'] >= cutoff]
+        merged = [_Segment(_write_segment(self.directory, df))] if not df.empty else []
+        with self._lock:
+            self._segments = merged + self._segments[len(old):]
+        for segment in old:
+            segment.remove()
+        logger.info(f"Історія: злито {len(old)} сегментів, залишилось рядків {len(df)}.")
+
+    def close(self) -> None:
+        """Зупиняє потік запису і скидає залишок хвоста на диск."""
+        self._closed = True
+        self._wake.set()
+        self._writer.join(timeout=5)
+        self.flush()
+
+    # --- Читання ---
+    def _collect(self, symbol: str, since: float) -> tuple:
+        ts_parts, exchange_parts, rate_parts = [], [], []
+        with self._lock:
+            segments = list(self._segments)
+            tail = self._flushing + self._tail
+        for segment in segments:
+            rows = segment.rows_for(symbol, since)
+            if rows is not None:
+                ts_parts.append(rows[0]); exchange_parts.append(rows[1]); rate_parts.append(rows[2])
+        for chunk in tail:
+            chunk = chunk[(chunk['symbol'] == symbol) & (chunk['ts'] >= since)]
+            if not chunk.empty:
+                ts_parts.append(chunk['ts'].to_numpy())
+                exchange_parts.append(chunk['exchange'].to_numpy(dtype=object))
+                rate_parts.append(chunk['rate'].to_numpy(dtype=np.float64))
+        if not ts_parts:
+            return np.array([]), np.array([], dtype=object), np.array([])
+        return np.concatenate(ts_parts), np.concatenate(exchange_parts), np.concatenate(rate_parts)
+
+    def average_rates(self, symbols, windows: tuple = (86400, 7 * 86400)) -> dict:
+        """Середні ставки за кожне вікно: {(symbol, exchange): (avg_window1, avg_window2, ...)}."""
+        result = {}
+        now = time.time()
+        for symbol in set(symbols):
+            ts, exchanges, rates = self._collect(symbol, now - max(windows))
+            if len(ts) == 0:
+                continue
+            exchange_codes, exchange_names = pd.factorize(exchanges)
+            averages = []
+            for window in windows:
+                in_window = ts >= now - window
+                sums = np.bincount(exchange_codes[in_window], weights=rates[in_window], minlength=len(exchange_names))
+                counts = np.bincount(exchange_codes[in_window], minlength=len(exchange_names))
+                averages.append(np.divide(sums, counts, out=np.full(len(sums), np.nan), where=counts > 0))
+            for code, exchange in enumerate(exchange_names):
+                result[(symbol, exchange)] = tuple(float(avg[code]) for avg in averages)
+        return result
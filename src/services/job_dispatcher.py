@@ -0,0 +1,74 @@
+# src/services/job_dispatcher.py
+import asyncio
+import logging
+import threading
+import uuid
+from multiprocessing import Queue
+
+logger = logging.getLogger(__name__)
+
+
+class JobDispatcher:
+    """
+    Єдиний читач result_queue всередині процесу бота.
+    Кожне завдання отримує власний asyncio.Future за job_id, тож обробники
+    чекають лише свій результат - без опитування черги і без повернення чужих результатів.
+    """
+
+    def __init__(self, task_queue: Queue, result_queue: Queue):
+        self.task_queue = task_queue
+        self.result_queue = result_queue
+        self._futures = {}
+        self._loop = None
+        self._reader = None
+
+    def start(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Запускає фоновий потік-читач черги результатів."""
+        self._loop = loop
+        self._reader = threading.Thread(target=self._read_results, name="result-queue-reader", daemon=True)
+        self._reader.start()
+        logger.info("Диспетчер завдань запущений.")
+
+    def stop(self) -> None:
+        """Зупиняє потік-читач і скасовує завдання, що ще очікують."""
+        if self._reader is not None:
+            self.result_queue.put(None)
+            self._reader.join(timeout=5)
+            self._reader = None
+        for future in self._futures.values():
+            if not future.done():
+                future.cancel()
+        self._futures.clear()
+
+    def _read_results(self) -> None:
+        while True:
+            item = self.result_queue.get()
+            if item is None:
+                break
+            job_id, result = item
+            self._loop.call_soon_threadsafe(self._resolve, job_id, result)
+
+    def _resolve(self, job_id: str, result) -> None:
+        future = self._futures.pop(job_id, None)
+        if future is None:
+            logger.warning(f"Результат завдання #{job_id} надійшов після таймауту, відкидаю.")
+            return
+        if not future.done():
+            future.set_result(result)
+
+    async def submit(self, exchanges: list, timeout: float = 120):
+        """Ставить завдання воркеру і чекає саме його результат (asyncio.TimeoutError після timeout)."""
+        job_id = str(uuid.uuid4())
+        future = asyncio.get_running_loop().create_future()
+        self._futures[job_id] = future
+        self.task_queue.put((job_id, exchanges))
+        logger.info(f"Завдання #{job_id} поставлено в чергу для бірж: {exchanges}")
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._futures.pop(job_id, None)
+
+    @property
+    def pending(self) -> int:
+        """Кількість завдань, що очікують результату."""
+        return len(self._futures)
@@ -0,0 +1,174 @@
+# src/services/market_cache.py
+import asyncio
+import functools
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# Де біржа тримає інтервал фандінгу в market['info'] і скільки одиниць у годині
+FUNDING_INTERVAL_FIELDS = {
+    'bybit': ('fundingInterval', 60),                      # хвилини
+    'gate': ('funding_interval', 3600),                    # секунди
+    'bitget': ('fundInterval', 1),                         # години
+    'kucoinfutures': ('fundingRateGranularity', 3600000),  # мілісекунди
+}
+
+
+def _funding_interval_hours(exchange_id: str, market: dict) -> float | None:
+    field = FUNDING_INTERVAL_FIELDS.get(exchange_id)
+    info = market.get('info')
+    if field is None or not isinstance(info, dict):
+        return None
+    key, per_hour = field
+    try:
+        return float(info[key]) / per_hour
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class MarketInfo:
+    """Потрібне скануванню з load_markets() однієї біржі: USDT-свопи, розмір контракту, інтервал фандінгу."""
+
+    def __init__(self, symbols: list, contract_size: list, funding_interval: list, fetched_at: float):
+        # Символи ccxt безстрокових USDT-свопів (напр. BTC/USDT:USDT) і паралельні до них списки
+        self.symbols = symbols
+        self.contract_size = contract_size
+        # Години між виплатами або None, якщо біржа не віддає інтервал у ринках
+        self.funding_interval = funding_interval
+        self.fetched_at = fetched_at
+
+    @classmethod
+    def from_markets(cls, exchange_id: str, markets: dict, fetched_at: float | None = None) -> 'MarketInfo':
+        swaps = [m for m in markets.values() if m.get('swap') and (m.get('quote') or '').upper() == 'USDT']
+        return cls(
+            [m['symbol'] for m in swaps],
+            [m.get('contractSize') for m in swaps],
+            [_funding_interval_hours(exchange_id, m) for m in swaps],
+            fetched_at or time.time(),
+        )
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'MarketInfo':
+        return cls(data['symbols'], data['contract_size'], data['funding_interval'], data['fetched_at'])
+
+    def to_dict(self) -> dict:
+        return {
+            'symbols': self.symbols, 'contract_size': self.contract_size,
+            'funding_interval': self.funding_interval, 'fetched_at': self.fetched_at,
+        }
+
+    @functools.cached_property
+    def intervals_by_base(self) -> dict:
+        """{базовий символ (як у рядках знімка, напр. BTC): інтервал фандінгу в годинах}."""
+        return {
+            symbol.split('/')[0]: interval
+            for symbol, interval in zip(self.symbols, self.funding_interval) if interval
+        }
+
+    def is_expired(self, ttl: float, now: float) -> bool:
+        return now - self.fetched_at >= ttl
+
+
+class MarketCache:
+    """
+    Метадані ринків бірж на диску: по JSON-файлу на біржу з готовим списком USDT-свопів.
+    Файли читаються при старті (мілісекунди замість load_markets на кожну біржу),
+    а після ttl запис перевіряється у фоні: сканування далі отримує старий список,
+    поки одна задача на біржу перезавантажує ринки через loader.
+    """
+
+    def __init__(self, directory: str, ttl: float, loader=None):
+        self.directory = directory
+        self.ttl = ttl
+        # async loader(exchange_id) -> markets, як ExchangePool.load_markets
+        self.loader = loader
+        self._infos = {}
+        self._revalidating = {}
+        self.stats = {'hits': 0, 'cold_loads': 0, 'revalidations': 0, 'errors': 0}
+        self._load()
+
+    def _path(self, exchange_id: str) -> str:
+        return os.path.join(self.directory, f"{exchange_id}.json")
+
+    def _load(self) -> None:
+        if not os.path.isdir(self.directory):
+            return
+        for file_name in os.listdir(self.directory):
+            if not file_name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.directory, file_name), 'r') as f:
+                    self._infos[file_name[:-len('.json')]] = MarketInfo.from_dict(json.load(f))
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Кеш ринків: не вдалося прочитати {file_name}: {e}")
+        if self._infos:
+            logger.info(f"Кеш ринків: завантажено {len(self._infos)} бірж з {self.directory}")
+
+    def _save(self, exchange_id: str, info: MarketInfo) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        # Кілька процесів можуть перевіряти одну біржу: у кожного свій тимчасовий файл
+        tmp_path = f"{self._path(exchange_id)}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(info.to_dict(), f, separators=(',', ':'))
+        os.replace(tmp_path, self._path(exchange_id))
+
+    def get(self, exchange_id: str) -> MarketInfo | None:
+        """Запис біржі як є (навіть застарілий) або None."""
+        return self._infos.get(exchange_id)
+
+    def put(self, exchange_id: str, markets: dict) -> MarketInfo:
+        """Оновлює запис з відповіді load_markets() і зберігає його на диск."""
+        info = MarketInfo.from_markets(exchange_id, markets)
+        self._infos[exchange_id] = info
+        try:
+            self._save(exchange_id, info)
+        except OSError as e:
+            logger.error(f"Кеш ринків: не вдалося записати {exchange_id}: {e}")
+        return info
+
+    async def _revalidate(self, exchange_id: str) -> MarketInfo | None:
+        try:
+            markets = await self.loader(exchange_id)
+        except Exception as e:
+            self.stats['errors'] += 1
+            logger.warning(f"Кеш ринків: не вдалося перезавантажити ринки {exchange_id}: {e}")
+            return None
+        finally:
+            self._revalidating.pop(exchange_id, None)
+        self.stats['revalidations'] += 1
+        return await asyncio.to_thread(self.put, exchange_id, markets)
+
+    def revalidate(self, exchange_id: str) -> asyncio.Task:
+        """Фонова перевірка запису біржі; одночасно - не більше однієї на біржу."""
+        task = self._revalidating.get(exchange_id)
+        if task is None:
+            task = asyncio.create_task(self._revalidate(exchange_id), name=f"markets-{exchange_id}")
+            self._revalidating[exchange_id] = task
+        return task
+
+    async def get_info(self, exchange_id: str) -> MarketInfo | None:
+        """
+        Запис для сканування. Свіжий або застарілий віддається одразу (застарілий ще й
+        запускає фонову перевірку); чекати доводиться лише біржу, якої в кеші ще немає.
+        """
+        info = self._infos.get(exchange_id)
+        if info is None:
+            self.stats['cold_loads'] += 1
+            return await asyncio.shield(self.revalidate(exchange_id))
+        self.stats['hits'] += 1
+        if info.is_expired(self.ttl, time.time()):
+            self.revalidate(exchange_id)
+        return info
+
+    async def swap_symbols(self, exchange_id: str) -> list:
+        info = await self.get_info(exchange_id)
+        return info.symbols if info is not None else []
+
+    def expired(self, exchange_ids: list) -> list:
+        """Біржі з exchange_ids, чий запис відсутній або застарів."""
+        now = time.time()
+        return [exchange_id for exchange_id in exchange_ids
+                if exchange_id not in self._infos or self._infos[exchange_id].is_expired(self.ttl, now)]
@@ -0,0 +1,260 @@
+# src/services/metrics.py
+import asyncio
+import bisect
+import contextvars
+import logging
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Межі бакетів гістограм затримок у секундах
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple, extra: tuple = ()) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{value}"' for name, value in extra]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    """Лічильник, що лише зростає; значення окремо для кожного набору міток."""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self._values = {}
+
+    def inc(self, *labels, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels) -> float:
+        return self._values.get(labels, 0.0)
+
+    def samples(self):
+        for labels, value in self._values.items():
+            yield self.name, _labels(self.labelnames, labels), value
+
+
+class Histogram:
+    """Гістограма з фіксованими бакетами (кумулятивні лічильники формуються під час експорту)."""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        # {мітки: [лічильники по бакетах + переповнення, сума, кількість]}
+        self._series = {}
+
+    def observe(self, value: float, *labels) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        # Межа бакета включна (le), тож шукаємо перший бакет >= value
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def samples(self):
+        for labels, (counts, total, count) in self._series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                yield (f"{self.name}_bucket", _labels(self.labelnames, labels, (('le', _number(bound)),)),
+                       cumulative)
+            yield f"{self.name}_sum", _labels(self.labelnames, labels), total
+            yield f"{self.name}_count", _labels(self.labelnames, labels), count
+
+
+class Collected:
+    """
+    Метрика, значення якої читається в момент експорту: func() повертає число
+    або {кортеж міток: число}. Так експортуються розміри черг і статистика кешів,
+    що вже рахуються їхніми власниками.
+    """
+
+    def __init__(self, name: str, help_text: str, func, kind: str = 'gauge', labelnames: tuple = ()):
+        self.name = name
+        self.help = help_text
+        self.func = func
+        self.kind = kind
+        self.labelnames = labelnames
+
+    def samples(self):
+        try:
+            value = self.func()
+        except Exception as e:
+            logger.debug(f"Метрика {self.name} недоступна: {e}")
+            return
+        if value is None:
+            return
+        if isinstance(value, dict):
+            for labels, item in value.items():
+                yield self.name, _labels(self.labelnames, labels), item
+        else:
+            yield self.name, '', value
+
+
+class MetricsRegistry:
+    """Реєстр метрик процесу бота з експортом у текстовому форматі Prometheus."""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def _register(self, metric):
+        existing = self._metrics.get(metric.name)
+        if existing is not None and not isinstance(metric, Collected):
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labelnames: tuple = ()) -> Counter:
+        return self._register(Counter(name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: tuple = (),
+                  buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def collect(self, name: str, help_text: str, func, kind: str = 'gauge', labelnames: tuple = ()) -> None:
+        """Реєструє (або замінює) метрику, що читається через func() під час експорту."""
+        self._register(Collected(name, help_text, func, kind, labelnames))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """Мінімальний HTTP-слухач у циклі подій бота: GET /metrics віддає registry.render()."""
+
+    def __init__(self, registry: MetricsRegistry, host: str = '127.0.0.1', port: int = 9108):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._server = None
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        logger.info(f"Метрики доступні на http://{self.host}:{self.port}/metrics")
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), 5)
+            # Заголовки не потрібні, але їх треба дочитати
+            while await asyncio.wait_for(reader.readline(), 5) not in (b'\r\n', b'\n', b''):
+                pass
+            parts = request_line.decode('latin-1').split()
+            if len(parts) >= 2 and parts[0] == 'GET' and parts[1].split('?')[0] == '/metrics':
+                status, content_type = '200 OK', 'text/plain; version=0.0.4; charset=utf-8'
+                body = self.registry.render().encode()
+            else:
+                status, content_type, body = '404 Not Found', 'text/plain', b'not found\n'
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+# --- Розбивка звіту по етапах ---
+class ReportTrace:
+    """Етапи одного звіту (сканування бірж, збирання знімка, рендер, Telegram) з тривалістю."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started_at = time.time()
+        self.total = 0.0
+        self.stages = []
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.stages.append((stage, seconds))
+
+
+# Звіт, що зараз обробляється в цій задачі; задачі, створені з неї (сканування), успадковують його
+_current_trace = contextvars.ContextVar('report_trace', default=None)
+# Останній завершений звіт кожного типу: {назва: ReportTrace}
+last_traces = {}
+
+
+@contextmanager
+def trace_report(name: str):
+    """Збирає етапи звіту name, записані через timed(), і зберігає їх у last_traces."""
+    trace = ReportTrace(name)
+    token = _current_trace.set(trace)
+    started = time.perf_counter()
+    try:
+        yield trace
+    finally:
+        trace.total = time.perf_counter() - started
+        _current_trace.reset(token)
+        last_traces[name] = trace
+        report_seconds.observe(trace.total, name)
+
+
+@contextmanager
+def timed(histogram: Histogram | None, stage: str, *labels):
+    """Міряє блок: значення йде в гістограму з мітками labels (якщо вона є) і етапом stage у поточний звіт."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        if histogram is not None:
+            histogram.observe(elapsed, *labels)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(stage, elapsed)
+
+
+# Спільний реєстр процесу бота та метрики конвеєра
+registry = MetricsRegistry()
+
+exchange_fetch_seconds = registry.histogram(
+    'funding_exchange_fetch_seconds', "Тривалість отримання ставок однієї біржі", ('exchange',))
+exchange_errors_total = registry.counter(
+    'funding_exchange_errors_total', "Невдалі запити до біржі за типом (error, timeout, deadline)",
+    ('exchange', 'kind'))
+scan_seconds = registry.histogram(
+    'funding_scan_seconds', "Тривалість сканування застарілих бірж кешем знімків")
+snapshot_build_seconds = registry.histogram(
+    'funding_snapshot_build_seconds', "Тривалість збирання знімка з записів кешу")
+render_seconds = registry.histogram(
+    'funding_render_seconds', "Тривалість форматування звіту (з урахуванням кешу рендеру)", ('report',))
+telegram_api_seconds = registry.histogram(
+    'telegram_api_seconds', "Затримка викликів Bot API з черги надсилання", ('method',))
+telegram_api_errors_total = registry.counter(
+    'telegram_api_errors_total', "Невдалі виклики Bot API за типом", ('method', 'kind'))
+report_seconds = registry.histogram(
+    'funding_report_seconds', "Повний час обробки звіту від запиту до відповіді", ('report',))
@@ -0,0 +1,94 @@
+# src/services/render_cache.py
+from collections import OrderedDict
+
+from ..config import RENDER_CACHE_SIZE, SENT_TEXT_CACHE_SIZE
+from .metrics import registry
+
+
+def make_render_key(report_type: str, snapshot, settings: dict, *extra) -> tuple:
+    """
+    Ключ відрендереного звіту: (тип звіту, версія знімка, поріг, набір бірж, чорний і білий списки, ...).
+    Чати з однаковими налаштуваннями отримують один і той самий ключ.
+    """
+    return (
+        report_type,
+        snapshot.version,
+        settings.get('threshold'),
+        frozenset(settings.get('exchanges', [])),
+        frozenset(settings.get('blacklist', [])),
+        frozenset(settings.get('whitelist', [])),
+        *extra,
+    )
+
+
+class RenderCache:
+    """LRU-кеш тексту звітів з обмеженим розміром і статистикою."""
+
+    def __init__(self, maxsize: int = 512):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get_or_render(self, key, render_func) -> str:
+        """Повертає текст з кешу або рендерить його через render_func() і запам'ятовує."""
+        if key is None:
+            return render_func()
+        text = self._items.get(key)
+        if text is not None:
+            self._items.move_to_end(key)
+            self.stats['hits'] += 1
+            return text
+        self.stats['misses'] += 1
+        text = render_func()
+        self._items[key] = text
+        if len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+            self.stats['evictions'] += 1
+        return text
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.stats['hits'] + self.stats['misses']
+        return self.stats['hits'] / total if total else 0.0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class SentTextTracker:
+    """
+    Пам'ятає вміст, надісланий у кожне повідомлення (chat_id, message_id), щоб не робити
+    edit_message_text, коли дані не змінились. Вміст - текст звіту без рядка з віком даних:
+    вік змінюється щосекунди, і з ним повне порівняння майже ніколи б не збігалося.
+    Разом з вмістом зберігається і видимий текст, який повернув Telegram: якщо повідомлення
+    тим часом відредагував інший обробник (напр. меню налаштувань), збігу не буде.
+    """
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._texts = OrderedDict()
+        self.skipped = 0
+
+    def is_unchanged(self, chat_id: int, message_id: int, content: str, shown_text: str | None) -> bool:
+        if self._texts.get((chat_id, message_id)) == (content, shown_text):
+            self.skipped += 1
+            return True
+        return False
+
+    def remember(self, chat_id: int, message_id: int, content: str, shown_text: str | None) -> None:
+        key = (chat_id, message_id)
+        self._texts[key] = (content, shown_text)
+        self._texts.move_to_end(key)
+        if len(self._texts) > self.maxsize:
+            self._texts.popitem(last=False)
+
+
+# Спільні для процесу екземпляри
+render_cache = RenderCache(RENDER_CACHE_SIZE)
+sent_texts = SentTextTracker(SENT_TEXT_CACHE_SIZE)
+
+# Експорт статистики в метрики процесу
+registry.collect('render_cache_events_total', "Звернення до кешу рендеру (hits, misses, evictions)",
+                 lambda: {(event,): value for event, value in render_cache.stats.items()},
+                 kind='counter', labelnames=('event',))
+registry.collect('render_cache_hit_ratio', "Частка звітів, відданих з кешу рендеру", lambda: render_cache.hit_ratio)
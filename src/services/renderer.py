@@ -0,0 +1,65 @@
+# src/services/renderer.py
+"""Векторизовані примітиви для побудови HTML-рядків звітів без iterrows()."""
+from __future__ import annotations
+import functools
+import html
+
+import numpy as np
+
+from ..lazy_imports import LazyModule
+
+# pandas імпортується при першому використанні, а не під час старту бота
+pd = LazyModule('pandas')
+
+
+def as_text(values) -> np.ndarray:
+    """Масив рядків як object-масив, щоб конкатенація '+' працювала поелементно."""
+    return np.asarray(values, dtype=str).astype(object)
+
+
+def ljust(values, width: int) -> np.ndarray:
+    """Векторний аналог f"{value:<width}"."""
+    return np.char.ljust(np.asarray(values, dtype=str), width).astype(object)
+
+
+def format_numbers(values, fmt: str) -> np.ndarray:
+    """Векторне %-форматування чисел, напр. '%8.4f' == f"{x:>8.4f}"."""
+    return np.char.mod(fmt, np.asarray(values, dtype=np.float64)).astype(object)
+
+
+def escape(values) -> np.ndarray:
+    """html.escape для кожного унікального значення один раз."""
+    uniques, inverse = np.unique(np.asarray(values, dtype=str), return_inverse=True)
+    escaped = np.array([html.escape(value) for value in uniques], dtype=object)
+    return escaped[inverse.reshape(-1)]
+
+
+def concat(*parts) -> np.ndarray:
+    """Поелементна конкатенація колонок та рядкових літералів."""
+    return functools.reduce(lambda left, right: left + right, parts)
+
+
+def join_lines(*parts) -> str:
+    """Склеює колонки в рядки, а рядки - в один текст через перенос рядка."""
+    lines = concat(*parts)
+    if isinstance(lines, str):
+        return lines
+    return "\n".join(lines.tolist())
+
+
+def build_trade_links(exchanges, symbols, link_func) -> np.ndarray:
+    """Посилання для кожної пари (біржа, символ); link_func викликається раз на унікальну пару."""
+    pairs = pd.MultiIndex.from_arrays([np.asarray(exchanges, dtype=object), np.asarray(symbols, dtype=object)])
+    codes, uniques = pd.factorize(pairs)
+    links = np.array([link_func(exchange, symbol) for exchange, symbol in uniques], dtype=object)
+    return links[codes] if len(codes) else np.array([], dtype=object)
+
+
+def links_for(df: pd.DataFrame, link_func, columnar=None) -> np.ndarray:
+    """
+    Посилання для рядків df. Якщо df - зріз знімка, а columnar - його колонковий вигляд,
+    посилання беруться з попередньо обчисленого масиву знімка за позиціями рядків.
+    """
+    if columnar is not None:
+        return columnar.trade_links(link_func)[df.index.to_numpy()]
+    return build_trade_links(df['exchange'].to_numpy(), df['symbol'].to_numpy(), link_func)
@@ -0,0 +1,122 @@
+# src/services/report_scheduler.py
+import asyncio
+import logging
+import time
+
+from telegram.constants import ParseMode
+from telegram.error import Forbidden, BadRequest
+from telegram.ext import Application, ContextTypes
+
+from ..config import INTERVAL_BUCKETS
+from ..keyboards import get_main_menu_keyboard
+from . import funding_service, formatters
+from .render_cache import make_render_key
+from .send_queue import send_queue, PRIORITY_BROADCAST
+from .metrics import trace_report, timed
+from .settings_view import settings_view
+
+logger = logging.getLogger(__name__)
+
+# Тік планувальника дорівнює найменшому інтервалу, тож кожен бакет кратний тіку
+TICK_MINUTES = min(INTERVAL_BUCKETS)
+
+
+def get_interval_bucket(interval: int) -> int:
+    """Повертає найменший бакет, що не менший за інтервал користувача."""
+    for bucket in INTERVAL_BUCKETS:
+        if interval <= bucket:
+            return bucket
+    return INTERVAL_BUCKETS[-1]
+
+
+class ReportRecipients:
+    """
+    Увімкнені чати, згруповані за бакетами інтервалів, з їхніми налаштуваннями.
+    Оновлюється зі спільного вигляду налаштувань лише для змінених чатів (update).
+    """
+
+    def __init__(self):
+        # {bucket: {chat_id: None}} і {chat_id: (bucket, налаштування)}
+        self.buckets = {}
+        self.chats = {}
+
+    def update(self, chat_id, settings: dict | None) -> None:
+        """Переносить чат у бакет за новими налаштуваннями (None або вимкнений чат - лише видаляє)."""
+        chat_id = int(chat_id)
+        old = self.chats.pop(chat_id, None)
+        if old is not None:
+            bucket = self.buckets[old[0]]
+            del bucket[chat_id]
+            if not bucket:
+                del self.buckets[old[0]]
+        if settings is None or not settings.get('enabled', True):
+            return
+        bucket = get_interval_bucket(int(settings.get('interval', INTERVAL_BUCKETS[-1])))
+        self.buckets.setdefault(bucket, {})[chat_id] = None
+        self.chats[chat_id] = (bucket, settings)
+
+    def settings(self, chat_id: int) -> dict:
+        return self.chats[chat_id][1]
+
+
+recipients = ReportRecipients()
+settings_view.add_index(recipients)
+
+
+def get_due_buckets(tick_minute: int) -> list:
+    """Бакети, чий інтервал настав на цьому тіку (вирівнювання по годиннику UTC)."""
+    return [bucket for bucket in INTERVAL_BUCKETS if tick_minute % bucket == 0]
+
+
+async def report_tick(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Один тік планувальника: одне спільне сканування для всіх чатів,
+    чий інтервал настав, і розсилка їм звітів з того самого знімка.
+    Звіти ставляться в чергу надсилання одночасно; темп задають її ліміти.
+    """
+    tick_minute = int(time.time() // 60) // TICK_MINUTES * TICK_MINUTES
+    # Лише змінені з минулого тіку чати; повне читання - раз, в окремому потоці
+    await settings_view.ensure_loaded()
+    due_chats = [chat_id for bucket in get_due_buckets(tick_minute) for chat_id in recipients.buckets.get(bucket, ())]
+    if not due_chats:
+        return
+
+    # Одне сканування об'єднання бірж; далі знімки для окремих чатів беруться з кешу
+    all_exchanges = list(dict.fromkeys(
+        name for chat_id in due_chats for name in recipients.settings(chat_id)['exchanges']
+    ))
+    with trace_report('scheduled'):
+        await funding_service.get_funding_snapshot(all_exchanges)
+        logger.info(f"Тік {tick_minute}: розсилка {len(due_chats)} чатам, біржі {all_exchanges}")
+
+        await asyncio.gather(*(_send_report(chat_id, recipients.settings(chat_id)) for chat_id in due_chats))
+
+
+async def _send_report(chat_id: int, settings: dict) -> None:
+    try:
+        snapshot = await funding_service.get_funding_snapshot(settings['exchanges'])
+        message_text = formatters.format_funding_update(
+            snapshot.df, settings['threshold'], snapshot.age, snapshot.missed, snapshot.columnar,
+            cache_key=make_render_key('funding', snapshot, settings), stale=snapshot.stale
+        )
+        # Розсилка йде через спільну чергу з лімітами Telegram і поступається інтерактивним відповідям
+        with timed(None, 'telegram'):
+            await send_queue.send_message(
+                chat_id,
+                message_text,
+                priority=PRIORITY_BROADCAST,
+                parse_mode=ParseMode.HTML,
+                reply_markup=get_main_menu_keyboard(),
+                disable_web_page_preview=True
+            )
+    except (Forbidden, BadRequest) as e:
+        logger.warning(f"Не вдалося надіслати планований звіт {chat_id}: {e}")
+    except Exception as e:
+        logger.error(f"Помилка планованого звіту для {chat_id}: {e}", exc_info=True)
+
+
+def schedule_reports(application: Application) -> None:
+    """Реєструє тік планувальника в JobQueue, вирівняний на межу TICK_MINUTES."""
+    period = TICK_MINUTES * 60
+    first = period - time.time() % period
+    application.job_queue.run_repeating(report_tick, interval=period, first=first, name="report_tick")
@@ -0,0 +1,329 @@
+# src/services/send_queue.py
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+
+from telegram.error import RetryAfter
+
+from ..config import TELEGRAM_GLOBAL_RATE, TELEGRAM_CHAT_RATE, TELEGRAM_CHAT_BURST, SEND_MAX_RETRIES
+from .metrics import registry, telegram_api_seconds, telegram_api_errors_total
+
+logger = logging.getLogger(__name__)
+
+# Класи пріоритету: відповіді на дії користувача йдуть раніше за розсилки
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BROADCAST = 1
+
+
+class TokenBucket:
+    """Відро токенів: rate токенів за секунду, не більше capacity про запас."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        # До цього моменту відро заблоковане (відповідь 429 від Telegram)
+        self.paused_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Скільки секунд чекати до наступного токена (0 - можна надсилати зараз)."""
+        self._refill(now)
+        wait = 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+        return max(wait, self.paused_until - now)
+
+    def consume(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1
+
+    def pause(self, seconds: float, now: float) -> None:
+        self.paused_until = max(self.paused_until, now + seconds)
+        self.tokens = 0
+
+    def idle(self, now: float) -> bool:
+        """Відро повне і не на паузі - нічим не відрізняється від нового."""
+        self._refill(now)
+        return self.tokens >= self.capacity and self.paused_until <= now
+
+
+class _Outgoing:
+    """Один запит до Bot API, що чекає в черзі."""
+
+    def __init__(self, priority: int, seq: int, chat_id: int, method: str, kwargs: dict, edit_key=None):
+        self.priority = priority
+        self.seq = seq
+        self.chat_id = chat_id
+        self.method = method
+        self.kwargs = kwargs
+        # (chat_id, message_id) для редагувань, що можуть зливатися
+        self.edit_key = edit_key
+        # Усі, хто чекає на результат (кілька злитих редагувань - кілька очікувачів)
+        self.waiters = [asyncio.get_running_loop().create_future()]
+        self.attempts = 0
+
+    def resolve(self, result=None, error: Exception | None = None) -> None:
+        for future in self.waiters:
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+
+class SendQueue:
+    """
+    Центральна черга вихідних повідомлень Telegram.
+    Глобальне відро (~30 повідомлень/с) і відро на кожен чат (~1 повідомлення/с),
+    пріоритети (інтерактивні відповіді раніше за розсилки) та обробка RetryAfter.
+    Кілька редагувань одного повідомлення, що ще чекають у черзі, зливаються в одне
+    з найновішим текстом.
+    """
+
+    # RetryAfter від різних чатів у межах цього вікна (с) - це вже глобальний ліміт бота
+    FLOOD_WINDOW = 1.0
+    # Як часто (с) прибирати повні відра чатів без запитів у черзі
+    PRUNE_INTERVAL = 60.0
+
+    def __init__(self, global_rate: float = 30, chat_rate: float = 1, chat_burst: float = 3,
+                 max_retries: int = 5):
+        self.bot = None
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        # Глобальне відро без запасу: рівномірний потік, а не сплеск на старті розсилки
+        self._global = TokenBucket(global_rate, 1)
+        self._chat_buckets = {}
+        self._pruned_at = time.monotonic()
+        # {chat_id: час останнього RetryAfter} у межах FLOOD_WINDOW
+        self._retry_chats = {}
+        # Черга кожного чату: купа (пріоритет, seq, запит)
+        self._chat_items = {}
+        # Чати, яким можна надсилати зараз: купа (пріоритет голови, seq голови, chat_id)
+        self._ready = []
+        # Чати, що чекають свого відра: купа (час готовності, chat_id)
+        self._waiting = []
+        self._chat_state = {}
+        self._pending_edits = {}
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._runner = None
+        self._inflight = set()
+        self.stats = {'sent': 0, 'failed': 0, 'coalesced': 0, 'retry_after': 0, 'global_pauses': 0}
+
+    # --- Життєвий цикл ---
+    def start(self, bot) -> None:
+        self.bot = bot
+        self._wakeup = asyncio.Event()
+        self._runner = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self, timeout: float = 5) -> None:
+        """Дає черзі дослати залишок (не довше timeout) і зупиняє розсилку."""
+        deadline = time.monotonic() + timeout
+        while (self._chat_items or self._inflight) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        if self._runner is not None:
+            self._runner.cancel()
+            await asyncio.gather(self._runner, return_exceptions=True)
+            self._runner = None
+        for items in self._chat_items.values():
+            for _, _, item in items:
+                item.resolve(error=RuntimeError("Черга надсилання зупинена"))
+        self._chat_items.clear()
+
+    def set_global_rate(self, rate: float) -> None:
+        """Змінює глобальний ліміт (напр. частка ліміту бота, коли процесів кілька)."""
+        self._global = TokenBucket(rate, 1)
+
+    @property
+    def pending(self) -> int:
+        return sum(len(items) for items in self._chat_items.values())
+
+    # --- Публічний API ---
+    def send_message(self, chat_id: int, text: str, priority: int = PRIORITY_INTERACTIVE, **kwargs) -> asyncio.Future:
+        """Ставить send_message у чергу; результат - Message, коли запит буде виконано."""
+        return self._enqueue(priority, chat_id, 'send_message', dict(chat_id=chat_id, text=text, **kwargs))
+
+    def edit_message_text(self, chat_id: int, message_id: int, text: str,
+                          priority: int = PRIORITY_INTERACTIVE, **kwargs) -> asyncio.Future:
+        """
+        Ставить редагування у чергу. Якщо редагування цього повідомлення вже чекає,
+        воно отримує новий текст, а очікувачі обох викликів - один спільний результат.
+        """
+        request = dict(chat_id=chat_id, message_id=message_id, text=text, **kwargs)
+        pending = self._pending_edits.get((chat_id, message_id))
+        if pending is not None:
+            pending.kwargs = request
+            future = asyncio.get_running_loop().create_future()
+            pending.waiters.append(future)
+            self.stats['coalesced'] += 1
+            if priority < pending.priority:
+                self._reprioritize(pending, priority)
+            return future
+        return self._enqueue(priority, chat_id, 'edit_message_text', request, (chat_id, message_id))
+
+    # --- Планування ---
+    def _bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    def _prune_buckets(self, now: float) -> None:
+        """Прибирає відра чатів без запитів у черзі, що вже повністю наповнились."""
+        self._pruned_at = now
+        for chat_id in [chat_id for chat_id, bucket in self._chat_buckets.items()
+                        if chat_id not in self._chat_items and bucket.idle(now)]:
+            del self._chat_buckets[chat_id]
+
+    def _is_global_flood(self, chat_id: int, now: float) -> bool:
+        """
+        Telegram не каже, який ліміт перевищено. RetryAfter одного чату - його власний ліміт;
+        якщо за FLOOD_WINDOW відмови прийшли від кількох чатів, вичерпано ліміт усього бота.
+        """
+        self._retry_chats = {chat: at for chat, at in self._retry_chats.items() if now - at <= self.FLOOD_WINDOW}
+        self._retry_chats[chat_id] = now
+        return len(self._retry_chats) > 1
+
+    def _enqueue(self, priority: int, chat_id: int, method: str, kwargs: dict, edit_key=None) -> asyncio.Future:
+        item = _Outgoing(priority, next(self._seq), chat_id, method, kwargs, edit_key)
+        if edit_key is not None:
+            self._pending_edits[edit_key] = item
+        self._push(item)
+        return item.waiters[0]
+
+    def _push(self, item: _Outgoing) -> None:
+        items = self._chat_items.setdefault(item.chat_id, [])
+        heapq.heappush(items, (item.priority, item.seq, item))
+        state = self._chat_state.get(item.chat_id)
+        if state is None:
+            self._schedule_chat(item.chat_id, time.monotonic())
+        elif state == 'ready' and items[0][2] is item:
+            # Новий запит став головою черги чату - окремий запис у купі готових
+            heapq.heappush(self._ready, (item.priority, item.seq, item.chat_id))
+        self._wakeup.set()
+
+    def _reprioritize(self, item: _Outgoing, priority: int) -> None:
+        items = self._chat_items[item.chat_id]
+        items.remove((item.priority, item.seq, item))
+        heapq.heapify(items)
+        item.priority = priority
+        self._push(item)
+
+    def _schedule_chat(self, chat_id: int, now: float) -> None:
+        items = self._chat_items.get(chat_id)
+        if not items:
+            self._chat_items.pop(chat_id, None)
+            self._chat_state.pop(chat_id, None)
+            return
+        delay = self._bucket(chat_id).delay(now)
+        if delay > 0:
+            self._chat_state[chat_id] = 'waiting'
+            heapq.heappush(self._waiting, (now + delay, chat_id))
+        else:
+            self._chat_state[chat_id] = 'ready'
+            priority, seq, _ = items[0]
+            heapq.heappush(self._ready, (priority, seq, chat_id))
+
+    def _pop_ready(self):
+        """Наступний запит з найвищим пріоритетом серед чатів, чиє відро дозволяє надсилання."""
+        while self._ready:
+            priority, seq, chat_id = heapq.heappop(self._ready)
+            items = self._chat_items.get(chat_id)
+            # Застарілий запис: голова черги чату вже інша
+            if self._chat_state.get(chat_id) != 'ready' or not items or items[0][:2] != (priority, seq):
+                continue
+            return heapq.heappop(items)[2]
+        return None
+
+    async def _run(self) -> None:
+        while True:
+            now = time.monotonic()
+            if now - self._pruned_at >= self.PRUNE_INTERVAL:
+                self._prune_buckets(now)
+            while self._waiting and self._waiting[0][0] <= now:
+                _, chat_id = heapq.heappop(self._waiting)
+                self._chat_state.pop(chat_id, None)
+                self._schedule_chat(chat_id, now)
+
+            if not self._ready:
+                timeout = self._waiting[0][0] - now if self._waiting else None
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            delay = self._global.delay(now)
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+
+            item = self._pop_ready()
+            if item is None:
+                continue
+            self._global.consume(now)
+            self._bucket(item.chat_id).consume(now)
+            self._chat_state.pop(item.chat_id, None)
+            self._schedule_chat(item.chat_id, now)
+            if item.edit_key is not None:
+                self._pending_edits.pop(item.edit_key, None)
+            # Запити виконуються паралельно: пропускна здатність не впирається в затримку мережі
+            task = asyncio.create_task(self._deliver(item))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _deliver(self, item: _Outgoing) -> None:
+        item.attempts += 1
+        started = time.monotonic()
+        try:
+            result = await getattr(self.bot, item.method)(**item.kwargs)
+        except RetryAfter as e:
+            telegram_api_errors_total.inc(item.method, 'retry_after')
+            retry_after = e.retry_after
+            seconds = retry_after.total_seconds() if hasattr(retry_after, 'total_seconds') else float(retry_after)
+            self.stats['retry_after'] += 1
+            logger.warning(f"Telegram просить зачекати {seconds} с (чат {item.chat_id})")
+            now = time.monotonic()
+            self._bucket(item.chat_id).pause(seconds, now)
+            if self._is_global_flood(item.chat_id, now):
+                self.stats['global_pauses'] += 1
+                self._global.pause(seconds, now)
+            if item.attempts > self.max_retries:
+                self.stats['failed'] += 1
+                item.resolve(error=e)
+                return
+            # Повертаємо запит у чергу з тим самим місцем
+            if item.edit_key is not None:
+                newer = self._pending_edits.get(item.edit_key)
+                if newer is not None:
+                    # Поки чекали, прийшло новіше редагування - воно і відповість усім
+                    newer.waiters.extend(item.waiters)
+                    return
+                self._pending_edits[item.edit_key] = item
+            self._push(item)
+        except Exception as e:
+            telegram_api_errors_total.inc(item.method, type(e).__name__)
+            self.stats['failed'] += 1
+            item.resolve(error=e)
+        else:
+            telegram_api_seconds.observe(time.monotonic() - started, item.method)
+            self.stats['sent'] += 1
+            item.resolve(result)
+
+
+# Спільна для процесу бота черга; бот підключається в start()
+send_queue = SendQueue(TELEGRAM_GLOBAL_RATE, TELEGRAM_CHAT_RATE, TELEGRAM_CHAT_BURST, SEND_MAX_RETRIES)
+
+# Експорт статистики в метрики процесу
+registry.collect('send_queue_depth', "Запити, що чекають у черзі надсилання", lambda: send_queue.pending)
+registry.collect('send_queue_events_total', "Результати черги надсилання (sent, failed, coalesced, retry_after, global_pauses)",
+                 lambda: {(event,): value for event, value in send_queue.stats.items()},
+                 kind='counter', labelnames=('event',))
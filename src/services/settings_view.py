@@ -0,0 +1,80 @@
+# src/services/settings_view.py
+import asyncio
+import logging
+
+from ..user_manager import get_all_user_settings, settings_changes, settings_version
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+
+class SettingsView:
+    """
+    Спільний для похідних індексів вигляд налаштувань чатів (поріг сповіщень, підписники виплат).
+    Повне читання (load_all + копії) робиться раз і поза циклом подій; далі refresh
+    передає індексам лише чати, змінені після останньої застосованої версії.
+    Кожен індекс має метод update(chat_id, settings).
+    """
+
+    def __init__(self):
+        self._indexes = []
+        self._version = None
+        self._load_lock = asyncio.Lock()
+        self.stats = {'full_loads': 0, 'refreshes': 0, 'updated_chats': 0}
+
+    def add_index(self, index) -> None:
+        self._indexes.append(index)
+        if self._version is not None:
+            # Індекс, підключений пізніше, наздоганяє повним читанням при наступному ensure_loaded
+            self._version = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._version is not None
+
+    def _apply(self, changes: dict) -> None:
+        for chat_id, settings in changes.items():
+            for index in self._indexes:
+                index.update(chat_id, settings)
+        self.stats['updated_chats'] += len(changes)
+
+    def refresh(self) -> bool:
+        """Застосовує зміни з журналу; False, якщо потрібне повне читання (ще не завантажено або журнал відстав)."""
+        if self._version is None:
+            return False
+        if self._version == settings_version():
+            return True
+        version, changes = settings_changes(self._version)
+        if changes is None:
+            self._version = None
+            return False
+        self._apply(changes)
+        self._version = version
+        self.stats['refreshes'] += 1
+        return True
+
+    def load(self, all_settings: dict, version: int) -> None:
+        """Застосовує повне читання, зроблене на версії version."""
+        self._apply(all_settings)
+        self._version = version
+        self.stats['full_loads'] += 1
+
+    async def ensure_loaded(self) -> None:
+        """Свіжий вигляд для тіку: інкрементально, а повне читання - в окремому потоці."""
+        async with self._load_lock:
+            if self.refresh():
+                return
+            # Версія береться до читання, тож зміни під час нього застосує наступний refresh;
+            # індекси оновлюються вже в циклі подій, де їх читають слухачі кешу
+            version = settings_version()
+            all_settings = await asyncio.to_thread(get_all_user_settings)
+            self.load(all_settings, version)
+            self.refresh()
+
+
+# Спільний для процесу бота вигляд налаштувань
+settings_view = SettingsView()
+
+registry.collect('settings_view_events_total', "Оновлення вигляду налаштувань (full_loads, refreshes, updated_chats)",
+                 lambda: {(event,): value for event, value in settings_view.stats.items()},
+                 kind='counter', labelnames=('event',))
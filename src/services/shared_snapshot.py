@@ -0,0 +1,394 @@
+# src/services/shared_snapshot.py
+from __future__ import annotations
+import logging
+import math
+import mmap
+import os
+import struct
+import time
+
+import numpy as np
+
+from ..lazy_imports import LazyModule
+from .funding_service import ScanResult, fetch_all_funding_data
+
+logger = logging.getLogger(__name__)
+
+# pandas імпортується при першому використанні, а не під час старту бота
+pd = LazyModule('pandas')
+
+MAGIC = b'FSNP'
+LAYOUT_VERSION = 2
+# magic, layout, seq, ємності (рядки, біржі, байти назв)
+HEADER = struct.Struct('<4sIQIII')
+HEADER_SIZE = 64
+SEQ_OFFSET = 8
+# Заголовок слота: рядків, бірж, символів, байтів назв, версія кешу воркера, час публікації
+SLOT_HEADER = struct.Struct('<IIIIQd')
+SLOT_HEADER_SIZE = 64
+# Скільки разів читач повторює читання, яке обігнав записувач
+MAX_READ_ATTEMPTS = 100
+
+MISSED = 1
+STALE = 2
+
+# Необов'язкові колонки рядків (float64, NaN - значення немає): ціна для спреду,
+# час наступної виплати (мс) і інтервал фандінгу (години)
+OPTIONAL_COLUMNS = ('price', 'next_funding_time', 'funding_interval')
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+class _Layout:
+    """
+    Зсуви колонок усередині слота для заданих ємностей.
+    Рядки згруповані за біржами: біржа i займає рядки row_start[i]..row_start[i] + row_count[i].
+    """
+
+    def __init__(self, max_rows: int, max_exchanges: int, names_capacity: int):
+        self.max_rows = max_rows
+        self.max_exchanges = max_exchanges
+        self.names_capacity = names_capacity
+        offset = SLOT_HEADER_SIZE
+        self.columns = {}
+        for name, dtype, count in (
+            ('rate', np.float64, max_rows),
+            *((column, np.float64, max_rows) for column in OPTIONAL_COLUMNS),
+            ('symbol_code', np.int32, max_rows),
+            ('fetched_at', np.float64, max_exchanges),
+            ('row_start', np.uint32, max_exchanges),
+            ('row_count', np.uint32, max_exchanges),
+            ('flags', np.uint8, max_exchanges),
+        ):
+            self.columns[name] = (offset, dtype, count)
+            offset = _align(offset + np.dtype(dtype).itemsize * count)
+        self.names_offset = offset
+        self.slot_size = _align(offset + names_capacity)
+
+    @property
+    def file_size(self) -> int:
+        return HEADER_SIZE + 2 * self.slot_size
+
+    def slot_offset(self, slot: int) -> int:
+        return HEADER_SIZE + slot * self.slot_size
+
+    def view(self, buffer, slot: int, name: str) -> np.ndarray:
+        """Колонка слота як масив NumPy поверх відображеної пам'яті (без копіювання)."""
+        offset, dtype, count = self.columns[name]
+        return np.frombuffer(buffer, dtype=dtype, count=count, offset=self.slot_offset(slot) + offset)
+
+
+class SharedSnapshotWriter:
+    """
+    Публікує стан кешу фандінгу воркера у файл, відображений у пам'ять (mmap), з
+    фіксованою колонковою розкладкою. Будь-яка кількість процесів бота читає його
+    через SharedSnapshotReader без черг і pickle.
+
+    Два слоти і лічильник seq у заголовку (seqlock): непарний seq - запис у слот
+    (seq // 2 + 1) % 2 триває, читачі тим часом читають інший, стабільний слот.
+    Запис у той самий слот повториться лише через публікацію, тож читачу, що тримає
+    вигляди слота, достатньо перевірити seq після читання. Записувач один - воркер.
+    """
+
+    def __init__(self, path: str, max_rows: int, max_exchanges: int = 64, names_capacity: int = 1 << 20):
+        self.path = path
+        self.layout = _Layout(max_rows, max_exchanges, names_capacity)
+        self.published_version = None
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Новий файл замість старого: читачі помітять заміну за inode і перевідкриють його
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.truncate(self.layout.file_size)
+        with open(tmp_path, 'r+b') as f:
+            self._mm = mmap.mmap(f.fileno(), self.layout.file_size)
+        HEADER.pack_into(self._mm, 0, MAGIC, LAYOUT_VERSION, 0, max_rows, max_exchanges, names_capacity)
+        os.replace(tmp_path, path)
+        self._seq = 0
+
+    def publish(self, exchanges: list, version: int) -> bool:
+        """
+        exchanges - [(біржа, DataFrame з symbol/rate і OPTIONAL_COLUMNS, fetched_at, missed, stale)],
+        як їх віддає FundingSnapshotCache.exchange_entries().
+        Повертає False, якщо знімок не вміщається в ємності файлу (тоді лишається попередній).
+        """
+        layout = self.layout
+        frames = [
+            (name, df, fetched_at, (MISSED if missed else 0) | (STALE if stale else 0))
+            for name, df, fetched_at, missed, stale in exchanges
+        ]
+        n_rows = sum(len(df) for _, df, _, _ in frames)
+        if n_rows > layout.max_rows or len(frames) > layout.max_exchanges:
+            logger.error(f"Спільний знімок: {n_rows} рядків / {len(frames)} бірж не вміщаються в "
+                         f"{layout.max_rows} / {layout.max_exchanges}, публікацію пропущено")
+            return False
+
+        # Символи всіх бірж - один словник кодів на слот
+        symbols = pd.Categorical(
+            pd.concat([df['symbol'] for _, df, _, _ in frames if not df.empty], ignore_index=True)
+            if n_rows else []
+        )
+        names = "\n".join([name for name, _, _, _ in frames] + list(symbols.categories)).encode()
+        if len(names) > layout.names_capacity:
+            logger.error(f"Спільний знімок: назви займають {len(names)} байт більше за "
+                         f"{layout.names_capacity}, публікацію пропущено")
+            return False
+
+        slot = (self._seq // 2 + 1) % 2
+        self._set_seq(self._seq + 1)
+        base = layout.slot_offset(slot)
+        SLOT_HEADER.pack_into(self._mm, base, n_rows, len(frames), len(symbols.categories), len(names),
+                              version, time.time())
+        rate = layout.view(self._mm, slot, 'rate')
+        optional = [(column, layout.view(self._mm, slot, column)) for column in OPTIONAL_COLUMNS]
+        values = None
+        symbol_code = layout.view(self._mm, slot, 'symbol_code')
+        fetched = layout.view(self._mm, slot, 'fetched_at')
+        row_start = layout.view(self._mm, slot, 'row_start')
+        row_count = layout.view(self._mm, slot, 'row_count')
+        flag_column = layout.view(self._mm, slot, 'flags')
+        codes = symbols.codes
+        start = 0
+        for i, (name, df, fetched_at, flags) in enumerate(frames):
+            end = start + len(df)
+            if end > start:
+                rate[start:end] = df['rate'].to_numpy(dtype=np.float64)
+                for column, values in optional:
+                    if column in df.columns:
+                        values[start:end] = pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=np.float64)
+                    else:
+                        values[start:end] = np.nan
+                symbol_code[start:end] = codes[start:end]
+            fetched[i], row_start[i], row_count[i], flag_column[i] = fetched_at, start, end - start, flags
+            start = end
+        names_offset = base + layout.names_offset
+        self._mm[names_offset:names_offset + len(names)] = names
+        # Вигляди тримають експорт буфера mmap, без них його не можна буде закрити
+        del rate, optional, values, symbol_code, fetched, row_start, row_count, flag_column
+        self._set_seq(self._seq + 1)
+        self.published_version = version
+        return True
+
+    def _set_seq(self, seq: int) -> None:
+        self._seq = seq
+        struct.pack_into('<Q', self._mm, SEQ_OFFSET, seq)
+
+    def close(self) -> None:
+        self._mm.close()
+
+
+class SharedRows:
+    """
+    Рядки однієї біржі зі спільного знімка. Кеш знімків будує з колонок DataFrame напряму
+    (to_frame), а слухачі, що перебирають рядки (історія, сповіщення), отримують ті самі
+    словники, що й від сканування, - їх створює ітерація, лише коли вона справді потрібна.
+    """
+
+    def __init__(self, exchange: str, symbols: np.ndarray, rate: np.ndarray, optional: dict):
+        self.exchange = exchange
+        self.symbols = symbols
+        self.rate = rate
+        # {колонка з OPTIONAL_COLUMNS: масив, NaN - значення немає}
+        self.optional = optional
+
+    def __len__(self) -> int:
+        return len(self.rate)
+
+    def __iter__(self):
+        exchange = self.exchange
+        columns = [self.optional[column].tolist() for column in OPTIONAL_COLUMNS]
+        for symbol, rate, *values in zip(self.symbols.tolist(), self.rate.tolist(), *columns):
+            row = {'symbol': symbol, 'rate': rate, 'exchange': exchange}
+            for column, value in zip(OPTIONAL_COLUMNS, values):
+                row[column] = None if math.isnan(value) else value
+            yield row
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame({'symbol': self.symbols, 'rate': self.rate, 'exchange': self.exchange,
+                             **self.optional})
+
+
+class _SlotState:
+    """Розібраний стабільний слот: біржі та словник символів однієї публікації."""
+
+    def __init__(self, publication: int, exchanges: dict, symbols: np.ndarray, version: int,
+                 published_at: float):
+        self.publication = publication
+        self.slot = publication % 2
+        # {біржа: (fetched_at, прапорці, перший рядок, кількість рядків)}
+        self.exchanges = exchanges
+        self.symbols = symbols
+        self.version = version
+        self.published_at = published_at
+
+
+class SharedSnapshotReader:
+    """
+    Читач спільного знімка в процесі бота. Слот, на який вказує seq, читається прямо з
+    відображеної пам'яті; словник символів розбирається раз на публікацію, а рядки біржі
+    перетворюються на рядки кешу лише тоді, коли її fetched_at змінився.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._mm = None
+        self._layout = None
+        self._inode = None
+        self._state = None
+        self.stats = {'reads': 0, 'publications': 0, 'retries': 0}
+
+    def _open(self) -> bool:
+        """Відображає файл у пам'ять (або перевідкриває, якщо воркер створив новий)."""
+        try:
+            inode = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            return False
+        if self._mm is not None and inode == self._inode:
+            return True
+        self.close()
+        with open(self.path, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, layout_version, _, max_rows, max_exchanges, names_capacity = HEADER.unpack_from(mm, 0)
+        if magic != MAGIC or layout_version != LAYOUT_VERSION:
+            mm.close()
+            logger.error(f"Спільний знімок {self.path}: невідомий формат {magic!r} v{layout_version}")
+            return False
+        self._mm, self._inode = mm, inode
+        self._layout = _Layout(max_rows, max_exchanges, names_capacity)
+        self._state = None
+        return True
+
+    def close(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+
+    def _seq(self) -> int:
+        return struct.unpack_from('<Q', self._mm, SEQ_OFFSET)[0]
+
+    def _parse(self, seq: int) -> _SlotState:
+        """Стабільний слот для seq: при непарному seq (запис триває) - попередня публікація."""
+        publication = seq // 2
+        if self._state is not None and self._state.publication == publication:
+            return self._state
+        layout, slot = self._layout, publication % 2
+        base = layout.slot_offset(slot)
+        _, n_exchanges, n_symbols, names_len, version, published_at = SLOT_HEADER.unpack_from(self._mm, base)
+        names_offset = base + layout.names_offset
+        names = bytes(self._mm[names_offset:names_offset + names_len]).decode().split("\n") if names_len else []
+        exchange_names, symbols = names[:n_exchanges], np.asarray(names[n_exchanges:], dtype=object)
+        fetched = layout.view(self._mm, slot, 'fetched_at')[:n_exchanges].tolist()
+        flags = layout.view(self._mm, slot, 'flags')[:n_exchanges].tolist()
+        row_start = layout.view(self._mm, slot, 'row_start')[:n_exchanges].tolist()
+        row_count = layout.view(self._mm, slot, 'row_count')[:n_exchanges].tolist()
+        exchanges = {
+            name: (fetched[i], flags[i], row_start[i], row_count[i]) for i, name in enumerate(exchange_names)
+        }
+        if len(symbols) != n_symbols:
+            raise ValueError("розірваний слот")
+        self.stats['publications'] += 1
+        return _SlotState(publication, exchanges, symbols, version, published_at)
+
+    def _rows(self, state: _SlotState, name: str) -> SharedRows:
+        """Рядки біржі: колонки слота, скопійовані одним memcpy, щоб пережити наступні публікації."""
+        _, _, start, count = state.exchanges[name]
+        end = start + count
+        layout = self._layout
+        codes = layout.view(self._mm, state.slot, 'symbol_code')[start:end]
+        return SharedRows(
+            name, state.symbols[codes],
+            layout.view(self._mm, state.slot, 'rate')[start:end].copy(),
+            {column: layout.view(self._mm, state.slot, column)[start:end].copy() for column in OPTIONAL_COLUMNS},
+        )
+
+    def read(self, names: list, since: dict) -> tuple | None:
+        """
+        Стан бірж names з останньої стабільної публікації:
+        (_SlotState, {біржа: рядки} для бірж, чий fetched_at відрізняється від since[біржа]).
+        None, якщо файлу ще немає або його не вдалося прочитати.
+        """
+        if not self._open():
+            return None
+        self.stats['reads'] += 1
+        for _ in range(MAX_READ_ATTEMPTS):
+            seq = self._seq()
+            try:
+                state = self._parse(seq)
+                rows = {
+                    name: self._rows(state, name)
+                    for name in names
+                    if name in state.exchanges and since.get(name) != state.exchanges[name][0]
+                }
+            except (ValueError, IndexError, UnicodeDecodeError):
+                # Читання перетнулось із записом у цей слот - беремо новий стабільний слот
+                rows = None
+            # Слот seq // 2 % 2 переписується, коли seq стає 2 * (seq // 2) + 3
+            if rows is not None and self._seq() < 2 * (seq // 2) + 3:
+                self._state = state
+                return state, rows
+            self.stats['retries'] += 1
+            self._state = None
+        logger.error(f"Спільний знімок {self.path}: не вдалося прочитати узгоджений слот")
+        return None
+
+
+class SharedSnapshotSource:
+    """
+    Джерело для кешу знімків процесу бота (той самий контракт, що й fetch_all_funding_data):
+    рядки бірж беруться зі спільного знімка воркера, причому віддаються лише біржі, які
+    воркер оновив з минулого виклику, тож кеш і обробники працюють без змін.
+    Біржі, яких у знімку немає (або знімок застарів, бо воркер не публікує), опитуються
+    напряму через REST, але не частіше fallback_interval.
+    """
+
+    def __init__(self, path: str, max_age: float, fallback_interval: float):
+        self.reader = SharedSnapshotReader(path)
+        self.max_age = max_age
+        self.fallback_interval = fallback_interval
+        # {біржа: fetched_at публікації, рядки якої вже віддано кешу}
+        self._delivered = {}
+        self._fallback_at = {}
+        self.stats = {'shared': 0, 'fallback': 0}
+
+    async def fetch(self, names: list) -> ScanResult:
+        started = time.monotonic()
+        now = time.time()
+        result = self.reader.read(names, self._delivered)
+        state, rows = result if result is not None else (None, {})
+        if state is not None and now - state.published_at > self.max_age:
+            logger.warning(f"Спільний знімок не оновлювався {now - state.published_at:.0f} с, опитую біржі сам")
+            state, rows = None, {}
+
+        rates, missed, failed, stale, retry_in = {}, [], [], [], {}
+        for name, exchange_rows in rows.items():
+            rates[name] = exchange_rows
+            self._delivered[name] = state.exchanges[name][0]
+        self.stats['shared'] += len(rates)
+        absent = []
+        for name in names:
+            if state is None or name not in state.exchanges:
+                absent.append(name)
+                continue
+            flags = state.exchanges[name][1]
+            if flags & MISSED:
+                missed.append(name)
+            if flags & STALE:
+                stale.append(name)
+
+        due = [name for name in absent if now - self._fallback_at.get(name, float('-inf')) >= self.fallback_interval]
+        if due:
+            for name in due:
+                self._fallback_at[name] = now
+                # Коли воркер знову опублікує біржу, її рядки мають дійти до кешу
+                self._delivered.pop(name, None)
+            scan = await fetch_all_funding_data(due)
+            rates.update(scan.rates)
+            missed.extend(scan.missed)
+            failed.extend(scan.failed)
+            stale.extend(scan.stale)
+            retry_in.update(scan.retry_in)
+            self.stats['fallback'] += len(scan.rates)
+        return ScanResult(rates, missed, failed, time.monotonic() - started, stale, retry_in)
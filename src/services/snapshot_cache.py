@@ -0,0 +1,207 @@
+# src/services/snapshot_cache.py
+from __future__ import annotations
+import asyncio
+import functools
+import logging
+import time
+
+from ..lazy_imports import LazyModule
+from .columnar import ColumnarSnapshot
+from .metrics import timed, scan_seconds, snapshot_build_seconds
+from .spread import SpreadMatrix
+from .symbol_index import SymbolIndex
+
+logger = logging.getLogger(__name__)
+
+# pandas імпортується при першому використанні, а не під час старту бота
+pd = LazyModule('pandas')
+
+
+class ExchangeEntry:
+    """Результат останнього сканування однієї біржі."""
+
+    def __init__(self, rows: list, fetched_at: float):
+        self.rows = rows
+        self.fetched_at = fetched_at
+        # Запобіжник біржі відкритий: до цього часу сканувати її марно, запис вважається свіжим
+        self.fresh_until = 0.0
+        # Рядки спільного знімка (SharedRows) вже колонкові - DataFrame з них без перебору словників
+        self.df = rows.to_frame() if hasattr(rows, 'to_frame') else pd.DataFrame(rows)
+
+    def is_expired(self, ttl: float, now: float) -> bool:
+        return now - self.fetched_at >= ttl and now >= self.fresh_until
+
+
+class FundingSnapshot:
+    """Зведений знімок фандінгу для набору бірж."""
+
+    def __init__(self, df: pd.DataFrame, version: int, updated_at: float | None, missed: list | None = None,
+                 stale: list | None = None):
+        self.df = df
+        self.version = version
+        # Час найстарішого запису, що увійшов у знімок
+        self.updated_at = updated_at
+        # Біржі, які не вклалися в дедлайн останнього сканування
+        self.missed = missed or []
+        # Біржі з відкритим запобіжником, чиї дані взято з останнього вдалого сканування
+        self.stale = stale or []
+
+    @functools.cached_property
+    def columnar(self) -> ColumnarSnapshot:
+        """Колонкове представлення, що будується один раз на версію знімка."""
+        return ColumnarSnapshot(self.df)
+
+    @functools.cached_property
+    def symbol_index(self) -> SymbolIndex:
+        """Індекс символ -> позиції рядків, що будується один раз на версію знімка."""
+        return SymbolIndex(self.columnar)
+
+    @functools.cached_property
+    def spreads(self) -> SpreadMatrix:
+        """Матриці міжбіржових спредів, що будуються один раз на версію знімка."""
+        return SpreadMatrix(self.columnar)
+
+    def ticker_frame(self, ticker: str) -> pd.DataFrame:
+        """Рядки тикера (з псевдонімами) як зріз знімка; індекс - позиції в self.df."""
+        return self.df.iloc[self.symbol_index.lookup(ticker)]
+
+    @property
+    def age(self) -> float:
+        """Вік даних у секундах."""
+        if self.updated_at is None:
+            return 0.0
+        return max(0.0, time.time() - self.updated_at)
+
+
+class FundingSnapshotCache:
+    """
+    Спільний для процесу кеш фандінгу.
+    Кожна біржа має власний запис із TTL; нове сканування біржі
+    відбувається лише тоді, коли її запис застарів.
+    Сканування однієї біржі в кожен момент лише одне (single-flight): конкурентні
+    запити чекають на вже запущену задачу, а різні, але перетинні набори бірж
+    ділять спільні біржі й сканують самі лише решту.
+    """
+
+    def __init__(self, fetch_func, ttl: float = 60):
+        # async fetch_func(names) -> ScanResult
+        self._fetch_func = fetch_func
+        self.ttl = ttl
+        self.version = 0
+        self._entries = {}
+        self._missed = set()
+        self._stale = set()
+        self._snapshots = {}
+        self._listeners = []
+        # {біржа: задача сканування, що зараз її опитує}
+        self._inflight = {}
+        self.stats = {'hits': 0, 'misses': 0, 'scans': 0, 'coalesced_requests': 0, 'coalesced_exchanges': 0}
+
+    def set_source(self, fetch_func, ttl: float) -> None:
+        """Підміняє джерело даних (напр. потоковий стан замість REST-сканування)."""
+        self._fetch_func = fetch_func
+        self.ttl = ttl
+        self.invalidate()
+
+    def add_listener(self, listener) -> None:
+        """Реєструє listener(scan_result, fetched_at), що викликається після кожного сканування."""
+        self._listeners.append(listener)
+
+    async def _refresh(self, names: list) -> None:
+        now = time.time()
+        expired = [name for name in names
+                   if name not in self._entries or self._entries[name].is_expired(self.ttl, now)]
+        if not expired:
+            self.stats['hits'] += 1
+            return
+        self.stats['misses'] += 1
+        joined = {self._inflight[name] for name in expired if name in self._inflight}
+        to_fetch = [name for name in expired if name not in self._inflight]
+        if joined:
+            self.stats['coalesced_requests'] += 1
+            self.stats['coalesced_exchanges'] += len(expired) - len(to_fetch)
+        tasks = set(joined)
+        if to_fetch:
+            task = asyncio.create_task(self._scan(to_fetch))
+            for name in to_fetch:
+                self._inflight[name] = task
+            tasks.add(task)
+        # shield: скасування одного очікувача не скасовує спільне сканування для інших
+        await asyncio.gather(*(asyncio.shield(task) for task in tasks))
+
+    async def _scan(self, expired: list) -> None:
+        self.stats['scans'] += 1
+        try:
+            with timed(scan_seconds, 'scan'):
+                result = await self._fetch_func(expired)
+        finally:
+            for name in expired:
+                self._inflight.pop(name, None)
+        fetched_at = time.time()
+        for name, rows in result.rates.items():
+            self._entries[name] = ExchangeEntry(rows, fetched_at)
+        # Помилка або дедлайн: залишаємо попередні дані, якщо вони є
+        for name in result.failed + result.missed + result.stale:
+            if name not in self._entries:
+                self._entries[name] = ExchangeEntry([], fetched_at)
+        for name in result.stale:
+            self._entries[name].fresh_until = fetched_at + result.retry_in.get(name, 0.0)
+        # Біржі без змін, але з підтвердженими даними: молодшає лише вік, версія та сама
+        confirmed = [name for name in result.confirmed if name in self._entries and name not in result.rates]
+        for name in confirmed:
+            entry = self._entries[name]
+            entry.fetched_at = max(entry.fetched_at, result.confirmed[name])
+        if confirmed:
+            for key, snapshot in self._snapshots.items():
+                snapshot.updated_at = min((self._entries[name].fetched_at for name in key if name in self._entries),
+                                          default=None)
+        markers = (frozenset(self._missed), frozenset(self._stale))
+        self._missed.difference_update(expired)
+        self._missed.update(result.missed)
+        self._stale.difference_update(expired)
+        self._stale.update(result.stale)
+        for listener in self._listeners:
+            try:
+                listener(result, fetched_at)
+            except Exception as e:
+                logger.error(f"Помилка слухача кешу фандінгу: {e}", exc_info=True)
+        # Якщо жодна біржа не дала нових даних (напр. всі пропущені запобіжником),
+        # знімки та відрендерені звіти лишаються чинними
+        if not result.rates and markers == (frozenset(self._missed), frozenset(self._stale)):
+            return
+        self.version += 1
+        self._snapshots.clear()
+        logger.info(f"Кеш фандінгу оновлено до версії {self.version}")
+
+    async def get_snapshot(self, exchanges: list) -> FundingSnapshot:
+        """Повертає знімок для бірж, скануючи лише ті, чий запис застарів."""
+        key = tuple(exchanges)
+        await self._refresh(list(key))
+        # Далі без await: знімок збирається з одного узгодженого стану записів
+        snapshot = self._snapshots.get(key)
+        if snapshot is None:
+            with timed(snapshot_build_seconds, 'snapshot'):
+                entries = [self._entries[name] for name in key if name in self._entries]
+                frames = [e.df for e in entries if not e.df.empty]
+                df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+                updated_at = min((e.fetched_at for e in entries), default=None)
+                missed = [name for name in key if name in self._missed]
+                stale = [name for name in key if name in self._stale]
+                snapshot = FundingSnapshot(df, self.version, updated_at, missed, stale)
+                self._snapshots[key] = snapshot
+        return snapshot
+
+    def exchange_entries(self) -> list:
+        """[(біржа, DataFrame, fetched_at, missed, stale)] для кожної біржі в кеші (для спільного знімка)."""
+        return [
+            (name, entry.df, entry.fetched_at, name in self._missed, name in self._stale)
+            for name, entry in self._entries.items()
+        ]
+
+    def invalidate(self, name: str | None = None) -> None:
+        """Примусово позначає запис біржі (або всі записи) застарілим."""
+        if name is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(name, None)
+        self._snapshots.clear()
@@ -0,0 +1,72 @@
+# src/services/spread.py
+from __future__ import annotations
+import numpy as np
+
+
+class SpreadMatrix:
+    """
+    Міжбіржовий спред фандінгу для знімка.
+    Ставки та ціни розкладаються у щільні матриці символ × біржа, а попарні різниці
+    біржа × біржа для всіх символів рахуються одним broadcasting-ом.
+    Пара (i, j) означає short на біржі i та long на біржі j: за період фандінгу
+    позиція отримує rate[i] - rate[j].
+    Будується один раз на версію знімка; звіт - бінарний пошук по порогу плюс зріз.
+    """
+
+    def __init__(self, columnar):
+        self.columnar = columnar
+        n_symbols, n_exchanges = len(columnar.symbols), len(columnar.exchanges)
+        self.rates = np.full((n_symbols, n_exchanges), np.nan)
+        self.prices = np.full((n_symbols, n_exchanges), np.nan)
+        self.rates[columnar.symbol_codes, columnar.exchange_codes] = columnar.rate
+        self.prices[columnar.symbol_codes, columnar.exchange_codes] = columnar.price
+
+        # [s, i, j]: різниця фандінгу і ціновий спред (%) між short на i та long на j
+        self.funding_diff = self.rates[:, :, None] - self.rates[:, None, :]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.price_spread = (self.prices[:, :, None] - self.prices[:, None, :]) / self.prices[:, None, :] * 100
+
+        # Кандидати - символи, що торгуються щонайменше на двох біржах
+        listed = np.isfinite(self.rates).sum(axis=1)
+        candidates = np.flatnonzero(listed >= 2)
+        off_diagonal = ~np.eye(n_exchanges, dtype=bool)
+        pair_diffs = np.where(off_diagonal, self.funding_diff[candidates], np.nan)
+        pair_diffs = pair_diffs.reshape(len(candidates), n_exchanges * n_exchanges)
+        best_pairs = np.nanargmax(pair_diffs, axis=1) if len(candidates) else np.array([], dtype=np.int64)
+        short_codes, long_codes = np.divmod(best_pairs, n_exchanges)
+        diffs = pair_diffs[np.arange(len(candidates)), best_pairs]
+
+        # Найкращі пари, відсортовані за спаданням різниці фандінгу (стабільно)
+        order = np.argsort(-diffs, kind='stable')
+        self.symbol_codes = candidates[order]
+        self.short_codes = short_codes[order]
+        self.long_codes = long_codes[order]
+        self.diff = diffs[order]
+        self.price_diff = self.price_spread[self.symbol_codes, self.short_codes, self.long_codes]
+
+    def __len__(self) -> int:
+        return len(self.diff)
+
+    def top_n(self, threshold: float, n: int, blacklist: list | None = None,
+              whitelist: list | None = None) -> np.ndarray:
+        """Позиції топ-N пар з різницею фандінгу >= threshold, що проходять чорний і білий списки."""
+        candidates = np.arange(int(np.searchsorted(-self.diff, -threshold, side='right')))
+        allowed = self.columnar.filter_mask(blacklist, whitelist)
+        if allowed is not None:
+            candidates = candidates[allowed[self.symbol_codes[candidates]]]
+        return candidates[:n]
+
+    def symbol_names(self, pairs: np.ndarray) -> np.ndarray:
+        return self.columnar.symbols[self.symbol_codes[pairs]]
+
+    def short_exchanges(self, pairs: np.ndarray) -> np.ndarray:
+        return self.columnar.exchanges[self.short_codes[pairs]]
+
+    def long_exchanges(self, pairs: np.ndarray) -> np.ndarray:
+        return self.columnar.exchanges[self.long_codes[pairs]]
+
+    def short_rates(self, pairs: np.ndarray) -> np.ndarray:
+        return self.rates[self.symbol_codes[pairs], self.short_codes[pairs]]
+
+    def long_rates(self, pairs: np.ndarray) -> np.ndarray:
+        return self.rates[self.symbol_codes[pairs], self.long_codes[pairs]]
@@ -0,0 +1,172 @@
+# src/services/stream_ingest.py
+import asyncio
+import logging
+import time
+
+from ..config import AVAILABLE_EXCHANGES, FUNDING_CACHE_TTL, STREAM_MAX_BACKOFF
+from .exchange_health import exchange_health
+from .funding_service import ScanResult, _fetch_tracked, _parse_funding_rates, _get_swap_symbols
+
+logger = logging.getLogger(__name__)
+
+STREAM = 'stream'
+REST = 'rest'
+
+
+def _pro_client_factory(exchange_id: str):
+    """Клієнт ccxt.pro для біржі або None, якщо ccxt.pro недоступний."""
+    try:
+        import ccxt.pro as ccxt_pro
+    except ImportError:
+        return None
+    exchange_class = getattr(ccxt_pro, exchange_id, None)
+    return exchange_class() if exchange_class is not None else None
+
+
+class StreamIngestor:
+    """
+    Потокове отримання фандінгу: для кожної біржі окрема задача підписується на
+    watch_funding_rates() і оновлює стан у пам'яті по символах.
+    Якщо біржа не підтримує стрім або з'єднання обірвалось, задача переходить на
+    REST-опитування цієї біржі і періодично пробує перепідключитись.
+
+    fetch(names) має той самий контракт, що й fetch_all_funding_data, але не ходить
+    у мережу: віддає рядки бірж, що змінились з минулого виклику, тож кеш знімків
+    і обробники працюють без змін. Біржі без змін позначаються в ScanResult.confirmed
+    часом останнього повідомлення, тож вік знімка тихого, але живого стріму не росте.
+    Усі REST-запити (холодний старт і резервне опитування) йдуть через запобіжник біржі.
+    """
+
+    def __init__(self, exchange_map: dict | None = None, client_factory=_pro_client_factory,
+                 rest_fetch=_fetch_tracked, poll_interval: float = FUNDING_CACHE_TTL,
+                 max_backoff: float = STREAM_MAX_BACKOFF):
+        self.exchange_map = exchange_map or AVAILABLE_EXCHANGES
+        # client_factory(exchange_id) -> клієнт з watch_funding_rates; rest_fetch(name, exchange_map) -> рядки
+        # (rest_fetch сам записує результат у здоров'я біржі, як _fetch_tracked)
+        self.client_factory = client_factory
+        self.rest_fetch = rest_fetch
+        self.poll_interval = poll_interval
+        self.max_backoff = max_backoff
+        # {біржа: {символ: рядок знімка}}
+        self._state = {}
+        self._changed = set()
+        self._clients = {}
+        self._tasks = {}
+        self._last_poll = {}
+        self.mode = {}
+        # Час останньої зміни ставок і час останнього повідомлення (стріму чи REST) біржі
+        self.updated_at = {}
+        self.last_message = {}
+        self.stats = {'stream_updates': 0, 'rest_polls': 0, 'reconnects': 0}
+
+    # --- Життєвий цикл ---
+    def start(self, names: list) -> None:
+        for name in names:
+            if name not in self._tasks and name in self.exchange_map:
+                self._tasks[name] = asyncio.create_task(self._run(name), name=f"stream-{name}")
+
+    async def close(self) -> None:
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        self._tasks.clear()
+        for name, client in self._clients.items():
+            try:
+                await client.close()
+            except Exception as e:
+                logger.error(f"Помилка закриття стріму {name}: {e}")
+        self._clients.clear()
+
+    # --- Стан ---
+    def _apply(self, name: str, rows: list) -> None:
+        now = time.time()
+        self.last_message[name] = now
+        state = self._state.get(name)
+        changed = state is None
+        if changed:
+            state = self._state[name] = {}
+        for row in rows:
+            if state.get(row['symbol']) != row:
+                state[row['symbol']] = row
+                changed = True
+        if changed:
+            self._changed.add(name)
+            self.updated_at[name] = now
+
+    async def _rest_poll(self, name: str) -> str:
+        """Одне REST-опитування через запобіжник: 'ok', 'failed' або 'stale' (запобіжник відкритий)."""
+        if not exchange_health.get(name).allow():
+            return 'stale'
+        rows = await self.rest_fetch(name, self.exchange_map)
+        self.stats['rest_polls'] += 1
+        if rows is None:
+            return 'failed'
+        self._apply(name, rows)
+        return 'ok'
+
+    async def fetch(self, names: list) -> ScanResult:
+        """Рядки бірж, що змінились з минулого виклику; біржі без жодних даних - через REST одразу."""
+        started = time.monotonic()
+        cold = [name for name in names if name not in self._state]
+        failed, stale = [], []
+        if cold:
+            # Перший запит до біржі, стрім якої ще не дав даних
+            outcomes = await asyncio.gather(*(self._rest_poll(name) for name in cold))
+            failed = [name for name, outcome in zip(cold, outcomes) if outcome == 'failed']
+            stale = [name for name, outcome in zip(cold, outcomes) if outcome == 'stale']
+        rates, confirmed = {}, {}
+        for name in names:
+            if name in self._changed:
+                rates[name] = list(self._state[name].values())
+                self._changed.discard(name)
+            elif name in self.last_message:
+                confirmed[name] = self.last_message[name]
+        retry_in = {name: exchange_health.get(name).retry_in() for name in stale}
+        return ScanResult(rates, [], failed, time.monotonic() - started, stale, retry_in, confirmed)
+
+    # --- Задачі бірж ---
+    async def _run(self, name: str) -> None:
+        exchange_id = self.exchange_map[name]
+        backoff = 1.0
+        client = self.client_factory(exchange_id)
+        if client is None or not client.has.get('watchFundingRates'):
+            logger.info(f"Стрім: {name} не підтримує watch_funding_rates, працюю через REST")
+            if client is not None:
+                await client.close()
+            await self._poll(name, float('inf'))
+            return
+        self._clients[name] = client
+        while True:
+            try:
+                markets = await client.load_markets()
+                symbols = _get_swap_symbols(markets)
+                while True:
+                    update = await client.watch_funding_rates(symbols)
+                    if self.mode.get(name) != STREAM:
+                        logger.info(f"Стрім: {name} підключено")
+                        self.mode[name] = STREAM
+                    self._apply(name, _parse_funding_rates(name, update))
+                    self.stats['stream_updates'] += 1
+                    backoff = 1.0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Стрім: {name} відключено ({e}), REST на {backoff:.0f} с")
+                self.stats['reconnects'] += 1
+                await self._poll(name, backoff)
+                backoff = min(self.max_backoff, backoff * 2)
+
+    async def _poll(self, name: str, duration: float) -> None:
+        """REST-опитування біржі (не частіше poll_interval) протягом duration секунд."""
+        self.mode[name] = REST
+        deadline = time.monotonic() + duration
+        while True:
+            since_poll = time.monotonic() - self._last_poll.get(name, float('-inf'))
+            if since_poll >= self.poll_interval:
+                self._last_poll[name] = time.monotonic()
+                since_poll = 0.0
+                await self._rest_poll(name)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            await asyncio.sleep(min(remaining, self.poll_interval - since_poll))
@@ -0,0 +1,152 @@
+# src/services/symbol_filter.py
+import fnmatch
+import functools
+import itertools
+import re
+from collections import OrderedDict
+
+import numpy as np
+
+from ..config import FILTER_MASK_CACHE_SIZE
+from .metrics import registry
+
+_GLOB_CHARS = frozenset('*?[')
+
+
+def normalize_entries(entries) -> tuple:
+    """Записи списку як відсортований кортеж унікальних рядків у верхньому регістрі (ключ профілю)."""
+    return tuple(sorted({entry.strip().upper() for entry in entries or () if entry and entry.strip()}))
+
+
+def is_pattern(entry: str) -> bool:
+    return not _GLOB_CHARS.isdisjoint(entry)
+
+
+class SymbolMatcher:
+    """
+    Скомпільований список символів: точні тикери - у множині, glob-шаблони (1000*, *DOWN, BTC?)
+    зливаються в один регулярний вираз. Будується один раз на набір записів.
+    """
+
+    def __init__(self, entries: tuple):
+        self.entries = entries
+        self.exact = frozenset(entry for entry in entries if not is_pattern(entry))
+        patterns = [fnmatch.translate(entry) for entry in entries if is_pattern(entry)]
+        self.regex = re.compile('|'.join(patterns)) if patterns else None
+
+    def __bool__(self) -> bool:
+        return bool(self.entries)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self.exact or (self.regex is not None and self.regex.match(symbol) is not None)
+
+    def matches(self, symbols: np.ndarray) -> np.ndarray:
+        """Маска символів, що збігаються з будь-яким записом списку."""
+        mask = np.isin(symbols, list(self.exact)) if self.exact else np.zeros(len(symbols), dtype=bool)
+        if self.regex is not None:
+            match = self.regex.match
+            mask |= np.fromiter((match(symbol) is not None for symbol in symbols), dtype=bool, count=len(symbols))
+        return mask
+
+
+class SymbolFilter:
+    """
+    Фільтр символів профілю (чорний і білий списки). Символ проходить, якщо він не в чорному
+    списку і, коли білий список не порожній, - у білому.
+    """
+
+    def __init__(self, blacklist: tuple, whitelist: tuple):
+        self.key = (blacklist, whitelist)
+        self.blacklist = SymbolMatcher(blacklist)
+        self.whitelist = SymbolMatcher(whitelist)
+
+    def __bool__(self) -> bool:
+        return bool(self.blacklist) or bool(self.whitelist)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, SymbolFilter) and self.key == other.key
+
+    def __hash__(self) -> int:
+        return hash(self.key)
+
+    def allows(self, symbol: str) -> bool:
+        if symbol in self.blacklist:
+            return False
+        return not self.whitelist or symbol in self.whitelist
+
+    def mask(self, symbols: np.ndarray) -> np.ndarray:
+        """Маска символів, що проходять фільтр."""
+        allowed = self.whitelist.matches(symbols) if self.whitelist else np.ones(len(symbols), dtype=bool)
+        if self.blacklist:
+            allowed &= ~self.blacklist.matches(symbols)
+        return allowed
+
+
+@functools.lru_cache(maxsize=4096)
+def _compile(blacklist: tuple, whitelist: tuple) -> SymbolFilter:
+    return SymbolFilter(blacklist, whitelist)
+
+
+@functools.lru_cache(maxsize=4096)
+def _compile_raw(blacklist: tuple, whitelist: tuple) -> SymbolFilter:
+    # Списки з налаштувань як є: нормалізація сотень записів - раз на їхній вміст, а не на рендер
+    return _compile(normalize_entries(blacklist), normalize_entries(whitelist))
+
+
+def get_filter(blacklist=None, whitelist=None) -> SymbolFilter:
+    """Скомпільований фільтр; чати з однаковими списками отримують той самий об'єкт."""
+    return _compile_raw(tuple(blacklist or ()), tuple(whitelist or ()))
+
+
+class FilterMaskCache:
+    """
+    LRU-кеш масок фільтрів: (всесвіт символів, профіль фільтра) -> маска над символами.
+    Версія знімка змінюється щохвилини, а набір символів - рідко, тож маска профілю
+    обчислюється раз на всесвіт і спільна для всіх знімків і чатів з цим профілем.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        # {кортеж символів: номер всесвіту}; номери не повторюються, тож різні набори не збігаються
+        self._universes = OrderedDict()
+        self._universe_ids = itertools.count()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def universe_id(self, symbols: tuple) -> int:
+        """Номер набору символів: рівні набори отримують той самий номер, поки він у кеші."""
+        universe = self._universes.get(symbols)
+        if universe is not None:
+            self._universes.move_to_end(symbols)
+            return universe
+        universe = self._universes[symbols] = next(self._universe_ids)
+        if len(self._universes) > self.maxsize:
+            self._universes.popitem(last=False)
+        return universe
+
+    def get(self, universe_key, symbols: np.ndarray, symbol_filter: SymbolFilter) -> np.ndarray:
+        key = (universe_key, symbol_filter.key)
+        mask = self._items.get(key)
+        if mask is not None:
+            self._items.move_to_end(key)
+            self.stats['hits'] += 1
+            return mask
+        self.stats['misses'] += 1
+        mask = symbol_filter.mask(symbols)
+        mask.flags.writeable = False
+        self._items[key] = mask
+        if len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+            self.stats['evictions'] += 1
+        return mask
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+# Спільний для процесу кеш масок фільтрів
+filter_masks = FilterMaskCache(FILTER_MASK_CACHE_SIZE)
+
+registry.collect('filter_mask_cache_events_total', "Події кешу масок фільтрів (hits, misses, evictions)",
+                 lambda: {(event,): value for event, value in filter_masks.stats.items()},
+                 kind='counter', labelnames=('event',))
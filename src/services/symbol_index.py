@@ -0,0 +1,50 @@
+# src/services/symbol_index.py
+import re
+
+import numpy as np
+
+# Біржі котирують дешеві монети пачками: 1000PEPE, 10000SATS, 1MBABYDOGE
+_MULTIPLIER_PREFIX = re.compile(r'^(?:1000000|100000|10000|1000|1M)(?=[A-Z])')
+_QUOTE_SUFFIXES = ('PERP', 'SWAP', 'USDT')
+
+
+def normalize_symbol(query: str) -> str:
+    """
+    Зводить будь-який запис тикера до базового символу:
+    'btc-usdt', 'BTCUSDT', 'BTC/USDT:USDT', 'BTC_USDT' -> 'BTC'; '1000PEPE' -> 'PEPE'.
+    """
+    symbol = query.strip().upper()
+    # Уніфікований формат ccxt: BASE/QUOTE:SETTLE
+    symbol = symbol.split(':')[0].split('/')[0]
+    # Формати бірж: BTC-USDT, BTC_USDT, BTC-USDT-SWAP
+    symbol = re.split(r'[-_ ]', symbol)[0]
+    for suffix in _QUOTE_SUFFIXES:
+        if symbol.endswith(suffix) and len(symbol) > len(suffix):
+            symbol = symbol[:-len(suffix)]
+    return _MULTIPLIER_PREFIX.sub('', symbol)
+
+
+class SymbolIndex:
+    """
+    Індекс знімка: нормалізований символ -> позиції рядків.
+    Будується один раз на знімок з категорій колонкового представлення,
+    тож запит по тикеру - це звернення до словника замість повного сканування.
+    """
+
+    def __init__(self, columnar):
+        canonical = np.array([normalize_symbol(symbol) for symbol in columnar.symbols], dtype=object)
+        row_keys = canonical[columnar.symbol_codes] if len(columnar) else np.array([], dtype=object)
+        order = np.argsort(row_keys, kind='stable')
+        sorted_keys = row_keys[order]
+        self._rows = {}
+        if len(sorted_keys):
+            boundaries = np.flatnonzero(sorted_keys[1:] != sorted_keys[:-1]) + 1
+            for rows in np.split(order, boundaries):
+                self._rows[row_keys[rows[0]]] = rows
+
+    def __contains__(self, query: str) -> bool:
+        return normalize_symbol(query) in self._rows
+
+    def lookup(self, query: str) -> np.ndarray:
+        """Позиції рядків усіх записів символу (з урахуванням псевдонімів)."""
+        return self._rows.get(normalize_symbol(query), np.array([], dtype=np.int64))
@@ -0,0 +1,194 @@
+# src/services/webhook_server.py
+import asyncio
+import hmac
+import json
+import logging
+import signal
+
+from telegram import Update
+
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = 'x-telegram-bot-api-secret-token'
+# Скільки секунд тримати неактивне keep-alive з'єднання від проксі
+IDLE_TIMEOUT = 75
+REASONS = {
+    200: 'OK', 400: 'Bad Request', 403: 'Forbidden', 404: 'Not Found', 405: 'Method Not Allowed',
+    411: 'Length Required', 413: 'Payload Too Large',
+}
+
+webhook_requests_total = registry.counter(
+    'webhook_requests_total', "Запити до вебхука за результатом (HTTP-статус)", ('status',))
+
+
+class _HttpError(Exception):
+    def __init__(self, status: int):
+        super().__init__(status)
+        self.status = status
+
+
+class WebhookServer:
+    """
+    Вбудований HTTP-сервер вебхука в циклі подій бота.
+    POST на path з правильним X-Telegram-Bot-Api-Secret-Token і валідним JSON одразу
+    отримує 200, а вже потім розбирається в Update і кладеться в application.update_queue,
+    де його обробляють звичайні обробники Application. Keep-alive з'єднання від reverse proxy
+    обслуговуються без перепідключень. GET /healthz - перевірка для балансувальника.
+    """
+
+    def __init__(self, application, host: str, port: int, path: str, secret_token: str,
+                 max_body: int = 1 << 20):
+        self.application = application
+        self.host = host
+        self.port = port
+        self.path = '/' + path.strip('/')
+        self.max_body = max_body
+        self.secret_token = secret_token
+        self._secret = secret_token.encode()
+        self._server = None
+        self.stats = {'accepted': 0, 'rejected': 0}
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port, backlog=1024)
+        logger.info(f"Вебхук слухає http://{self.host}:{self.port}{self.path}")
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                    if request is None:
+                        break
+                    method, target, headers, body = request
+                    status, data = self._dispatch(method, target, headers, body)
+                    keep_alive = headers.get('connection', '').lower() != 'close'
+                except _HttpError as e:
+                    # Тіло запиту не дочитане - з'єднання далі використовувати не можна
+                    status, data, keep_alive = e.status, None, False
+                webhook_requests_total.inc(str(status))
+                writer.write(self._response(status, keep_alive))
+                # Telegram чекає відповіді перед наступним оновленням, тож розбір Update - вже після неї
+                if data is not None:
+                    await self._enqueue(data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader):
+        """(метод, шлях, заголовки, тіло) або None, якщо клієнт закрив з'єднання між запитами."""
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), IDLE_TIMEOUT)
+        except asyncio.IncompleteReadError as e:
+            if not e.partial:
+                return None
+            raise
+        lines = head.decode('latin-1').split('\r\n')
+        parts = lines[0].split(' ')
+        if len(parts) != 3:
+            raise _HttpError(400)
+        method, target, _ = parts
+        headers = {}
+        for line in lines[1:]:
+            if ':' in line:
+                key, value = line.split(':', 1)
+                headers[key.strip().lower()] = value.strip()
+        if 'chunked' in headers.get('transfer-encoding', '').lower():
+            raise _HttpError(411)
+        try:
+            length = int(headers.get('content-length', 0))
+        except ValueError:
+            raise _HttpError(400)
+        if length > self.max_body:
+            raise _HttpError(413)
+        body = await asyncio.wait_for(reader.readexactly(length), IDLE_TIMEOUT) if length else b''
+        return method, target, headers, body
+
+    def _dispatch(self, method: str, target: str, headers: dict, body: bytes) -> tuple:
+        """(HTTP-статус, JSON оновлення або None)."""
+        path = target.split('?', 1)[0]
+        if path == '/healthz' and method == 'GET':
+            return 200, None
+        if path != self.path:
+            return 404, None
+        if method != 'POST':
+            return 405, None
+        if not hmac.compare_digest(headers.get(SECRET_HEADER, '').encode(), self._secret):
+            self.stats['rejected'] += 1
+            logger.warning("Вебхук: запит з невірним secret token відхилено")
+            return 403, None
+        try:
+            data = json.loads(body)
+        except ValueError as e:
+            logger.warning(f"Вебхук: тіло запиту не є JSON: {e}")
+            return 400, None
+        if not isinstance(data, dict) or 'update_id' not in data:
+            return 400, None
+        return 200, data
+
+    async def _enqueue(self, data: dict) -> None:
+        try:
+            update = Update.de_json(data, self.application.bot)
+        except (ValueError, TypeError, KeyError) as e:
+            logger.warning(f"Вебхук: не вдалося розібрати Update #{data.get('update_id')}: {e}")
+            return
+        await self.application.update_queue.put(update)
+        self.stats['accepted'] += 1
+
+    @staticmethod
+    def _response(status: int, keep_alive: bool) -> bytes:
+        body = REASONS[status].encode()
+        return (
+            f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: text/plain\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        ).encode() + body
+
+
+async def run_webhook(application, server: WebhookServer, webhook_url: str | None = None) -> None:
+    """
+    Аналог application.run_polling() для вбудованого сервера: initialize і post_init,
+    start, сервер, set_webhook (лише якщо передано webhook_url), очікування SIGINT/SIGTERM
+    і зупинка в зворотному порядку з post_stop/post_shutdown.
+    """
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            # Windows: зупинка через KeyboardInterrupt, що скасовує цю корутину
+            pass
+
+    await application.initialize()
+    try:
+        if application.post_init:
+            await application.post_init(application)
+        await application.start()
+        await server.start()
+        if webhook_url:
+            await application.bot.set_webhook(
+                webhook_url, secret_token=server.secret_token, allowed_updates=Update.ALL_TYPES,
+                drop_pending_updates=True
+            )
+            logger.info(f"Вебхук зареєстровано: {webhook_url}")
+        await stop.wait()
+    finally:
+        await server.stop()
+        if application.running:
+            await application.stop()
+        if application.post_stop:
+            await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
@@ -0,0 +1,143 @@
+# src/settings_store.py
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class JsonSettingsBackend:
+    """Старе сховище: увесь словник налаштувань в одному JSON-файлі."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._data = self._read_file()
+        self._lock = threading.Lock()
+
+    def _read_file(self) -> dict:
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def load(self, chat_id: str) -> dict | None:
+        with self._lock:
+            return self._data.get(chat_id)
+
+    def load_all(self) -> dict:
+        with self._lock:
+            return dict(self._data)
+
+    def load_since(self, timestamp: float) -> tuple:
+        """Файл не ділиться між процесами: змін від інших процесів не буває."""
+        return {}, timestamp
+
+    def save_many(self, items: dict) -> None:
+        with self._lock:
+            self._data.update(items)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(self._data, f, indent=4)
+            os.replace(tmp_path, self.path)
+
+    def close(self) -> None:
+        pass
+
+
+class SqliteSettingsBackend:
+    """SQLite (WAL): окремий рядок на кожен чат, запис пачками в одній транзакції."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS user_settings ("
+                "chat_id TEXT PRIMARY KEY, settings TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    def load(self, chat_id: str) -> dict | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT settings FROM user_settings WHERE chat_id = ?", (chat_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def load_all(self) -> dict:
+        with self._lock:
+            rows = self._conn.execute("SELECT chat_id, settings FROM user_settings").fetchall()
+        return {chat_id: json.loads(settings) for chat_id, settings in rows}
+
+    def load_since(self, timestamp: float) -> tuple:
+        """Налаштування, записані після timestamp (зокрема іншими процесами): ({chat_id: settings}, найновіший updated_at)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT chat_id, settings, updated_at FROM user_settings WHERE updated_at > ?", (timestamp,)
+            ).fetchall()
+        latest = max((row[2] for row in rows), default=timestamp)
+        return {chat_id: json.loads(settings) for chat_id, settings, _ in rows}, latest
+
+    def save_many(self, items: dict) -> None:
+        now = time.time()
+        rows = [(chat_id, json.dumps(settings), now) for chat_id, settings in items.items()]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO user_settings (chat_id, settings, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(chat_id) DO UPDATE SET settings = excluded.settings, updated_at = excluded.updated_at",
+                rows
+            )
+
+    def get_meta(self, key: str) -> str | None:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO meta (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (key, value)
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def migrate_json_to_sqlite(json_path: str, backend: SqliteSettingsBackend) -> int:
+    """
+    Одноразово переносить налаштування зі старого JSON-файлу в SQLite.
+    Повертає кількість перенесених чатів (0, якщо міграція вже була).
+    """
+    if backend.get_meta('json_migrated') or not os.path.exists(json_path):
+        return 0
+    legacy = JsonSettingsBackend(json_path).load_all()
+    if legacy:
+        backend.save_many(legacy)
+    backend.set_meta('json_migrated', str(time.time()))
+    os.replace(json_path, json_path + '.migrated')
+    logger.info(f"Перенесено налаштування {len(legacy)} чатів з {json_path} у SQLite.")
+    return len(legacy)
+
+
+def create_backend(kind: str, json_path: str, db_path: str):
+    """Створює сховище налаштувань за назвою з конфігурації ('sqlite' або 'json')."""
+    directory = os.path.dirname(db_path if kind == 'sqlite' else json_path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    if kind == 'json':
+        return JsonSettingsBackend(json_path)
+    if kind == 'sqlite':
+        backend = SqliteSettingsBackend(db_path)
+        migrate_json_to_sqlite(json_path, backend)
+        return backend
+    raise ValueError(f"Невідоме сховище налаштувань: {kind}")
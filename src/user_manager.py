@@ -1,49 +1,164 @@
 # src/user_manager.py
-import json
+import atexit
+import copy
+import logging
 import os
-from threading import Lock
-from .config import DEFAULT_SETTINGS
+from threading import Event, Lock, Thread
+from .config import DEFAULT_SETTINGS, SETTINGS_BACKEND, SETTINGS_FLUSH_INTERVAL
+from .settings_store import create_backend
+
+logger = logging.getLogger(__name__)
 
 SETTINGS_FILE = os.path.join('data', 'user_settings.json')
+SETTINGS_DB_FILE = os.path.join('data', 'user_settings.db')
+
+_backend = None
+# Кеш прочитаних налаштувань; джерело правди для процесу
 _settings = {}
+# Чати, зміни яких ще не записані на диск
+_dirty = set()
 _lock = Lock()
+_stop_event = Event()
+_writer = None
+# Зростає при кожній зміні набору чатів або їх налаштувань (для похідних індексів)
+_version = 0
+# Журнал змін: chat_id кожної зміни; зміна з номером v лежить у _change_log[v - _change_log_base - 1]
+_change_log = []
+_change_log_base = 0
+# Скільки змін пам'ятати: індекс, що відстав більше, перебудовується повністю
+CHANGE_LOG_SIZE = 10000
+# updated_at останнього рядка, підтягнутого з sync_settings()
+_synced_at = 0.0
+# Перекриття вікна синхронізації: рядок міг отримати updated_at раніше, ніж закомітився
+SYNC_OVERLAP = 2.0
 
-def _load_settings():
-    global _settings
-    if not os.path.exists(os.path.dirname(SETTINGS_FILE)):
-        os.makedirs(os.path.dirname(SETTINGS_FILE))
-    try:
-        with open(SETTINGS_FILE, 'r') as f:
-            _settings = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        _settings = {}
+def _with_defaults(settings: dict) -> dict:
+    # Переконуємось, що всі ключі з DEFAULT_SETTINGS є у користувача
+    for key, value in DEFAULT_SETTINGS.items():
+        if key not in settings:
+            settings[key] = copy.deepcopy(value)
+    return settings
+
+def open_settings():
+    """
+    Відкриває сховище налаштувань, читає всі відомі чати в пам'ять і запускає фоновий запис.
+    Викликається явно при старті бота (post_init, в окремому потоці), щоб сам імпорт модуля
+    не створював файлів і потоків, а обробники в циклі подій не ходили на диск.
+    """
+    global _backend, _writer
+    if _backend is not None:
+        return
+    _backend = create_backend(SETTINGS_BACKEND, SETTINGS_FILE, SETTINGS_DB_FILE)
+    stored = _backend.load_all()
+    with _lock:
+        _settings.update(stored)
+    _writer = Thread(target=_writer_loop, name="settings-writer", daemon=True)
+    _writer.start()
+    atexit.register(close_settings)
+
+def _writer_loop():
+    # Записуємо накопичені зміни пачкою, поза циклом подій бота
+    while not _stop_event.wait(SETTINGS_FLUSH_INTERVAL):
+        flush_settings()
 
-def _save_settings():
+def flush_settings():
+    """Записує всі змінені налаштування однією транзакцією."""
     with _lock:
-        with open(SETTINGS_FILE, 'w') as f:
-            json.dump(_settings, f, indent=4)
+        if not _dirty:
+            return
+        items = {chat_id: copy.deepcopy(_settings[chat_id]) for chat_id in _dirty}
+        _dirty.clear()
+    try:
+        _backend.save_many(items)
+    except Exception as e:
+        logger.error(f"Не вдалося зберегти налаштування {len(items)} чатів: {e}", exc_info=True)
+        with _lock:
+            _dirty.update(items)
+
+def close_settings():
+    """Зупиняє фоновий запис, скидає залишок змін на диск і закриває сховище."""
+    if _writer is None or _stop_event.is_set():
+        return
+    _stop_event.set()
+    _writer.join(timeout=5)
+    flush_settings()
+    _backend.close()
 
 def get_user_settings(chat_id: int) -> dict:
     """Отримує налаштування для конкретного користувача."""
     chat_id_str = str(chat_id)
     with _lock:
-        if chat_id_str not in _settings:
-            _settings[chat_id_str] = DEFAULT_SETTINGS.copy()
-            _save_settings()
-        # Переконуємось, що всі ключі з DEFAULT_SETTINGS є у користувача
-        for key, value in DEFAULT_SETTINGS.items():
-            if key not in _settings[chat_id_str]:
-                _settings[chat_id_str][key] = value
-        return _settings[chat_id_str]
+        settings = _settings.get(chat_id_str)
+        if settings is None:
+            # Усі збережені чати вже в пам'яті (open_settings), тож це справді новий чат:
+            # він отримує налаштування за замовчуванням і записується у фоні
+            settings = _settings[chat_id_str] = {}
+            _dirty.add(chat_id_str)
+            _bump_version(chat_id_str)
+        return _with_defaults(settings)
+
+def get_all_user_settings() -> dict:
+    """Повертає копію налаштувань усіх користувачів: {chat_id: settings}."""
+    with _lock:
+        return {chat_id: _with_defaults(copy.deepcopy(settings)) for chat_id, settings in _settings.items()}
 
 def update_user_setting(chat_id: int, key: str, value):
-    """Оновлює конкретне налаштування для користувача."""
-    chat_id_str = str(chat_id)
+    """Оновлює конкретне налаштування для користувача (запис на диск - у фоні)."""
+    settings = get_user_settings(chat_id)
+    with _lock:
+        settings[key] = value
+        _dirty.add(str(chat_id))
+        _bump_version(str(chat_id))
+
+def sync_settings() -> int:
+    """
+    Підтягує налаштування, які записали інші процеси бота (режим вебхука з кількома процесами).
+    Чати з ще не записаними локальними змінами пропускаються; повертає кількість оновлених чатів.
+    """
+    global _synced_at
+    changed, latest = _backend.load_since(_synced_at - SYNC_OVERLAP)
+    updated = 0
     with _lock:
-        if chat_id_str not in _settings:
-            _settings[chat_id_str] = DEFAULT_SETTINGS.copy()
-        _settings[chat_id_str][key] = value
-        _save_settings()
+        for chat_id, stored in changed.items():
+            # Кешовані налаштування вже доповнені значеннями за замовчуванням - порівнюємо однаково
+            stored = _with_defaults(stored)
+            settings = _settings.get(chat_id)
+            if chat_id in _dirty or settings == stored:
+                continue
+            if settings is None:
+                # Чат, що з'явився через інший процес
+                settings = _settings[chat_id] = {}
+            settings.clear()
+            settings.update(stored)
+            updated += 1
+            _bump_version(chat_id)
+    _synced_at = max(_synced_at, latest)
+    return updated
+
+def _bump_version(chat_id: str):
+    # Викликається під _lock
+    global _version, _change_log, _change_log_base
+    _version += 1
+    _change_log.append(chat_id)
+    if len(_change_log) > CHANGE_LOG_SIZE:
+        dropped = len(_change_log) // 2
+        _change_log = _change_log[dropped:]
+        _change_log_base += dropped
 
-# Завантажуємо налаштування при старті модуля
-_load_settings()
\ No newline at end of file
+def settings_version() -> int:
+    """Лічильник змін налаштувань: індекси, побудовані з них, перебудовуються при зміні."""
+    return _version
+
+def settings_changes(since: int) -> tuple:
+    """
+    Зміни після версії since: (поточна версія, {chat_id: копія налаштувань}) лише для змінених чатів.
+    Якщо журнал уже не містить since, замість словника повертається None - потрібне повне
+    перечитування через get_all_user_settings().
+    """
+    with _lock:
+        if since < _change_log_base:
+            return _version, None
+        chat_ids = set(_change_log[since - _change_log_base:])
+        return _version, {
+            chat_id: _with_defaults(copy.deepcopy(_settings[chat_id])) for chat_id in chat_ids if chat_id in _settings
+        }